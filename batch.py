@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Energy Quest - Simulação em lote sem janela
+
+Joga milhares de partidas sem janela nem áudio, distribuídas por um pool de
+processos (uma instância do jogo por processo). Cada partida tem sua própria
+seed, nível e política de entradas, e termina quando o nível é concluído
+(``victory``), quando a vida acaba (``game_over``) ou depois de
+``--max-ticks`` ticks (``timeout``).
+
+Os resultados saem em colunas (uma lista por campo, uma posição por
+partida): arquivo ``.npz`` do NumPy ou, sem NumPy ou com outra extensão,
+JSON no formato ``{"columns": {...}}``. Constantes do jogo podem ser
+alteradas para ajuste de dificuldade com ``--set NOME=VALOR``.
+
+Uso:
+    python batch.py --runs 5000                          # todas as políticas e níveis
+    python batch.py --runs 2000 --level 2 --policy seek  # só o nível 3, política 'seek'
+    python batch.py --set ENEMY_SPEED=3 --set ENEMY_DAMAGE=1 --output dificil.npz
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import energy_quest as eq
+
+RESULTS_VERSION = 1
+DEFAULT_RUNS = 1000
+DEFAULT_MAX_TICKS = 60 * eq.SIMULATION_HZ  # Um minuto de jogo
+DEFAULT_SEED = 1
+DEFAULT_OUTPUT = 'batch_results.npz' if eq.np is not None else 'batch_results.json'
+CHUNKS_PER_WORKER = 8  # Lotes por processo: poucos o bastante para não pagar IPC por partida
+
+# Colunas do resultado, na ordem em que saem no arquivo
+COLUMNS = ('run', 'seed', 'level', 'policy', 'outcome', 'ticks', 'gems', 'total_gems',
+           'has_key', 'health', 'seconds')
+
+# Constantes que o GameWorld recebe como argumento (o padrão é fixado na importação):
+# com --set elas viram argumentos do GameWorld de cada partida
+WORLD_OPTIONS = {
+    'USE_TILEMAP_TERRAIN': 'use_tilemap',
+    'OFFSCREEN_ENEMY_INTERVAL': 'offscreen_enemy_interval',
+    'ENEMY_ENGINE_THRESHOLD': 'enemy_engine_threshold',
+}
+# Constantes copiadas na importação do jogo (argumentos padrão, tabelas, valores
+# derivados): alterá-las depois não teria efeito, então --set as recusa
+IMPORT_TIME_CONSTANTS = frozenset({
+    'WIDTH', 'HEIGHT', 'SIMULATION_HZ', 'TILE_SIZE', 'GRID_CELL_SIZE', 'ENEMY_ACTIVE_MARGIN',
+    'ENEMY_HITBOX_HALF', 'GEM_HITBOX_HALF', 'KEY_HITBOX_HALF',
+    'DOOR_TIP_HITBOX_WIDTH', 'DOOR_TIP_HITBOX_HEIGHT',
+})
+BOOLEAN_VALUES = {'1': True, 'true': True, 'sim': True, 'on': True,
+                  '0': False, 'false': False, 'nao': False, 'não': False, 'off': False}
+
+_world_options = {}  # Argumentos do GameWorld vindos de --set (ver init_worker)
+
+
+# ============================================================
+# POLÍTICAS DE ENTRADA
+# ============================================================
+def random_policy(rng: random.Random):
+    """Teclas sorteadas a cada tick, com tendência a andar para a direita."""
+    def act(world):
+        return eq.InputState(left=rng.random() < 0.3, right=rng.random() < 0.55,
+                             down=rng.random() < 0.05, jump=rng.random() < 0.06,
+                             drop=rng.random() < 0.02, interact=rng.random() < 0.05)
+    return act
+
+
+def scripted_policy(rng: random.Random):
+    """Anda para um lado, troca de direção de vez em quando e pula com frequência (como o benchmark)."""
+    state = {'right': True}
+
+    def act(world):
+        if rng.random() < 0.02:
+            state['right'] = not state['right']
+        return eq.InputState(left=not state['right'], right=state['right'],
+                             jump=rng.random() < 0.05, drop=rng.random() < 0.01,
+                             interact=rng.random() < 0.05)
+    return act
+
+
+def seek_policy(rng: random.Random):
+    """
+    Vai até o próximo objetivo (gema mais próxima, chave, porta) e pula quando ele está acima.
+
+    Desce de plataformas quando o objetivo está abaixo e abre a porta ao
+    chegar nela. Um pouco de ruído evita que o jogador fique preso sempre
+    no mesmo lugar.
+    """
+    def act(world):
+        player = world.player
+        if world.gems:
+            target = min(world.gems, key=lambda g: abs(g.x - player.x) + abs(g.y - player.y))
+        elif world.key.visible:
+            target = world.key
+        else:
+            target = world.door
+        dx, dy = target.x - player.x, target.y - player.y
+        wander = rng.random() < 0.1
+        return eq.InputState(left=dx < -eq.PLAYER_SPEED and not wander,
+                             right=dx > eq.PLAYER_SPEED or (wander and dx <= 0),
+                             jump=dy < -eq.PLAYER_HIT_H and rng.random() < 0.15,
+                             drop=dy > eq.PLAYER_HIT_H * 2 and rng.random() < 0.05,
+                             interact=world.has_key and abs(dx) < eq.PLAYER_HIT_W * 2)
+    return act
+
+
+POLICIES = {
+    'random': random_policy,
+    'scripted': scripted_policy,
+    'seek': seek_policy,
+}
+
+
+# ============================================================
+# PARTIDAS
+# ============================================================
+def make_specs(runs: int, seed: int, levels: list, policies: list) -> list:
+    """Uma especificação (run, seed, nível, política) por partida, alternando níveis e políticas."""
+    return [(run, seed + run, levels[run % len(levels)], policies[(run // len(levels)) % len(policies)])
+            for run in range(runs)]
+
+
+def init_worker(overrides: dict) -> None:
+    """Prepara o processo: Pygame sem janela, constantes alteradas e log só de erros."""
+    eq.init_headless()
+    eq.logger.setLevel('ERROR')
+    _world_options.clear()
+    for name, value in overrides.items():
+        if name in WORLD_OPTIONS:
+            _world_options[WORLD_OPTIONS[name]] = value
+        else:
+            setattr(eq, name, value)
+
+
+def play(spec: tuple, max_ticks: int) -> tuple:
+    """
+    Joga uma partida até o fim do nível inicial e retorna uma linha de resultado.
+
+    A seed define tanto o posicionamento dos objetos quanto as entradas da
+    política, então a mesma especificação sempre produz o mesmo resultado.
+    """
+    run, seed, level, policy = spec
+    start = time.perf_counter()
+    world = eq.GameWorld(rng=random.Random(seed), **_world_options)
+    world.load_level(level)
+    act = POLICIES[policy](random.Random(seed ^ 0x5EED))
+    outcome = 'timeout'
+    ticks = gems = has_key = 0
+    total_gems = world.total_gems
+    while ticks < max_ticks:
+        world.step(act(world))
+        ticks += 1
+        # Porta aberta: o mundo já carregou o próximo nível (ou terminou o jogo)
+        if world.current_level != level or world.outcome == eq.VICTORY:
+            outcome = eq.VICTORY
+            gems, has_key = total_gems, 1
+            break
+        gems, has_key = world.collected_gems, int(world.has_key)
+        if world.outcome == eq.GAME_OVER:
+            outcome = eq.GAME_OVER
+            break
+    return (run, seed, level, policy, outcome, ticks, gems, total_gems, has_key,
+            max(0, world.player_health), time.perf_counter() - start)
+
+
+def play_chunk(specs: list, max_ticks: int) -> list:
+    """Joga um lote de partidas no mesmo processo."""
+    return [play(spec, max_ticks) for spec in specs]
+
+
+def run_batch(specs: list, max_ticks: int, workers: int, overrides: dict) -> list:
+    """
+    Distribui as partidas pelo pool de processos e retorna as linhas na ordem das especificações.
+
+    As partidas vão em lotes (``CHUNKS_PER_WORKER`` por processo) para que o
+    custo de comunicação entre processos não domine partidas curtas. Com um
+    único processo tudo roda aqui mesmo, sem pool.
+    """
+    if workers <= 1:
+        init_worker(overrides)
+        return play_chunk(specs, max_ticks)
+    size = max(1, -(-len(specs) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [specs[i:i + size] for i in range(0, len(specs), size)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(overrides,)) as pool:
+        for chunk_rows in pool.map(play_chunk, chunks, [max_ticks] * len(chunks)):
+            rows.extend(chunk_rows)
+    return rows
+
+
+# ============================================================
+# RESULTADOS EM COLUNAS
+# ============================================================
+def to_columns(rows: list) -> dict:
+    """Transpõe as linhas de resultado em uma lista por coluna."""
+    return {name: list(values) for name, values in zip(COLUMNS, zip(*rows))} if rows else {name: [] for name in COLUMNS}
+
+
+def write_columns(path: str, columns: dict, meta: dict) -> None:
+    """
+    Grava as colunas em ``.npz`` (NumPy) ou em JSON.
+
+    No ``.npz`` cada coluna vira um array (texto como ``str``) e os metadados
+    ficam no array ``meta`` como JSON.
+    """
+    if path.endswith('.npz'):
+        if eq.np is None:
+            raise RuntimeError("Arquivos .npz precisam do NumPy; use uma saída .json")
+        np = eq.np
+        arrays = {name: np.asarray(values, dtype=str if name in ('policy', 'outcome') else None)
+                  for name, values in columns.items()}
+        np.savez_compressed(path, meta=np.asarray(json.dumps(meta, ensure_ascii=False)), **arrays)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': RESULTS_VERSION, 'meta': meta, 'columns': columns}, f, ensure_ascii=False)
+        f.write('\n')
+
+
+def read_columns(path: str) -> tuple:
+    """Lê um arquivo gravado por ``write_columns``; retorna (colunas, metadados)."""
+    if path.endswith('.npz'):
+        with eq.np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return {name: data[name].tolist() for name in COLUMNS}, meta
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data['columns'], data['meta']
+
+
+def print_summary(columns: dict, elapsed: float, out) -> None:
+    """Taxa de vitória, duração média e gemas por nível e política."""
+    groups = {}
+    for level, policy, outcome, ticks, gems, total in zip(columns['level'], columns['policy'], columns['outcome'],
+                                                          columns['ticks'], columns['gems'], columns['total_gems']):
+        group = groups.setdefault((level, policy), [0, 0, 0, 0, 0])
+        group[0] += 1
+        group[1] += outcome == eq.VICTORY
+        group[2] += outcome == eq.GAME_OVER
+        group[3] += ticks
+        group[4] += gems / total if total else 1.0
+    print(f"{'nível':>5} {'política':10} {'partidas':>8} {'vitória':>8} {'derrota':>8} {'ticks':>8} {'gemas':>6}", file=out)
+    for (level, policy), (count, wins, losses, ticks, gems) in sorted(groups.items()):
+        print(f"{level + 1:5} {policy:10} {count:8} {wins / count:8.1%} {losses / count:8.1%} "
+              f"{ticks / count:8.0f} {gems / count:6.1%}", file=out)
+    runs = len(columns['run'])
+    total_ticks = sum(columns['ticks'])
+    if elapsed > 0:
+        print(f"\n{runs} partidas, {total_ticks} ticks em {elapsed:.2f} s "
+              f"({runs / elapsed:.1f} partidas/s, {total_ticks / elapsed:.0f} ticks/s)", file=out)
+
+
+def parse_override(text: str) -> tuple:
+    """
+    Converte ``NOME=VALOR`` em (nome, valor) para uma constante numérica ou booleana do jogo.
+
+    Booleanos aceitam true/false, sim/não, on/off ou 1/0; as demais aceitam
+    inteiros ou decimais (ex.: ENEMY_SPEED=3.5), mesmo que o valor padrão seja
+    inteiro. Constantes fixadas na importação (IMPORT_TIME_CONSTANTS) são recusadas.
+    """
+    name, sep, value = text.partition('=')
+    if not sep or not name.isupper() or not isinstance(getattr(eq, name, None), (int, float)):
+        raise argparse.ArgumentTypeError(f"esperado NOME=VALOR de uma constante numérica do jogo: {text!r}")
+    if name in IMPORT_TIME_CONSTANTS:
+        raise argparse.ArgumentTypeError(f"{name} é fixada na importação do jogo e não pode ser alterada")
+    current = getattr(eq, name)
+    if isinstance(current, bool):
+        parsed = BOOLEAN_VALUES.get(value.strip().lower())
+        if parsed is None:
+            raise argparse.ArgumentTypeError(f"valor booleano inválido para {name}: {value!r}")
+        return name, parsed
+    try:
+        return name, int(value)
+    except ValueError:
+        pass
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor inválido para {name}: {value!r}") from None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulação em lote do Energy Quest em vários processos (sem janela)")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help="número de partidas")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processos (padrão: um por núcleo)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="seed da primeira partida (as seguintes somam 1)")
+    parser.add_argument('--level', type=int, action='append', help="nível inicial (0-based; pode repetir; padrão: todos)")
+    parser.add_argument('--policy', action='append', choices=sorted(POLICIES),
+                        help="política de entradas (pode repetir; padrão: todas)")
+    parser.add_argument('--max-ticks', type=int, default=DEFAULT_MAX_TICKS, help="ticks até a partida contar como timeout")
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='NOME=VALOR', help="altera uma constante do jogo, ex.: ENEMY_SPEED=3.5 (pode repetir)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"arquivo de resultados (.npz ou .json; padrão {DEFAULT_OUTPUT})")
+    args = parser.parse_args(argv)
+
+    levels = args.level if args.level else list(range(len(eq.levels)))
+    invalid = [level for level in levels if not 0 <= level < len(eq.levels)]
+    if invalid:
+        parser.error(f"nível inexistente: {invalid[0]} (há {len(eq.levels)})")
+    policies = args.policy if args.policy else sorted(POLICIES)
+    overrides = dict(args.overrides)
+
+    specs = make_specs(args.runs, args.seed, levels, policies)
+    start = time.perf_counter()
+    rows = run_batch(specs, args.max_ticks, args.workers, overrides)
+    elapsed = time.perf_counter() - start
+
+    columns = to_columns(rows)
+    meta = {'runs': args.runs, 'workers': args.workers, 'seed': args.seed, 'levels': levels,
+            'policies': policies, 'max_ticks': args.max_ticks, 'overrides': overrides,
+            'simulation_hz': eq.SIMULATION_HZ, 'seconds': round(elapsed, 3)}
+    write_columns(args.output, columns, meta)
+    print_summary(columns, elapsed, sys.stderr)
+    print(f"resultados em {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Energy Quest - Benchmark de tempo de frame sem janela
+
+Roda o jogo com os drivers SDL 'dummy' (sem janela nem áudio), joga cada
+nível de ``levels`` com entradas roteirizadas e mede separadamente o tempo
+de ``update()`` e de ``draw()``. As telas fora da partida (menu, tutorial,
+fim de jogo e vitória) também são medidas, tanto no desenho completo
+(``draw_menu()``, ``draw_victory()``... mais os botões) quanto no desenho
+retido que o jogo faz a cada frame com a tela parada.
+
+Com ``--replay`` uma gravação de partida (.eqrec, ver ``InputLog``) é
+reproduzida tick a tick como carga determinística, medindo ``GameWorld.step``.
+
+O resultado (p50/p95/p99 em milissegundos e execuções por segundo) sai em
+JSON. Com ``--baseline`` o resultado é comparado com uma execução anterior
+e o programa termina com código 1 se algum p95 piorou além da tolerância.
+
+Uso:
+    python benchmark.py                             # JSON na saída padrão
+    python benchmark.py --output base.json          # salva a referência
+    python benchmark.py --baseline base.json        # compara com a referência
+    python benchmark.py --replay partida.eqrec      # inclui o replay de uma gravação
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from pgzero.keyboard import keys
+from pgzero.screen import Screen
+
+import energy_quest as eq
+
+RESULTS_VERSION = 1
+DEFAULT_FRAMES = 600
+DEFAULT_WARMUP = 60
+DEFAULT_SCREEN_FRAMES = 200
+DEFAULT_TOLERANCE = 0.10  # Piora aceita no p95 em relação à referência (10%)
+DEFAULT_MIN_DELTA_MS = 0.05  # Diferenças menores que isso são ruído, não regressão
+DEFAULT_SEED = 1
+
+
+class ScriptedKeyboard:
+    """
+    Substitui o ``keyboard`` do Pygame Zero com teclas controladas pelo roteiro.
+
+    Teclas que nunca foram pressionadas valem False, como no Pygame Zero.
+    """
+
+    def __init__(self):
+        self.held = set()
+
+    def __getattr__(self, name: str) -> bool:
+        return name in self.held
+
+
+class InputScript:
+    """
+    Entradas roteirizadas e reprodutíveis: o jogador anda para os lados e pula.
+
+    Attributes:
+        rng: Gerador próprio, separado do usado pelo jogo no posicionamento
+        keyboard: Teclado falso que recebe as teclas mantidas pressionadas
+    """
+
+    def __init__(self, seed: int, keyboard: ScriptedKeyboard):
+        self.rng = random.Random(seed)
+        self.keyboard = keyboard
+        keyboard.held = {'right'}
+
+    def advance(self) -> None:
+        """Troca de direção de vez em quando e pula com frequência."""
+        held = self.keyboard.held
+        if self.rng.random() < 0.02:
+            held.symmetric_difference_update({'left', 'right'})
+        if self.rng.random() < 0.05:
+            eq.on_key_down(keys.UP)
+        if self.rng.random() < 0.01:
+            eq.on_key_down(keys.DOWN)
+
+
+def percentile(sorted_samples: list, fraction: float) -> float:
+    """Percentil pelo método do posto mais próximo (amostras já ordenadas)."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * fraction // 1))
+    return sorted_samples[int(rank) - 1]
+
+
+def summarize(samples_ns: list) -> dict:
+    """Resume tempos em nanossegundos: percentis e médias em ms, execuções por segundo."""
+    samples = sorted(samples_ns)
+    total = sum(samples)
+    ms = 1e-6
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * ms, 6),
+        'p95_ms': round(percentile(samples, 0.95) * ms, 6),
+        'p99_ms': round(percentile(samples, 0.99) * ms, 6),
+        'mean_ms': round(total / len(samples) * ms, 6) if samples else 0.0,
+        'max_ms': round(samples[-1] * ms, 6) if samples else 0.0,
+        'per_second': round(len(samples) / (total * 1e-9), 1) if total else 0.0,
+    }
+
+
+def setup() -> ScriptedKeyboard:
+    """Prepara o módulo do jogo para rodar fora do Pygame Zero, sem áudio."""
+    eq.init_headless()
+    surface = pygame.display.set_mode((eq.WIDTH, eq.HEIGHT))
+    eq.screen = Screen(surface)
+    eq.keys = keys
+    eq.keyboard = ScriptedKeyboard()
+    eq.music_enabled = False
+    eq.sound_enabled = False
+    eq.resolve_text_font()
+    eq.init_menu_buttons()
+    return eq.keyboard
+
+
+def bench_level(index: int, frames: int, warmup: int, seed: int, keyboard: ScriptedKeyboard) -> dict:
+    """
+    Joga um nível com entradas roteirizadas e mede update() e draw() por frame.
+
+    O jogador é mantido com vida cheia para que todos os frames sejam de
+    partida; se o nível terminar mesmo assim, ele é recarregado.
+    """
+    random.seed(seed)
+    script = InputScript(seed, keyboard)
+    eq.game_state = eq.PLAYING
+    eq.sim_accumulator = 0.0
+    eq.load_level(index)
+    world = eq.world
+    dt = 1.0 / eq.SIMULATION_HZ
+    update_ns, draw_ns, frame_ns = [], [], []
+    clock = time.perf_counter_ns
+    for frame in range(warmup + frames):
+        script.advance()
+        world.player_health = eq.PLAYER_MAX_HEALTH
+        t0 = clock()
+        eq.update(dt)
+        t1 = clock()
+        eq.draw()
+        t2 = clock()
+        if frame >= warmup:
+            update_ns.append(t1 - t0)
+            draw_ns.append(t2 - t1)
+            frame_ns.append(t2 - t0)
+        if eq.game_state != eq.PLAYING:
+            eq.game_state = eq.PLAYING
+            eq.load_level(index)
+    return {
+        'update': summarize(update_ns),
+        'draw': summarize(draw_ns),
+        'frame': summarize(frame_ns),
+        'ticks': world.ticks,
+    }
+
+
+def bench_screen(state: str, frames: int) -> dict:
+    """
+    Mede uma tela fora da partida.
+
+    ``paint`` é o desenho completo (conteúdo fixo mais botões), que acontece
+    ao entrar na tela; ``draw`` é o draw() do jogo com a tela já mostrada.
+    """
+    eq.game_state = state
+    if state == eq.GAME_OVER:
+        eq.init_game_over_buttons()
+    elif state == eq.VICTORY:
+        eq.init_victory_buttons()
+    ui = eq.ui_screens[state]
+    clock = time.perf_counter_ns
+    paint_ns, draw_ns = [], []
+    for _ in range(frames):
+        t0 = clock()
+        ui.paint()
+        for btn in ui.buttons:
+            btn.draw()
+        paint_ns.append(clock() - t0)
+    eq.dirty_renderer.invalidate()
+    eq.draw()
+    for _ in range(frames):
+        t0 = clock()
+        eq.draw()
+        draw_ns.append(clock() - t0)
+    return {'paint': summarize(paint_ns), 'draw': summarize(draw_ns)}
+
+
+def bench_replay(path: str) -> dict:
+    """
+    Reproduz uma gravação medindo cada tick da simulação.
+
+    O campo ``identical`` indica se o estado final bateu com o gravado; se
+    não bateu, a carga mudou e a comparação de tempos perde o sentido.
+    """
+    log = eq.InputLog.load(path)
+    clock = time.perf_counter_ns
+    step_ns = []
+    last = [clock()]
+
+    def on_tick(world):
+        now = clock()
+        step_ns.append(now - last[0])
+        last[0] = now
+
+    world = log.replay(on_tick=on_tick)
+    return {
+        'step': summarize(step_ns),
+        'ticks': log.ticks,
+        'identical': log.digest is not None and eq.world_state_digest(world) == log.digest,
+    }
+
+
+def run(frames: int, warmup: int, screen_frames: int, seed: int, only_levels=None, replays=()) -> dict:
+    """Executa o benchmark completo e retorna o resultado no formato JSON."""
+    keyboard = setup()
+    results = {}
+    for index in range(len(eq.levels)):
+        if only_levels is not None and index not in only_levels:
+            continue
+        name = os.path.splitext(eq.levels.entries[index]['file'])[0]
+        results[f'level:{name}'] = bench_level(index, frames, warmup, seed + index, keyboard)
+    for state in (eq.MENU, eq.TUTORIAL, eq.GAME_OVER, eq.VICTORY):
+        results[f'screen:{state}'] = bench_screen(state, screen_frames)
+    for path in replays:
+        results[f'replay:{os.path.basename(path)}'] = bench_replay(path)
+    return {
+        'version': RESULTS_VERSION,
+        'environment': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': getattr(eq.np, '__version__', None),
+            'platform': platform.platform(),
+        },
+        'config': {'frames': frames, 'warmup': warmup, 'screen_frames': screen_frames, 'seed': seed},
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> list:
+    """
+    Compara o p95 de cada medida com a referência.
+
+    Uma medida piorou quando o p95 subiu mais que ``tolerance`` (relativo)
+    e mais que ``min_delta_ms`` (absoluto), para não acusar ruído em medidas
+    de poucos microssegundos.
+
+    Returns:
+        Lista de linhas (nome, medida, p95 de referência, p95 atual, variação, piorou)
+    """
+    rows = []
+    base_results = baseline.get('results', {})
+    for name, entry in current['results'].items():
+        base_entry = base_results.get(name)
+        if base_entry is None:
+            continue
+        for metric, stats in entry.items():
+            base_stats = base_entry.get(metric)
+            if not isinstance(stats, dict) or not isinstance(base_stats, dict):
+                continue
+            before, after = base_stats['p95_ms'], stats['p95_ms']
+            change = (after - before) / before if before else 0.0
+            rows.append((name, metric, before, after, change,
+                         change > tolerance and after - before > min_delta_ms))
+    return rows
+
+
+def print_summary(report: dict, out) -> None:
+    """Tabela legível com p50/p95/p99 de cada medida."""
+    print(f"{'medida':42} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'por s':>10}", file=out)
+    for name, entry in report['results'].items():
+        for metric, stats in entry.items():
+            if isinstance(stats, dict):
+                print(f"{name + ' ' + metric:42} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} "
+                      f"{stats['p99_ms']:9.3f} {stats['per_second']:10.0f}", file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de tempo de frame do Energy Quest (sem janela)")
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES, help="frames medidos por nível")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help="frames descartados no início de cada nível")
+    parser.add_argument('--screen-frames', type=int, default=DEFAULT_SCREEN_FRAMES, help="repetições por tela")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="semente das entradas e do posicionamento")
+    parser.add_argument('--level', type=int, action='append', help="mede só este nível (0-based; pode repetir)")
+    parser.add_argument('--replay', action='append', default=[], help="gravação .eqrec a reproduzir (pode repetir)")
+    parser.add_argument('--output', help="grava o resultado JSON neste arquivo em vez da saída padrão")
+    parser.add_argument('--baseline', help="resultado JSON anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="piora relativa aceita no p95 antes de acusar regressão (padrão 0.10)")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="diferença mínima no p95, em ms, para acusar regressão (padrão 0.05)")
+    args = parser.parse_args(argv)
+
+    report = run(args.frames, args.warmup, args.screen_frames, args.seed,
+                 set(args.level) if args.level else None, args.replay)
+    print_summary(report, sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance, args.min_delta)
+        report['baseline'] = {'file': args.baseline, 'tolerance': args.tolerance,
+                              'min_delta_ms': args.min_delta, 'comparisons': [
+            {'name': name, 'metric': metric, 'baseline_p95_ms': before, 'p95_ms': after,
+             'change': round(change, 4), 'regression': worse}
+            for name, metric, before, after, change, worse in rows
+        ]}
+        regressions = [row for row in rows if row[5]]
+        print(f"\nComparação com {args.baseline} (tolerância {args.tolerance:.0%} no p95):", file=sys.stderr)
+        for name, metric, before, after, change, worse in rows:
+            flag = "  <-- REGRESSÃO" if worse else ""
+            print(f"{name + ' ' + metric:42} {before:9.3f} -> {after:9.3f} ({change:+.1%}){flag}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Energy Quest - Ambiente vetorizado para aprendizado por reforço
+
+Envolve N instâncias de ``GameWorld`` avançadas em conjunto (lock-step) no
+mesmo processo, sem janela nem áudio. Cada episódio começa em
+``GameWorld.load_level`` e termina quando o nível é concluído, quando a vida
+acaba ou depois de ``max_ticks`` ticks; ambientes que terminam são
+reiniciados automaticamente no mesmo ``step``.
+
+As ações são discretas (ver ``ACTIONS``): as mesmas de ``on_key_down`` e do
+teclado (andar, pular, descer da plataforma, abrir a porta). A recompensa
+vem das mudanças em ``collected_gems``, ``has_key`` e ``player_health`` e
+da conclusão do nível (pesos em ``REWARDS``).
+
+Observações:
+    'state'  -- vetor float32 de ``STATE_SIZE`` posições por ambiente (``STATE_FIELDS``)
+    'pixels' -- quadros RGB (N, altura, largura, 3) uint8. Cada ambiente é
+                desenhado direto na sua fatia de um único array NumPy (as
+                superfícies do Pygame usam o array como memória), então a
+                observação é uma view, sem cópia. O conteúdo muda no próximo
+                ``step``/``reset``: copie se precisar guardar.
+
+Uso:
+    import energy_env
+
+    env = energy_env.VectorEnv(16, observation='state', seed=1)
+    obs = env.reset()
+    for _ in range(1000):
+        actions = env.sample_actions()
+        obs, rewards, terminated, truncated, info = env.step(actions)
+"""
+
+import os
+import random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import energy_quest as eq
+
+# Ações discretas: (nome, teclas mantidas, teclas pressionadas neste tick)
+ACTIONS = (
+    ('nada', (), ()),
+    ('esquerda', ('left',), ()),
+    ('direita', ('right',), ()),
+    ('pular', (), ('jump',)),
+    ('pular_esquerda', ('left',), ('jump',)),
+    ('pular_direita', ('right',), ('jump',)),
+    ('descer', ('down',), ('drop',)),
+    ('abrir_porta', (), ('interact',)),
+)
+
+REWARDS = {
+    'gem': 1.0,          # Por gema coletada
+    'key': 2.0,          # Ao pegar a chave
+    'level': 5.0,        # Ao abrir a porta (nível concluído)
+    'damage': -0.25,     # Por ponto de vida perdido
+    'game_over': -5.0,   # Quando a vida acaba
+    'tick': 0.0,         # Por tick (negativo incentiva terminar rápido)
+}
+
+NEAREST_GEMS = 3     # Gemas mais próximas descritas no vetor de estado
+NEAREST_ENEMIES = 3  # Inimigos mais próximos descritos no vetor de estado
+
+# Posições do vetor de estado. Posições relativas (dx, dy) são em relação ao
+# jogador e divididas pelo tamanho da tela; 'visivel'/'existe' valem 0 ou 1.
+STATE_FIELDS = (
+    ('jogador_x', 'jogador_y', 'velocidade_y', 'no_chao', 'pulos_restantes',
+     'vida', 'gemas_coletadas', 'tem_chave', 'nivel',
+     'chave_visivel', 'chave_dx', 'chave_dy', 'porta_visivel', 'porta_dx', 'porta_dy')
+    + tuple(f'gema{i}_{c}' for i in range(NEAREST_GEMS) for c in ('existe', 'dx', 'dy'))
+    + tuple(f'inimigo{i}_{c}' for i in range(NEAREST_ENEMIES) for c in ('existe', 'dx', 'dy'))
+)
+STATE_SIZE = len(STATE_FIELDS)
+_ENTITY_OFFSET = STATE_FIELDS.index('gema0_existe')
+
+
+def _action_inputs(frame_skip: int) -> list:
+    """
+    InputState de cada ação para cada tick de uma repetição de ``frame_skip`` ticks.
+
+    As teclas mantidas valem em todos os ticks; as pressionadas (pulo,
+    descida, porta) só no primeiro, como um toque de tecla no jogo.
+    """
+    table = []
+    for _, held, pressed in ACTIONS:
+        first = eq.InputState(**{name: True for name in held + pressed})
+        rest = eq.InputState(**{name: True for name in held})
+        table.append([first] + [rest] * (frame_skip - 1))
+    return table
+
+
+class VectorEnv:
+    """
+    N partidas sem janela avançadas juntas, com observações em arrays NumPy pré-alocados.
+
+    Attributes:
+        num_envs: Número de ambientes
+        worlds: GameWorld de cada ambiente
+        observation: 'state' ou 'pixels'
+        levels: Níveis sorteados a cada reinício (índices 0-based)
+        max_ticks: Ticks até o episódio ser truncado
+        frame_skip: Ticks simulados por ação (a ação se repete)
+        rewards_table: Pesos da recompensa (REWARDS com as alterações do construtor)
+        obs: Observações atuais, (N, STATE_SIZE) float32 ou (N, altura, largura, 3) uint8
+        frames: Só com 'pixels': memória dos quadros, (N, altura, largura, 4) em BGRA;
+            ``obs`` é a view RGB dela (passo negativo no último eixo)
+        final_obs: Última observação de cada episódio que terminou (válida onde
+            terminated ou truncated for True no step que o encerrou)
+        episode_ticks, episode_returns: Ticks e recompensa acumulada do episódio atual
+    """
+
+    def __init__(self, num_envs: int, observation: str = 'state', levels=None, seed: int = 0,
+                 max_ticks: int = 60 * eq.SIMULATION_HZ, frame_skip: int = 1,
+                 pixel_size: tuple = (eq.WIDTH, eq.HEIGHT), rewards: dict = None):
+        if observation not in ('state', 'pixels'):
+            raise ValueError(f"observação desconhecida: {observation!r} (use 'state' ou 'pixels')")
+        eq.init_headless()
+        self.num_envs = num_envs
+        self.observation = observation
+        self.levels = list(range(len(eq.levels))) if levels is None else list(levels)
+        self.max_ticks = max_ticks
+        self.frame_skip = max(1, frame_skip)
+        self.rewards_table = dict(REWARDS, **(rewards or {}))
+        self._inputs = _action_inputs(self.frame_skip)
+        self._rngs = [random.Random(seed + i) for i in range(num_envs)]
+        self.worlds = [eq.GameWorld(rng=rng) for rng in self._rngs]
+        self._start_level = [0] * num_envs
+        self._last = [None] * num_envs  # (gemas, chave, vida) no fim do último step
+        self._total_gems = [0] * num_envs
+        self._action_rng = np.random.default_rng(seed)
+        self.episode_ticks = np.zeros(num_envs, dtype=np.int64)
+        self.episode_returns = np.zeros(num_envs, dtype=np.float64)
+        self._rewards = np.zeros(num_envs, dtype=np.float32)
+        self._terminated = np.zeros(num_envs, dtype=bool)
+        self._truncated = np.zeros(num_envs, dtype=bool)
+        self._outcomes = [None] * num_envs
+
+        if observation == 'state':
+            self.obs = np.zeros((num_envs, STATE_SIZE), dtype=np.float32)
+        else:
+            eq.resolve_text_font()
+            width, height = pixel_size
+            # Uma única área de memória; cada ambiente desenha na sua fatia. BGRA é
+            # a ordem dos sprites carregados, então os blits não convertem pixels.
+            self.frames = np.zeros((num_envs, height, width, 4), dtype=np.uint8)
+            self._surfaces = [pygame.image.frombuffer(self.frames[i], (width, height), 'BGRA')
+                              for i in range(num_envs)]
+            self.obs = self.frames[..., 2::-1]
+            # Tamanho diferente da tela: desenha em tamanho real e reduz para a fatia
+            self._canvas = (None if (width, height) == (eq.WIDTH, eq.HEIGHT)
+                            else pygame.Surface((eq.WIDTH, eq.HEIGHT), 0, self._surfaces[0]))
+            self._huds = [eq.HudLayer() for _ in range(num_envs)]
+            self._layers = {}
+        self.final_obs = np.zeros_like(self.obs)
+
+    # ----------------------------------------------------------------
+    # Episódios
+    # ----------------------------------------------------------------
+    def reset(self, seed: int = None) -> np.ndarray:
+        """Reinicia todos os ambientes (com novas seeds ``seed + i``, se informada) e retorna as observações."""
+        if seed is not None:
+            for i, rng in enumerate(self._rngs):
+                rng.seed(seed + i)
+        for i in range(self.num_envs):
+            self._reset_env(i)
+            self._observe(i)
+        return self.obs
+
+    def _reset_env(self, i: int) -> None:
+        rng = self._rngs[i]
+        level = rng.choice(self.levels)
+        world = self.worlds[i]
+        world.load_level(level)
+        self._start_level[i] = level
+        self._last[i] = (world.collected_gems, world.has_key, world.player_health)
+        self._total_gems[i] = world.total_gems
+        self.episode_ticks[i] = 0
+        self.episode_returns[i] = 0.0
+
+    def sample_actions(self) -> np.ndarray:
+        """Ações aleatórias (uniformes) para todos os ambientes."""
+        return self._action_rng.integers(len(ACTIONS), size=self.num_envs)
+
+    def step(self, actions) -> tuple:
+        """
+        Aplica uma ação por ambiente e avança todos ``frame_skip`` ticks.
+
+        Args:
+            actions: Índices em ACTIONS, um por ambiente
+
+        Returns:
+            (obs, rewards, terminated, truncated, info). ``info`` tem
+            'outcome' (VICTORY, GAME_OVER, 'timeout' ou None por ambiente) e
+            'final_obs'. Os arrays retornados são reutilizados a cada step.
+        """
+        weights = self.rewards_table
+        rewards, terminated, truncated = self._rewards, self._terminated, self._truncated
+        outcomes = self._outcomes
+        table = self._inputs
+        for i, world in enumerate(self.worlds):
+            level = self._start_level[i]
+            outcome = None
+            ticks = 0
+            for inputs in table[int(actions[i])]:
+                world.step(inputs)
+                ticks += 1
+                # Porta aberta: o mundo já carregou o próximo nível (ou terminou o jogo)
+                if world.current_level != level or world.outcome is not None:
+                    outcome = eq.GAME_OVER if world.outcome == eq.GAME_OVER else eq.VICTORY
+                    break
+            gems, has_key, health = self._last[i]
+            if outcome == eq.VICTORY:
+                # O nível seguinte já foi carregado: conta o que faltava do nível concluído
+                reward = (weights['gem'] * (self._total_gems[i] - gems)
+                          + weights['key'] * (not has_key) + weights['level'])
+            else:
+                reward = (weights['gem'] * (world.collected_gems - gems)
+                          + weights['key'] * (world.has_key and not has_key)
+                          + weights['damage'] * max(0, health - world.player_health))
+                if outcome == eq.GAME_OVER:
+                    reward += weights['game_over']
+            reward += weights['tick'] * ticks
+            self._last[i] = (world.collected_gems, world.has_key, world.player_health)
+            self.episode_ticks[i] += ticks
+            self.episode_returns[i] += reward
+            rewards[i] = reward
+            terminated[i] = outcome is not None
+            truncated[i] = outcome is None and self.episode_ticks[i] >= self.max_ticks
+            if truncated[i]:
+                outcome = 'timeout'
+            outcomes[i] = outcome
+            if outcome is not None:
+                # Auto-reset: guarda a última observação e já começa o próximo episódio
+                self._observe(i)
+                self.final_obs[i] = self.obs[i]
+                self._reset_env(i)
+            self._observe(i)
+        return self.obs, rewards, terminated, truncated, {'outcome': outcomes, 'final_obs': self.final_obs}
+
+    # ----------------------------------------------------------------
+    # Observações
+    # ----------------------------------------------------------------
+    def _observe(self, i: int) -> None:
+        if self.observation == 'state':
+            self._observe_state(i)
+        else:
+            self._render(i)
+
+    def _observe_state(self, i: int) -> None:
+        world = self.worlds[i]
+        player = world.player
+        px, py = player.x, player.y
+        row = self.obs[i]
+        row[:] = 0.0
+        key, door = world.key, world.door
+        row[:_ENTITY_OFFSET] = (
+            px / world.level_width, py / world.level_height,
+            player.speed_y / eq.MAX_FALL_SPEED, player.on_ground, (2 - player.jump_count) / 2,
+            world.player_health / eq.PLAYER_MAX_HEALTH,
+            world.collected_gems / world.total_gems if world.total_gems else 1.0,
+            world.has_key, world.current_level / max(1, len(world.levels) - 1),
+            key.visible, (key.x - px) / eq.WIDTH, (key.y - py) / eq.HEIGHT,
+            door.visible, (door.x - px) / eq.WIDTH, (door.y - py) / eq.HEIGHT,
+        )
+        offset = _ENTITY_OFFSET
+        gems = [(gem.x, gem.y) for gem in world.gems]
+        engine = world.enemy_engine
+        if engine is not None:
+            enemies = list(zip(engine.x.tolist(), engine.y.tolist()))
+        else:
+            enemies = [(enemy.x, enemy.y) for enemy in world.enemies]
+        for positions, count in ((gems, NEAREST_GEMS), (enemies, NEAREST_ENEMIES)):
+            positions = sorted(positions, key=lambda p: (p[0] - px) ** 2 + (p[1] - py) ** 2)[:count]
+            for x, y in positions:
+                row[offset:offset + 3] = (1.0, (x - px) / eq.WIDTH, (y - py) / eq.HEIGHT)
+                offset += 3
+            offset += 3 * (count - len(positions))
+
+    def _render(self, i: int) -> None:
+        """Desenha o cenário, as entidades e o HUD do ambiente na sua fatia de ``obs``."""
+        world = self.worlds[i]
+        target = self._surfaces[i] if self._canvas is None else self._canvas
+        level = world.current_level
+        layer = self._layers.get(level)
+        if layer is None:
+            # Camada estática no formato das fatias, compartilhada pelos ambientes; cada
+            # ambiente pode estar em uma região diferente do nível, daí os 4 pedaços por ambiente
+            level_data = world.levels[level]
+            layer = self._layers[level] = eq.StaticLayer(
+                level_data['background'], level_data['platforms'], eq.level_size(level_data),
+                like=target, cache_size=max(eq.STATIC_CHUNK_CACHE, 4 * self.num_envs))
+        view = world.render_view(1.0)
+        layer.blit_to(target, (0, 0), view)
+        for _, surf, pos in eq.game_scene_items(view, 1.0, world, self._huds[i]):
+            target.blit(surf, pos)
+        if self._canvas is not None:
+            pygame.transform.scale(self._canvas, self._surfaces[i].get_size(), self._surfaces[i])
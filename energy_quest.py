@@ -7,16 +7,45 @@ Este jogo utiliza Pygame Zero para criar uma experiência de plataforma
 onde o jogador coleta cristais de energia e resolve desafios.
 """
 
+import hashlib
+import json
+import logging
+import math
+import os
 import random
+import sys
+import threading
+import time
+import warnings
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
 
 # Importação defensiva para compatibilidade com diferentes ambientes Pygame Zero
 try:
-    from pygame import Rect
+    import pygame
+    from pygame import Rect, Surface
 except ImportError:
     # Pygame Zero fornece sua própria implementação de Rect
     pass
 
-from pgzero.builtins import Actor
+# NumPy é opcional: sem ele os inimigos são atualizados um a um em Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pgzero import loaders
+from pgzero.builtins import images
+
+logger = logging.getLogger('energy_quest')
+
+# Pasta do jogo. Sob o runner do Pygame Zero (pgzrun), __file__ é sobrescrito
+# pelos builtins do pgzero, mas a raiz dos loaders já aponta para a pasta do jogo.
+if getattr(sys, '_pgzrun', False):
+    GAME_DIR = loaders.root
+else:
+    GAME_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ============================================================
 # CONFIGURAÇÃO DO JOGO
@@ -46,6 +75,9 @@ HEARTS_Y = HUD_MARGIN_TOP
 HEART_CENTER_Y = HUD_MARGIN_TOP + HEART_SIZE // 2
 HUD_TEXT_SIZE = 26
 HUD_TEXT_CENTER_Y = HEART_CENTER_Y
+TEXT_CACHE_SIZE = 128  # Máximo de textos renderizados mantidos em cache (LRU)
+# Fontes preferidas para os textos, em ordem (arquivo em fonts/ ou fonte do sistema)
+TEXT_FONT_CANDIDATES = ('impact', 'arialblack', 'arial')
 
 # ============================================================
 # CONSTANTES DE GAMEPLAY
@@ -57,12 +89,59 @@ ENEMY_HITBOX_HALF = 20
 DOOR_TIP_HITBOX_WIDTH = 50
 DOOR_TIP_HITBOX_HEIGHT = 80
 KEY_MIN_DIST_FROM_DOOR = 100
+GRID_CELL_SIZE = 64  # Tamanho (px) da célula do índice espacial de colisões
+TILE_SIZE = 32  # Tamanho (px) do tile 'tiles/box', usado também pelo terreno em tiles
+USE_TILEMAP_TERRAIN = True  # Converte as plataformas do nível em TileMap no load_level
+
+# ============================================================
+# CÂMERA E NÍVEIS MAIORES QUE A TELA
+# ============================================================
+ENEMY_ACTIVE_MARGIN = 200  # Distância (px) além da tela em que inimigos seguem a cada tick
+OFFSCREEN_ENEMY_INTERVAL = 1  # Inimigos fora da área ativa atualizam a cada N ticks (1 = sempre)
+
+# ============================================================
+# LAÇO DE SIMULAÇÃO
+# ============================================================
+USE_FIXED_TIMESTEP = True  # Simula em ticks de duração fixa, independente do FPS da tela
+SIMULATION_HZ = 60  # Ticks por segundo; as constantes de física e velocidade são por tick
+MAX_CATCHUP_STEPS = 5  # Máximo de ticks simulados em um único frame depois de um atraso
+MAX_PENDING_PRESSES = 2  # Toques da mesma tecla guardados para os próximos ticks (2 = pulo duplo)
+INPUT_RECORDING = False  # Grava seed e entradas de cada partida em RECORDINGS_DIR (ver InputLog)
+RECORDINGS_DIR = 'recordings'  # Pasta das gravações (.eqrec), dentro da pasta do jogo
+
+# ============================================================
+# RENDERIZAÇÃO
+# ============================================================
+DIRTY_RECT_RENDERING = False  # Envia à tela só as regiões alteradas (placas ARM, telas lentas)
+STATIC_CHUNK_CACHE = 6  # Pedaços (do tamanho da tela) da camada estática guardados por nível
+
+# ============================================================
+# PERFIL DE DESEMPENHO
+# ============================================================
+PROFILER_ENABLED = False  # Mede as zonas desde o início; F3 liga/desliga o overlay durante o jogo
+PROFILER_HISTORY = 120  # Frames considerados nas médias do overlay e no gráfico
+PROFILER_MAX_EVENTS = 200_000  # Eventos guardados para o trace (os mais antigos são descartados)
+PROFILER_TRACE_FILE = 'energy_quest_trace.json'  # Gravado na pasta do jogo com F4
+
+# ============================================================
+# ÁUDIO
+# ============================================================
+AUDIO_FREQUENCY = 44100  # Hz, a taxa dos arquivos em sounds/ (sem reamostragem ao carregar)
+AUDIO_BUFFER = 256  # Amostras por bloco do mixer (256 / 44100 Hz ≈ 6 ms até a saída)
+AUDIO_CHANNELS = 8  # Canais fixos do mixer reservados aos efeitos
+SOUND_DEFAULT_VOICES = 1  # Vozes simultâneas de um mesmo efeito, salvo em SOUND_VOICE_LIMITS
+SOUND_VOICE_LIMITS = {'coletar_cristal': 3, 'som_pulo': 2, 'colisao': 2}
+# Prioridade de cada efeito: sem canal livre, um som só interrompe outro de prioridade menor ou igual
+SOUND_PRIORITIES = {'fim_de_jogo': 3, 'som_alavanca': 2, 'coletar_cristal': 2, 'menu_click': 2,
+                    'tutorial_open': 2, 'som_pulo': 1, 'colisao': 1}
+SOUND_LATENCY_HISTORY = 256  # Medidas de latência entrada -> som guardadas
 
 # ============================================================
 # CONSTANTES DOS INIMIGOS
 # ============================================================
 ENEMY_SPEED = 2
 ENEMY_DAMAGE = 2
+ENEMY_ENGINE_THRESHOLD = 32  # A partir de quantos inimigos o nível usa o EnemyEngine (NumPy)
 
 # ============================================================
 # ESTADOS DO JOGO
@@ -77,147 +156,213 @@ TUTORIAL = "tutorial"
 # VARIÁVEIS GLOBAIS DO JOGO
 # ============================================================
 game_state = MENU
-player_health = PLAYER_MAX_HEALTH
-collected_gems = 0
-total_gems = 0
-has_key = False
 music_enabled = True
 sound_enabled = True
-current_level = 0
-door_tip_active = False
 intro_music_started = False
+runtime_ready = False  # Sprites, fonte, sons e janela já preparados (ver prepare_runtime)
+sim_accumulator = 0.0  # Tempo real (s) ainda não simulado no passo fixo
+render_alpha = 1.0  # Fração do tick atual já decorrida, usada para interpolar o desenho
+pending_jumps = 0  # Toques de tecla aguardando os próximos ticks (um por tick)
+pending_drops = 0
+pending_interacts = 0
+input_log = None  # InputLog da partida sendo gravada (com INPUT_RECORDING)
 
 # ============================================================
-# DEFINIÇÃO DOS NÍVEIS DO JOGO
+# ARQUIVOS DE NÍVEL
 # ============================================================
-# Cada nível contém plataformas, gemas, inimigos, chave e porta
-levels = [
-    {
-        'background': 'backgrounds/background_color_trees',
-        'music': 'grasslands_theme',
-        'platforms': [
-            Rect(100, 450, 200, 20),
-            Rect(400, 450, 200, 20),
-            Rect(200, 350, 150, 20),
-            Rect(500, 350, 150, 20),
-            Rect(0, HEIGHT - 20, WIDTH, 20),  # Piso de segurança
-        ],
-        'gems': [
-            {'pos': (150, 400), 'color': 'blue'},
-            {'pos': (450, 400), 'color': 'red'},
-            {'pos': (250, 300), 'color': 'green'}
-        ],
-        'key_pos': (550, 300),
-        'key_color': 'blue',
-        'door_pos': (700, 400),
-        'enemies': [
-            {'type': 'pink', 'patrol': [(500, 350), (650, 350)]}  # Apenas 1 inimigo no nível inicial
-        ]
-    },
-    {
-        'background': 'backgrounds/background_color_desert',
-        'music': 'desert_theme',
-        'platforms': [
-            Rect(50, 450, 150, 20),
-            Rect(300, 450, 200, 20),
-            Rect(600, 450, 150, 20),
-            Rect(200, 350, 100, 20),
-            Rect(500, 350, 100, 20),
-            Rect(0, HEIGHT - 20, WIDTH, 20),  # Piso de segurança
-        ],
-        'gems': [
-            {'pos': (100, 400), 'color': 'yellow'},
-            {'pos': (350, 400), 'color': 'green'},
-            {'pos': (650, 400), 'color': 'red'},
-            {'pos': (250, 300), 'color': 'blue'}
-        ],
-        'key_pos': (550, 300),
-        'key_color': 'red',
-        'door_pos': (750, 400),
-        'enemies': [
-            {'type': 'beige', 'patrol': [(50, 450), (200, 450)]},
-            {'type': 'pink', 'patrol': [(300, 450), (500, 450)]},
-            {'type': 'purple', 'patrol': [(600, 450), (750, 450)]}
-        ]
-    },
-    {
-        'background': 'backgrounds/background_color_mushrooms',
-        'music': 'mushroom_theme',
-        'platforms': [
-            Rect(80, 460, 180, 18),
-            Rect(320, 420, 160, 18),
-            Rect(560, 380, 160, 18),
-            Rect(240, 300, 120, 18),
-            Rect(480, 260, 120, 18),
-            Rect(0, HEIGHT - 20, WIDTH, 20),
-        ],
-        'gems': [
-            {'pos': (120, 420), 'color': 'blue'},
-            {'pos': (360, 380), 'color': 'green'},
-            {'pos': (600, 340), 'color': 'yellow'},
-            {'pos': (260, 260), 'color': 'red'}
-        ],
-        'key_pos': (500, 220),
-        'key_color': 'yellow',
-        'door_pos': (740, 360),
-        'enemies': [
-            {'type': 'pink', 'patrol': [(320, 420), (480, 420)]},
-            {'type': 'purple', 'patrol': [(560, 380), (720, 380)]}
-        ]
-    },
-    {
-        'background': 'backgrounds/background_clouds',
-        'music': 'jungle_theme',
-        'platforms': [
-            Rect(60, 460, 160, 18),
-            Rect(260, 430, 180, 18),
-            Rect(520, 400, 180, 18),
-            Rect(180, 320, 140, 18),
-            Rect(420, 280, 140, 18),
-            Rect(0, HEIGHT - 20, WIDTH, 20),
-        ],
-        'gems': [
-            {'pos': (100, 420), 'color': 'red'},
-            {'pos': (300, 390), 'color': 'blue'},
-            {'pos': (560, 360), 'color': 'green'},
-            {'pos': (200, 280), 'color': 'yellow'}
-        ],
-        'key_pos': (440, 240),
-        'key_color': 'green',
-        'door_pos': (760, 360),
-        'enemies': [
-            {'type': 'beige', 'patrol': [(60, 460), (220, 460)]},
-            {'type': 'pink', 'patrol': [(260, 430), (440, 430)]},
-            {'type': 'purple', 'patrol': [(520, 400), (700, 400)]}
-        ]
-    },
-    {
-        'background': 'backgrounds/background_color_trees',
-        'music': 'dungeon_theme',
-        'platforms': [
-            Rect(100, 470, 180, 18),
-            Rect(360, 430, 180, 18),
-            Rect(620, 390, 150, 18),
-            Rect(280, 320, 140, 18),
-            Rect(520, 280, 140, 18),
-            Rect(0, HEIGHT - 20, WIDTH, 20),
-        ],
-        'gems': [
-            {'pos': (140, 430), 'color': 'blue'},
-            {'pos': (400, 390), 'color': 'yellow'},
-            {'pos': (660, 350), 'color': 'red'},
-            {'pos': (300, 280), 'color': 'green'}
-        ],
-        'key_pos': (540, 240),
-        'key_color': 'red',
-        'door_pos': (740, 350),
-        'enemies': [
-            {'type': 'beige', 'patrol': [(360, 430), (540, 430)]},
-            {'type': 'pink', 'patrol': [(620, 390), (760, 390)]},
-            {'type': 'purple', 'patrol': [(100, 470), (280, 470)]}
-        ]
+# Cada nível fica em um arquivo próprio na pasta levels/, listado em levels/index.json.
+# O formato é JSON por linha: a primeira linha é o cabeçalho versionado e cada linha
+# seguinte é um registro compacto ("p" plataforma, "g" gema, "e" inimigo), o que
+# permite ler e montar níveis grandes em blocos sem carregar o arquivo inteiro.
+LEVELS_DIR = os.path.join(GAME_DIR, 'levels')
+LEVEL_FORMAT = 'energy-quest-level'
+LEVEL_FORMAT_VERSION = 1
+LEVEL_CHUNK_RECORDS = 256  # Registros lidos por bloco ao montar um nível
+LEVEL_CACHE_SIZE = 2  # Níveis já montados mantidos em memória pelo catálogo
+
+def iter_level_chunks(path: str, chunk_size: int = LEVEL_CHUNK_RECORDS):
+    """
+    Lê um arquivo de nível em blocos.
+
+    Args:
+        path: Caminho do arquivo de nível
+        chunk_size: Quantidade máxima de registros por bloco
+
+    Yields:
+        Primeiro o cabeçalho (dict); depois listas de até chunk_size registros
+
+    Raises:
+        ValueError: Se o arquivo não for um nível ou tiver versão não suportada
+    """
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline() or 'null')
+        if not isinstance(header, dict) or header.get('format') != LEVEL_FORMAT:
+            raise ValueError(f"{path}: não é um arquivo de nível do Energy Quest")
+        if header.get('version') != LEVEL_FORMAT_VERSION:
+            raise ValueError(f"{path}: versão de nível não suportada: {header.get('version')}")
+        yield header
+        chunk = []
+        for line in f:
+            if not line.strip():
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def load_level_file(path: str) -> dict:
+    """Monta o dicionário de um nível a partir do arquivo, bloco a bloco."""
+    chunks = iter_level_chunks(path)
+    header = next(chunks)
+    level = {
+        'background': header['background'],
+        'music': header['music'],
+        'key_color': header['key_color'],
+        'key_pos': tuple(header['key_pos']),
+        'door_pos': tuple(header['door_pos']),
+        'platforms': [],
+        'gems': [],
+        'enemies': [],
     }
-]
+    if 'width' in header:
+        level['width'] = header['width']
+    if 'height' in header:
+        level['height'] = header['height']
+    platforms, gems, enemies = level['platforms'], level['gems'], level['enemies']
+    for chunk in chunks:
+        for record in chunk:
+            kind = record[0]
+            if kind == 'p':
+                platforms.append(Rect(record[1], record[2], record[3], record[4]))
+            elif kind == 'g':
+                gems.append({'pos': (record[1], record[2]), 'color': record[3]})
+            elif kind == 'e':
+                enemies.append({'type': record[1], 'patrol': [tuple(pt) for pt in record[2]]})
+            else:
+                raise ValueError(f"{path}: registro desconhecido: {kind!r}")
+    return level
+
+class LevelCatalog:
+    """
+    Lista de níveis lida de levels/index.json, montando cada nível só quando acessado.
+
+    Se comporta como uma lista de dicionários de nível (len(), índice e
+    iteração), mas guarda apenas o índice e os últimos níveis montados,
+    então a memória não cresce com o tamanho do catálogo.
+
+    Attributes:
+        directory: Pasta com index.json e os arquivos de nível
+        entries: Entradas do índice (cada uma com a chave 'file')
+    """
+
+    def __init__(self, directory: str = LEVELS_DIR, cache_size: int = LEVEL_CACHE_SIZE):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # O pré-carregador lê níveis em outra thread
+        with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != LEVEL_FORMAT_VERSION:
+            raise ValueError(f"{directory}: versão de índice não suportada: {index.get('version')}")
+        self.entries = index['levels']
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def path(self, level_index: int) -> str:
+        """Retorna o caminho do arquivo do nível."""
+        return os.path.join(self.directory, self.entries[level_index]['file'])
+
+    def __getitem__(self, level_index: int) -> dict:
+        if level_index < 0:
+            level_index += len(self.entries)
+        if not 0 <= level_index < len(self.entries):
+            raise IndexError(level_index)
+        with self._lock:
+            level = self._cache.get(level_index)
+            if level is None:
+                level = self._cache[level_index] = load_level_file(self.path(level_index))
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(level_index)
+        return level
+
+levels = LevelCatalog()
+
+# ============================================================
+# REGISTRO DE SPRITES
+# ============================================================
+# Meia-hitbox (largura, altura) por prefixo de sprite; os demais usam meio tamanho
+SPRITE_HITBOX_HALF = {
+    'items/gem_': (GEM_HITBOX_HALF, GEM_HITBOX_HALF),
+    'items/key_': (KEY_HITBOX_HALF, KEY_HITBOX_HALF),
+    'items/door_': (DOOR_TIP_HITBOX_WIDTH // 2, DOOR_TIP_HITBOX_HEIGHT // 2),
+    'enemies/': (ENEMY_HITBOX_HALF, ENEMY_HITBOX_HALF),
+}
+
+class SpriteInfo:
+    """
+    Metadados pré-calculados de uma imagem do jogo.
+
+    Attributes:
+        surface: Superfície carregada pelo Pygame Zero
+        width, height: Tamanho da imagem
+        half_w, half_h: Metade do tamanho (divisão inteira)
+        offset: Deslocamento do centro até o canto superior esquerdo
+        hit_half_w, hit_half_h: Meia largura/altura da hitbox usada nas colisões
+    """
+
+    __slots__ = ('surface', 'width', 'height', 'half_w', 'half_h', 'offset',
+                 'hit_half_w', 'hit_half_h')
+
+    def __init__(self, name: str, surface):
+        self.surface = surface
+        self.width, self.height = surface.get_size()
+        self.half_w, self.half_h = self.width // 2, self.height // 2
+        self.offset = (-self.half_w, -self.half_h)
+        if name.startswith('player/'):
+            # Hitbox ligeiramente menor que o sprite visual para melhor sensação de colisão
+            self.hit_half_w = max(12, int(self.half_w * 0.6))
+            self.hit_half_h = max(18, int(self.half_h * 0.85))
+        else:
+            self.hit_half_w, self.hit_half_h = next(
+                (hb for prefix, hb in SPRITE_HITBOX_HALF.items() if name.startswith(prefix)),
+                (self.half_w, self.half_h),
+            )
+
+sprites = {}
+
+def get_sprite(name: str):
+    """
+    Retorna os metadados de uma imagem, registrando-a no primeiro acesso.
+
+    Returns:
+        SpriteInfo da imagem, ou None se ela não puder ser carregada agora
+        (por exemplo, antes de existir uma janela/superfície de vídeo)
+    """
+    info = sprites.get(name)
+    if info is None:
+        try:
+            info = sprites[name] = SpriteInfo(name, images.load(name))
+        except Exception:
+            return None
+    return info
+
+def build_sprite_registry() -> None:
+    """Registra de uma vez todas as imagens da pasta images/ (exceto screenshots)."""
+    root = os.path.join(GAME_DIR, 'images')
+    for folder, _, files in os.walk(root):
+        rel_folder = os.path.relpath(folder, root).replace(os.sep, '/')
+        if rel_folder.startswith('screenshots'):
+            continue
+        for filename in files:
+            base, ext = os.path.splitext(filename)
+            if ext.lower() != '.png':
+                continue
+            get_sprite(base if rel_folder == '.' else f'{rel_folder}/{base}')
 
 def get_image_half_size(name: str, default: tuple[int, int]) -> tuple[int, int]:
     """
@@ -230,26 +375,27 @@ def get_image_half_size(name: str, default: tuple[int, int]) -> tuple[int, int]:
     Returns:
         Tupla com (largura/2, altura/2) da imagem
     """
-    try:
-        surf = images.load(name)
-        return surf.get_width() // 2, surf.get_height() // 2
-    except Exception:
+    info = get_sprite(name)
+    if info is None:
         return default
+    return info.half_w, info.half_h
 
-player = None
 PLAYER_HALF_W, PLAYER_HALF_H = get_image_half_size('player/prof_bolota_idle', (20, 20))
 
 # Hitbox ligeiramente menor que o sprite visual para melhor sensação de colisão
 PLAYER_HIT_W = max(12, int(PLAYER_HALF_W * 0.6))
 PLAYER_HIT_H = max(18, int(PLAYER_HALF_H * 0.85))
 
-door = None
-door_open = False
-key = None
+def update_player_metrics() -> None:
+    """Recalcula meia-largura, meia-altura e hitbox do jogador a partir do sprite."""
+    global PLAYER_HALF_W, PLAYER_HALF_H, PLAYER_HIT_W, PLAYER_HIT_H
+    info = get_sprite('player/prof_bolota_idle')
+    if info is None:
+        return
+    PLAYER_HALF_W, PLAYER_HALF_H = info.half_w, info.half_h
+    PLAYER_HIT_W, PLAYER_HIT_H = info.hit_half_w, info.hit_half_h
 
-enemies = []
-gems = []
-platforms = []
+static_layer = None
 
 menu_buttons = []
 game_over_buttons = []
@@ -271,173 +417,2794 @@ class Button:
         self.text = text
         self.action = action
         self.hover = False
+        self._surfaces = {}
     
+    def render(self) -> Surface:
+        """Retorna a imagem do botão no estado atual (texto e hover), guardada em cache."""
+        key = (self.text, self.hover)
+        surf = self._surfaces.get(key)
+        if surf is None:
+            bg = (70, 70, 90) if self.hover else (45, 45, 60)
+            border = (20, 20, 30)
+            surf = Surface(self.rect.size)
+            try:
+                surf = surf.convert()
+            except Exception:
+                pass
+            surf.fill(bg)
+            pygame.draw.rect(surf, border, surf.get_rect(), 1)
+            text_surf, (x, y) = text_blit(self.text, center=self.rect.center, color=(255, 255, 255), fontsize=28)
+            surf.blit(text_surf, (x - self.rect.x, y - self.rect.y))
+            self._surfaces[key] = surf
+        return surf
+
     def draw(self):
-        bg = (70, 70, 90) if self.hover else (45, 45, 60)
-        border = (20, 20, 30)
-        screen.draw.filled_rect(self.rect, bg)
-        screen.draw.rect(self.rect, border)
-        draw_text_fallback(self.text, center=self.rect.center, color=(255, 255, 255), fontsize=28)
+        screen.blit(self.render(), self.rect.topleft)
+
+def make_buttons(base_x: int, base_y: int, width: int, height: int,
+                 items: list[tuple[str, callable]], spacing: int = 60) -> list:
+    """
+    Cria uma lista de botões alinhados verticalmente.
+    
+    Args:
+        base_x: Posição X inicial
+        base_y: Posição Y inicial
+        width: Largura de cada botão
+        height: Altura de cada botão
+        items: Lista de tuplas (texto, função_callback)
+        spacing: Espaçamento vertical entre botões
+    
+    Returns:
+        Lista de objetos Button
+    """
+    buttons = []
+    for i, (text, action) in enumerate(items):
+        y = base_y + i * spacing
+        buttons.append(Button(base_x, y, width, height, text, action))
+    return buttons
+
+def align_buttons_vertical(buttons: list, base_y: int, spacing: int = 60) -> None:
+    """Realinha botões existentes verticalmente a partir de uma nova posição Y."""
+    for i, btn in enumerate(buttons):
+        btn.rect.y = base_y + i * spacing
+
+def init_screen_buttons(button_list_name: str, items: list[tuple[str, callable]], 
+                        base_y: int = None, width: int = 280, height: int = 44, 
+                        spacing: int = 60) -> list:
+    """Inicializa botões centralizados horizontalmente para uma tela."""
+    if base_y is None:
+        base_y = HEIGHT // 2 - 20
+    
+    base_x = WIDTH // 2 - width // 2
+    return make_buttons(base_x, base_y, width, height, items, spacing)
+
+def init_game_over_buttons():
+    """Inicializa os botões da tela de Game Over."""
+    global game_over_buttons
+    items = [("Reiniciar", restart_level), ("Voltar ao menu", back_to_menu)]
+    game_over_buttons = init_screen_buttons('game_over', items)
+
+def restart_level():
+    """Reinicia o nível atual mantendo o progresso."""
+    set_state(PLAYING)
+    load_level(world.current_level)
+
+def back_to_menu():
+    """Retorna ao menu principal, resetando o estado do jogo."""
+    global game_state, intro_music_started
+    
+    # Para a música antes de limpar as variáveis
+    try:
+        music.stop()
+    except Exception:
+        pass
+    
+    # Reseta variáveis globais para novo jogo
+    world.current_level = 0
+    intro_music_started = False
+    reset_menu_context()
+    init_menu_buttons()
+    set_state(MENU)
+
+def init_victory_buttons():
+    """Inicializa os botões da tela de vitória."""
+    global victory_buttons
+    items = [("Jogar novamente", play_again), ("Voltar ao menu", back_to_menu)]
+    victory_buttons = init_screen_buttons('victory', items, base_y=380, spacing=60)
+
+def play_again():
+    """Reinicia o jogo desde o primeiro nível."""
+    set_state(PLAYING)
+    load_level(0)
+
+def play_victory_music():
+    """Reproduz a música de vitória ao completar todos os níveis."""
+    if not music_enabled:
+        return
+    music.play('congrats')
+
+def draw_fullscreen_background(image_name: str) -> None:
+    """Preenche a tela repetindo tiles do fundo para cobrir toda a área."""
+    info = get_sprite(image_name)
+    if info is None:
+        screen.blit(image_name, (0, 0))
+        return
+    for x in range(0, WIDTH, info.width):
+        for y in range(0, HEIGHT, info.height):
+            screen.blit(info.surface, (x, y))
+
+class StaticLayer:
+    """
+    Fundo e plataformas de um nível, compostos em pedaços do tamanho da tela.
+
+    Nada disso muda durante o nível, então draw_game() desenha o cenário com
+    poucos blits em vez de repetir os tiles a cada frame. Cada pedaço só é
+    renderizado quando a câmera chega nele, e os que saem de vista são
+    descartados além de ``cache_size``, de modo que níveis largos não ocupam
+    uma superfície do tamanho do nível inteiro.
+
+    Attributes:
+        width: Largura do nível
+        height: Altura do nível
+    """
+
+    def __init__(self, background: str, platform_list: list,
+                 size: tuple[int, int] = (WIDTH, HEIGHT), like: Surface = None,
+                 cache_size: int = STATIC_CHUNK_CACHE):
+        """
+        Args:
+            background: Caminho da imagem de fundo (repetida até cobrir o nível)
+            platform_list: Retângulos das plataformas, preenchidos com 'tiles/box'
+            size: Tamanho do nível (largura, altura)
+            like: Superfície cujo formato os pedaços copiam (None = formato da tela)
+            cache_size: Máximo de pedaços guardados
+        """
+        self.width, self.height = size
+        self._background = background
+        self._platforms = list(platform_list)
+        self._like = like
+        self._cache_size = max(4, cache_size)  # A câmera cobre até 4 pedaços
+        self._chunks = OrderedDict()
+
+    def get_size(self) -> tuple[int, int]:
+        """Tamanho do nível coberto pela camada."""
+        return self.width, self.height
+
+    def _chunk(self, col: int, row: int) -> Surface:
+        """Pedaço (col, row) da camada, renderizado na primeira vez que é pedido."""
+        key = (col, row)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        left, top = col * WIDTH, row * HEIGHT
+        area = Rect(left, top, min(WIDTH, self.width - left), min(HEIGHT, self.height - top))
+        chunk = Surface(area.size)
+        try:
+            chunk = chunk.convert(self._like) if self._like is not None else chunk.convert()
+        except Exception:
+            pass
+        # Tiles alinhados à origem do nível, como se o nível fosse uma única superfície
+        bg = get_sprite(self._background)
+        if bg is not None:
+            for x in range(left - left % bg.width, area.right, bg.width):
+                for y in range(top - top % bg.height, area.bottom, bg.height):
+                    chunk.blit(bg.surface, (x - left, y - top))
+        box = get_sprite('tiles/box')
+        if box is not None:
+            for rect in self._platforms:
+                # O último tile de cada linha e coluna pode passar da borda da plataforma
+                covered = Rect(rect.left, rect.top,
+                               -(-rect.width // box.width) * box.width,
+                               -(-rect.height // box.height) * box.height)
+                if not covered.colliderect(area):
+                    continue
+                for x in range(rect.left, rect.right, box.width):
+                    if x + box.width <= left or x >= area.right:
+                        continue
+                    for y in range(rect.top, rect.bottom, box.height):
+                        if y + box.height > top and y < area.bottom:
+                            chunk.blit(box.surface, (x - left, y - top))
+        self._chunks[key] = chunk
+        while len(self._chunks) > self._cache_size:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def blit_to(self, target: Surface, dest: tuple[int, int], area: Rect) -> None:
+        """
+        Desenha uma região da camada, como ``target.blit(camada, dest, area)``.
+
+        Args:
+            target: Superfície de destino
+            dest: Posição na superfície de destino
+            area: Região do nível a desenhar
+        """
+        area = Rect(area).clip(Rect(0, 0, self.width, self.height))
+        if not area.width or not area.height:
+            return
+        dx, dy = dest[0] - area.x, dest[1] - area.y
+        for col in range(area.left // WIDTH, (area.right - 1) // WIDTH + 1):
+            for row in range(area.top // HEIGHT, (area.bottom - 1) // HEIGHT + 1):
+                left, top = col * WIDTH, row * HEIGHT
+                part = area.clip(Rect(left, top, WIDTH, HEIGHT))
+                target.blit(self._chunk(col, row), (part.x + dx, part.y + dy),
+                            part.move(-left, -top))
+
+    def warm(self, area: Rect) -> None:
+        """Renderiza de antemão os pedaços que cobrem ``area`` (usado pelo pré-carregador)."""
+        area = Rect(area).clip(Rect(0, 0, self.width, self.height))
+        if not area.width or not area.height:
+            return
+        for col in range(area.left // WIDTH, (area.right - 1) // WIDTH + 1):
+            for row in range(area.top // HEIGHT, (area.bottom - 1) // HEIGHT + 1):
+                self._chunk(col, row)
+
+def render_static_layer(background: str, platform_list: list,
+                        size: tuple[int, int] = (WIDTH, HEIGHT)) -> StaticLayer:
+    """
+    Cria a camada estática de um nível (fundo e plataformas).
+
+    Args:
+        background: Caminho da imagem de fundo (repetida até cobrir o nível)
+        platform_list: Retângulos das plataformas, preenchidos com 'tiles/box'
+        size: Tamanho do nível (largura, altura)
+
+    Returns:
+        StaticLayer cujos pedaços são renderizados conforme a câmera os mostra
+    """
+    return StaticLayer(background, platform_list, size)
+
+def render_level_layer(level: dict) -> StaticLayer:
+    """
+    Cria a camada estática de um nível (também usada pelo pré-carregador).
+
+    Já renderiza os pedaços da vista inicial, no canto inferior esquerdo do
+    nível, para que a troca de nível não espere por eles.
+    """
+    level_w, level_h = level_size(level)
+    layer = render_static_layer(level['background'], level['platforms'], (level_w, level_h))
+    layer.warm(Rect(0, max(0, level_h - HEIGHT), WIDTH, HEIGHT))
+    return layer
+
+def build_static_layer(level: dict) -> None:
+    """Gera a camada estática do nível recém-carregado (chamado por load_level)."""
+    global static_layer
+    prepared = world.prepared
+    if prepared is not None and prepared.level is level and prepared.static_layer is not None:
+        static_layer = prepared.static_layer
+    else:
+        static_layer = render_level_layer(level)
+
+text_font_path = None      # Arquivo da fonte escolhida (None = fonte padrão do Pygame)
+text_font_resolved = False
+_font_objects = {}
+_text_cache = OrderedDict()
+
+def resolve_text_font() -> None:
+    """
+    Escolhe uma única vez a fonte usada por todos os textos do jogo.
+
+    Testa os nomes de TEXT_FONT_CANDIDATES primeiro na pasta fonts/ do jogo e
+    depois entre as fontes do sistema; se nenhum existir, usa a fonte padrão
+    do Pygame, o que é registrado no log como aviso.
+    """
+    global text_font_path, text_font_resolved
+    if not pygame.font.get_init():
+        pygame.font.init()
+    fonts_dir = os.path.join(GAME_DIR, 'fonts')
+
+    chosen = None
+    for name in TEXT_FONT_CANDIDATES:
+        local = os.path.join(fonts_dir, name + '.ttf')
+        if os.path.isfile(local):
+            chosen = local
+            break
+        with warnings.catch_warnings():
+            # Sem fc-list o Pygame apenas avisa que não há fontes do sistema
+            warnings.simplefilter('ignore')
+            try:
+                found = pygame.font.match_font(name)
+            except Exception:
+                found = None
+        if found:
+            chosen = found
+            break
+
+    text_font_path = chosen
+    text_font_resolved = True
+    _font_objects.clear()
+    _text_cache.clear()
+    if chosen is None:
+        logger.warning("Nenhuma fonte de %s encontrada; usando a fonte padrão do Pygame",
+                       ", ".join(TEXT_FONT_CANDIDATES))
+
+def get_text_font(fontsize: int):
+    """Retorna o objeto Font da fonte resolvida no tamanho pedido (criado uma vez por tamanho)."""
+    font = _font_objects.get(fontsize)
+    if font is None:
+        if not text_font_resolved:
+            resolve_text_font()
+        try:
+            font = pygame.font.Font(text_font_path, fontsize)
+        except Exception:
+            font = pygame.font.Font(None, fontsize)
+        _font_objects[fontsize] = font
+    return font
+
+def render_text(text: str, fontsize: int, color,
+                shadow_color=None, shadow_offset: int = 0) -> Surface:
+    """
+    Renderiza um texto (com sombra opcional) usando um cache LRU de superfícies.
+
+    A sombra é desenhada nas quatro direções (esquerda, direita, cima, baixo)
+    e embutida na mesma superfície, de modo que o texto sombreado custa um
+    único blit depois da primeira renderização.
+
+    Args:
+        text: Texto a renderizar
+        fontsize: Tamanho da fonte
+        color: Cor do texto
+        shadow_color: Cor da sombra (None desativa a sombra)
+        shadow_offset: Deslocamento da sombra em pixels
+
+    Returns:
+        Superfície com o texto; com sombra, cresce shadow_offset em cada lado
+    """
+    cache_key = (text, text_font_path, fontsize, color, shadow_color, shadow_offset)
+    surf = _text_cache.get(cache_key)
+    if surf is not None:
+        _text_cache.move_to_end(cache_key)
+        return surf
+
+    font = get_text_font(fontsize)
+    base = font.render(text, True, color).convert_alpha()
+    if shadow_color is None or shadow_offset <= 0:
+        surf = base
+    else:
+        shade = font.render(text, True, shadow_color).convert_alpha()
+        o = shadow_offset
+        w, h = base.get_size()
+        surf = Surface((w + 2 * o, h + 2 * o)).convert_alpha()
+        surf.fill((0, 0, 0, 0))
+        for dx, dy in [(-o, 0), (o, 0), (0, -o), (0, o)]:
+            surf.blit(shade, (o + dx, o + dy))
+        surf.blit(base, (o, o))
+
+    # A chave usa a fonte efetiva (resolvida em get_text_font)
+    _text_cache[(text, text_font_path, fontsize, color, shadow_color, shadow_offset)] = surf
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return surf
+
+def text_blit(text: str, center: tuple = None, fontsize: int = 24, color="white",
+              shadow_color=None, shadow_offset: int = 0, midleft: tuple = None) -> tuple:
+    """Retorna (superfície, posição) de um texto centralizado (ou alinhado por ``midleft``), sem desenhá-lo."""
+    surf = render_text(text, fontsize, color, shadow_color, shadow_offset)
+    if midleft is not None:
+        x = int(round(midleft[0]))
+        y = int(round(midleft[1] - surf.get_height() / 2))
+    else:
+        x = int(round(center[0] - surf.get_width() / 2))
+        y = int(round(center[1] - surf.get_height() / 2))
+    return surf, (x, y)
+
+def draw_text_fallback(text: str, center: tuple = None, fontsize: int = 24, color="white",
+                       shadow_color=None, shadow_offset: int = 0, midleft: tuple = None) -> None:
+    """Desenha texto centralizado (ou alinhado por ``midleft``) na fonte escolhida por resolve_text_font(), usando o cache de textos."""
+    screen.blit(*text_blit(text, center, fontsize, color, shadow_color, shadow_offset, midleft))
+
+
+def reset_menu_context() -> None:
+    """Reseta todas as variáveis de estado do nível atual."""
+    stop_recording()
+    world.reset()
+
+def level_size(level: dict) -> tuple[int, int]:
+    """Retorna (largura, altura) do nível; níveis sem 'width'/'height' têm o tamanho da tela."""
+    return level.get('width', WIDTH), level.get('height', HEIGHT)
+
+def _get_spawnable_platforms(platform_list, level_height: int = HEIGHT):
+    """Filtra plataformas válidas para spawnar objetos, excluindo o piso de segurança."""
+    return [p for p in platform_list if p.top < level_height - 25 and p.width >= 40]
+
+def _get_start_platform(platform_list, level_width: int = WIDTH, level_height: int = HEIGHT) -> Rect:
+    """Retorna o piso onde o jogador começa (um piso padrão se o nível não tiver)."""
+    return next((p for p in platform_list if p.top >= level_height - 25),
+                Rect(0, level_height - 20, level_width, 20))
+
+
+def blit_scaled(image_name: str, topleft: tuple[int,int], size: tuple[int,int]) -> None:
+    """Desenha imagem centralizada dentro de uma área especificada."""
+    info = get_sprite(image_name)
+    if info is None:
+        screen.blit(image_name, topleft)
+        return
+    screen.blit(info.surface, (topleft[0] + size[0] // 2 - info.half_w,
+                               topleft[1] + size[1] // 2 - info.half_h))
+
+def draw_platform_tiled(rect: Rect, offset: tuple[int, int] = (0, 0)) -> None:
+    """Desenha plataforma preenchendo o retângulo com tiles repetidos (deslocada pela câmera)."""
+    info = get_sprite('tiles/box')
+    if info is None:
+        return
+    ox, oy = offset
+    for x in range(rect.left, rect.right, info.width):
+        for y in range(rect.top, rect.bottom, info.height):
+            screen.blit(info.surface, (x - ox, y - oy))
+
+def entity_blit(entity, view: Rect, pos: tuple[float, float] = None):
+    """
+    Calcula onde uma entidade aparece na tela.
+
+    Args:
+        entity: Entidade a desenhar (usa o sprite de ``entity.image``)
+        view: Retângulo da câmera em coordenadas do nível
+        pos: Posição de desenho (interpolada); por padrão a posição da entidade
+
+    Returns:
+        Tupla (superfície, posição na tela), ou None se a entidade estiver fora da câmera
+    """
+    info = entity.sprite
+    if info is None:
+        return None
+    x, y = pos if pos is not None else (entity.x, entity.y)
+    left = x - info.width / 2
+    top = y - info.height / 2
+    if (left >= view.right or top >= view.bottom
+            or left + info.width <= view.left or top + info.height <= view.top):
+        return None
+    return info.surface, (int(left - view.x), int(top - view.y))
+
+
+# ============================================================
+# RENDERIZAÇÃO POR RETÂNGULOS SUJOS
+# ============================================================
+class DirtyRectRenderer:
+    """
+    Redesenha e envia à tela só as regiões que mudaram desde o frame anterior.
+
+    Na tela de jogo recebe, a cada frame, a lista de itens desenhados sobre a
+    camada estática (sprites e textos do HUD). Para cada item que mudou de
+    imagem ou posição, apareceu ou sumiu, restaura o fundo da região a partir
+    da camada estática e redesenha os itens que a tocam. Telas sem animação
+    (menu, tutorial, fim de jogo, vitória) só são redesenhadas quando a chave
+    que descreve seu conteúdo muda.
+
+    Attributes:
+        bounds: Retângulo da tela
+        rects: Regiões alteradas no último frame (None = tela inteira)
+    """
+
+    def __init__(self, size: tuple[int, int] = (WIDTH, HEIGHT)):
+        self.bounds = Rect(0, 0, size[0], size[1])
+        self.rects = None
+        self._scene = None  # O que foi desenhado por completo (tela estática ou cenário + câmera)
+        self._items = {}
+
+    def invalidate(self) -> None:
+        """Força o redesenho completo no próximo frame."""
+        self._scene = None
+        self._items = {}
+        self.rects = None
+
+    def mark(self, rects: list) -> None:
+        """Acrescenta regiões alteradas ao frame atual (ignorado se ele já é de tela inteira)."""
+        if self.rects is not None:
+            self.rects.extend(rects)
+
+    def begin_static(self, key) -> bool:
+        """
+        Prepara o frame de uma tela estática.
+
+        Args:
+            key: Identifica a tela e seus botões; diferente do frame anterior = redesenho completo
+
+        Returns:
+            True se a tela precisa ser redesenhada por completo
+        """
+        if key == self._scene:
+            self.rects = []
+            return False
+        self.invalidate()
+        self._scene = key
+        return True
+
+    def draw_scene(self, target: Surface, background: StaticLayer, view: Rect, items: list) -> None:
+        """
+        Desenha um frame da tela de jogo atualizando só o que mudou.
+
+        Args:
+            target: Superfície da tela
+            background: Camada estática do nível
+            view: Retângulo da câmera (a região do fundo mostrada na tela)
+            items: Tuplas (chave, superfície, posição na tela) em ordem de desenho
+        """
+        scene = (background, view.topleft)
+        if scene != self._scene:
+            background.blit_to(target, (0, 0), view)
+            for _, surf, pos in items:
+                target.blit(surf, pos)
+            self._scene = scene
+            self._items = {key: (surf, pos) for key, surf, pos in items}
+            self.rects = None
+            return
+
+        previous = self._items
+        current = {}
+        dirty = []
+        for key, surf, pos in items:
+            current[key] = (surf, pos)
+            old = previous.get(key)
+            if old is not None and old[0] is surf and old[1] == pos:
+                continue
+            rect = Rect(pos, surf.get_size())
+            if old is not None:
+                old_rect = Rect(old[1], old[0].get_size())
+                if rect.colliderect(old_rect):
+                    rect.union_ip(old_rect)
+                else:
+                    dirty.append(old_rect)
+            dirty.append(rect)
+        for key, (surf, pos) in previous.items():
+            if key not in current:
+                dirty.append(Rect(pos, surf.get_size()))
+
+        rects = []
+        for rect in dirty:
+            rect = rect.clip(self.bounds)
+            if rect.width and rect.height:
+                rects.append(rect)
+        for rect in rects:
+            target.set_clip(rect)
+            background.blit_to(target, rect.topleft, rect.move(view.x, view.y))
+            for _, surf, pos in items:
+                if rect.colliderect((pos, surf.get_size())):
+                    target.blit(surf, pos)
+        target.set_clip(None)
+        self._items = current
+        self.rects = rects
+
+
+dirty_renderer = DirtyRectRenderer()
+
+
+# ============================================================
+# TELAS DE INTERFACE RETIDAS
+# ============================================================
+class UIScreen:
+    """
+    Tela de interface em modo retido (menu, tutorial, fim de jogo, vitória).
+
+    O conteúdo fixo é desenhado uma única vez e guardado em uma superfície;
+    nos frames seguintes só são redesenhados os botões cujo texto ou hover
+    mudou. Os botões ficam em um índice espacial usado no hover e no clique;
+    como nos laços originais, todos os botões sob o mouse recebem o hover e o
+    clique, na ordem da lista.
+
+    Attributes:
+        state: Estado do jogo em que a tela aparece
+        paint: Função que desenha o conteúdo fixo da tela (sem os botões)
+        get_buttons: Função que retorna a lista atual de botões da tela
+        baked: Conteúdo fixo já desenhado (None até o primeiro frame)
+        hovered: Botões sob o mouse, na ordem da lista
+    """
+
+    NO_BUTTONS = ()  # Sempre o mesmo objeto: o índice de botões não é refeito a cada consulta
+
+    def __init__(self, state: str, paint, get_buttons=None):
+        self.state = state
+        self.paint = paint
+        self.get_buttons = get_buttons if get_buttons is not None else self._no_buttons
+        self.baked = None
+        self.hovered = []
+        self._drawn = {}
+        self._index = None
+        self._indexed = None
+        self._order = {}
+
+    @staticmethod
+    def _no_buttons() -> tuple:
+        return UIScreen.NO_BUTTONS
+
+    @property
+    def buttons(self) -> list:
+        return self.get_buttons()
+
+    def draw(self, target: Surface) -> None:
+        """Desenha a tela: completa ao entrar nela, depois só os botões alterados."""
+        buttons = self.buttons
+        if dirty_renderer.begin_static((self, tuple(buttons))):
+            if self.baked is None:
+                self.paint()
+                self.baked = target.copy()
+            else:
+                target.blit(self.baked, (0, 0))
+            self._drawn = {}
+        rects = []
+        for btn in buttons:
+            state = (btn.text, btn.hover)
+            if self._drawn.get(btn) != state:
+                target.blit(btn.render(), btn.rect.topleft)
+                self._drawn[btn] = state
+                rects.append(btn.rect)
+        dirty_renderer.mark(rects)
+
+    def buttons_at(self, pos: tuple[int, int]) -> list:
+        """Retorna os botões na posição, na ordem da lista, consultando o índice espacial."""
+        buttons = self.buttons
+        if self._indexed is not buttons:
+            # Lista de botões recriada (ex.: init_game_over_buttons): refaz o índice
+            self._index = SpatialGrid()
+            for btn in buttons:
+                self._index.insert('button', btn, btn.rect)
+            self._indexed = buttons
+            self._order = {id(btn): i for i, btn in enumerate(buttons)}
+            self.hovered = []
+        hits = [btn for _, btn in self._index.query(Rect(pos[0], pos[1], 1, 1))]
+        hits.sort(key=lambda btn: self._order[id(btn)])
+        return hits
+
+    def update_hover(self, pos: tuple[int, int]) -> None:
+        """Atualiza o hover trocando só os botões que o mouse deixou e os que ele alcançou."""
+        hits = self.buttons_at(pos)
+        if hits == self.hovered:
+            return
+        for btn in self.hovered:
+            if btn not in hits:
+                btn.hover = False
+        for btn in hits:
+            btn.hover = True
+        self.hovered = hits
+
+def present_dirty_rects() -> None:
+    """Substitui pygame.display.flip: envia à janela só as regiões do último frame."""
+    rects = dirty_renderer.rects
+    dirty_renderer.rects = None
+    if rects is None:
+        _display_flip()
+    elif rects:
+        pygame.display.update(rects)
+
+
+# ============================================================
+# ÍNDICE ESPACIAL DE COLISÕES
+# ============================================================
+class SpatialGrid:
+    """
+    Índice espacial em grade uniforme para as entidades colidíveis do nível.
+
+    Cada entidade é guardada com um tipo ('enemy', 'gem', 'key', 'door') e a
+    sua hitbox em todas as células que ela cobre. Consultas testam apenas as
+    entidades das células tocadas pelo retângulo consultado.
+
+    Attributes:
+        cell_size: Tamanho da célula em pixels
+    """
+
+    def __init__(self, cell_size: int = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+
+    def clear(self) -> None:
+        """Remove todas as entidades do índice."""
+        self.cells.clear()
+        self.entries.clear()
+
+    def _span(self, rect: Rect) -> tuple[int, int, int, int]:
+        cs = self.cell_size
+        return (rect.left // cs, rect.top // cs,
+                (rect.right - 1) // cs, (rect.bottom - 1) // cs)
+
+    def _link(self, entry: list) -> None:
+        x0, y0, x1, y1 = entry[3]
+        oid = id(entry[1])
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = self.cells[(cx, cy)] = {}
+                cell[oid] = entry
+
+    def _unlink(self, entry: list) -> None:
+        x0, y0, x1, y1 = entry[3]
+        oid = id(entry[1])
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    cell.pop(oid, None)
+                    if not cell:
+                        del self.cells[(cx, cy)]
+
+    def insert(self, kind: str, obj, rect: Rect) -> None:
+        """Adiciona uma entidade com a hitbox dada (o Rect passa a pertencer ao índice)."""
+        entry = [kind, obj, rect, self._span(rect)]
+        self.entries[id(obj)] = entry
+        self._link(entry)
+
+    def remove(self, obj) -> None:
+        """Remove uma entidade do índice (ex.: gema coletada)."""
+        entry = self.entries.pop(id(obj), None)
+        if entry is not None:
+            self._unlink(entry)
+
+    def move(self, obj, center: tuple) -> None:
+        """Recentraliza a hitbox de uma entidade, trocando de células só se necessário."""
+        entry = self.entries.get(id(obj))
+        if entry is None:
+            return
+        rect = entry[2]
+        # Mesmo arredondamento de Rect(x - meia largura, ...) usado em insert: trunca, não arredonda
+        rect.topleft = (int(center[0] - rect.width // 2), int(center[1] - rect.height // 2))
+        span = self._span(rect)
+        if span != entry[3]:
+            self._unlink(entry)
+            entry[3] = span
+            self._link(entry)
+
+    def query(self, rect: Rect) -> list:
+        """
+        Retorna as entidades cujas hitboxes colidem com o retângulo.
+
+        Returns:
+            Lista de tuplas (tipo, entidade), sem repetições
+        """
+        x0, y0, x1, y1 = self._span(rect)
+        cells = self.cells
+        seen = set()
+        hits = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if not cell:
+                    continue
+                for oid, entry in cell.items():
+                    if oid in seen:
+                        continue
+                    seen.add(oid)
+                    if entry[2].colliderect(rect):
+                        hits.append((entry[0], entry[1]))
+        return hits
+
+
+# ============================================================
+# POSICIONAMENTO DE OBJETOS (POISSON-DISK)
+# ============================================================
+class SpawnPlacer:
+    """
+    Sorteia pontos sobre plataformas mantendo uma distância mínima entre objetos.
+
+    Os pontos válidos ficam em linhas horizontais (x inteiro de x0 a x1, a uma
+    altura y), uma por plataforma, divididas em trechos do tamanho de uma
+    célula. Cada trecho guarda os intervalos ainda livres; um obstáculo
+    (objeto já posicionado e seu raio) recorta só os trechos próximos,
+    encontrados por um SpatialGrid. O sorteio é uniforme sobre todo o
+    comprimento livre, escolhendo o trecho por uma árvore de Fenwick, então
+    não há tentativas descartadas: ``sample`` só falha (None) quando não sobra
+    nenhum ponto que respeite as distâncias. Posicionar n objetos custa
+    O(n log T) mais os recortes locais, T sendo o número de trechos.
+
+    Attributes:
+        rng: Gerador usado no sorteio
+        chunks: Trechos (y, x0, x1) das linhas de spawn
+        free: Intervalos livres [(a, b), ...] de cada trecho (inclusivos)
+        free_length: Quantidade de pontos livres
+    """
+
+    def __init__(self, lines, rng=random, cell_size: int = GRID_CELL_SIZE):
+        self.rng = rng
+        self.chunks = []
+        for y, x0, x1 in lines:
+            for start in range(x0, x1 + 1, cell_size):
+                self.chunks.append((y, start, min(start + cell_size - 1, x1)))
+        self.free = [[(x0, x1)] for _, x0, x1 in self.chunks]
+        sizes = [x1 - x0 + 1 for _, x0, x1 in self.chunks]
+        self.free_length = sum(sizes)
+        # Comprimentos acumulados, para sortear ignorando os obstáculos
+        self._cumulative = []
+        total = 0
+        for size in sizes:
+            total += size
+            self._cumulative.append(total)
+        # Árvore de Fenwick com o comprimento livre de cada trecho
+        self._tree = [0] * (len(self.chunks) + 1)
+        for i, size in enumerate(sizes):
+            self._tree_add(i, size)
+        self._index = SpatialGrid(cell_size)
+        for i, (y, x0, x1) in enumerate(self.chunks):
+            self._index.insert('chunk', i, Rect(x0, y, x1 - x0 + 1, 1))
+
+    @classmethod
+    def above_platforms(cls, platforms, height: int, margin: int, rng=random) -> 'SpawnPlacer':
+        """Uma linha por plataforma: ``height`` px acima do topo, de left+margin a right-margin."""
+        return cls([(p.top - height, p.left + margin, p.right - margin) for p in platforms], rng)
+
+    def _tree_add(self, i: int, delta: int) -> None:
+        tree = self._tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _tree_find(self, u: int) -> tuple[int, int]:
+        """Retorna (trecho, deslocamento) do u-ésimo ponto livre."""
+        tree = self._tree
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= u:
+                pos = nxt
+                u -= tree[nxt]
+            step >>= 1
+        return pos, u
+
+    def add_obstacle(self, pos: tuple[int, int], radius: float) -> None:
+        """Bloqueia os pontos a menos de ``radius`` px de ``pos`` (coordenadas inteiras)."""
+        px, py = pos
+        r2 = radius * radius
+        span = math.ceil(radius)
+        for _, i in self._index.query(Rect(px - span, py - span, 2 * span + 1, 2 * span + 1)):
+            w2 = r2 - (self.chunks[i][0] - py) ** 2
+            if w2 > 0:
+                # Maior m com m² < w2: bloqueia x com (x - px)² < r² - dy²
+                m = math.isqrt(math.ceil(w2) - 1)
+                self._cut(i, px - m, px + m)
+
+    def _cut(self, i: int, lo: int, hi: int) -> None:
+        kept, removed = [], 0
+        for a, b in self.free[i]:
+            if b < lo or a > hi:
+                kept.append((a, b))
+                continue
+            if a < lo:
+                kept.append((a, lo - 1))
+            if b > hi:
+                kept.append((hi + 1, b))
+            removed += min(b, hi) - max(a, lo) + 1
+        if removed:
+            self.free[i] = kept
+            self.free_length -= removed
+            self._tree_add(i, -removed)
+
+    def sample(self):
+        """Sorteia um ponto livre (x, y), ou None se as distâncias não puderem ser respeitadas."""
+        if self.free_length <= 0:
+            return None
+        i, u = self._tree_find(self.rng.randrange(self.free_length))
+        for a, b in self.free[i]:
+            if u <= b - a:
+                return (a + u, self.chunks[i][0])
+            u -= b - a + 1
+        return None
+
+    def sample_any(self):
+        """Sorteia um ponto das linhas ignorando os obstáculos (ou None se não há linhas)."""
+        if not self.chunks:
+            return None
+        u = self.rng.randrange(self._cumulative[-1])
+        i = bisect_right(self._cumulative, u)
+        y, x0, _ = self.chunks[i]
+        return (x0 + u - (self._cumulative[i - 1] if i else 0), y)
+
+    def farthest_from(self, pos: tuple[int, int]):
+        """Ponta de linha mais distante de ``pos`` (ou None se não há linhas)."""
+        px, py = pos
+        ends = [(x, y) for y, x0, x1 in self.chunks for x in (x0, x1)]
+        return max(ends, key=lambda p: (p[0] - px) ** 2 + (p[1] - py) ** 2, default=None)
+
+
+# ============================================================
+# ALCANCE DOS PULOS E GRAFO DE PLATAFORMAS
+# ============================================================
+def physics_key() -> tuple:
+    """Constantes que definem o alcance dos pulos (chave dos caches de alcance)."""
+    return (JUMP_SPEED, GRAVITY, MAX_FALL_SPEED, PLAYER_SPEED, PLAYER_HIT_W)
+
+
+class JumpArcs:
+    """
+    Trajetórias verticais possíveis do jogador, simuladas com a física de check_collisions.
+
+    Considera o pulo a partir do chão, com ou sem o pulo duplo em cada tick
+    possível, e a queda ao sair da borda (ou atravessar a plataforma), com
+    ou sem um pulo no ar. ``landing_tick(dy)`` diz até quando o jogador ainda
+    cruza, descendo, a altura dy abaixo do ponto de partida (negativo =
+    acima) — ou seja, o último tick em que pode aterrissar ali. Como o
+    movimento horizontal é livre a cada tick, o alcance lateral até essa
+    altura é PLAYER_SPEED × (tick - 1).
+
+    Use ``JumpArcs.get``: as trajetórias são calculadas uma vez por conjunto
+    de constantes de física e profundidade, e cada dy consultado é memorizado.
+
+    Attributes:
+        depth: Maior descida (px) coberta pelas trajetórias
+        rise: Maior subida (px) em que ainda é possível aterrissar
+        arcs: Fases finais de descida, como (tick inicial, altura antes dela, alturas por tick)
+    """
+
+    _cache = {}
+    DEPTH_STEP = 512  # Profundidades são arredondadas para compartilhar tabelas entre níveis
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.arcs = []
+        self._ticks = {}
+        jump_speed, gravity, max_fall = JUMP_SPEED, GRAVITY, MAX_FALL_SPEED
+        # Um pulo extra ainda pode trazer o jogador de volta acima de ``depth``
+        floor = depth + jump_speed * jump_speed / (2 * gravity) + jump_speed
+
+        def simulate(jump_ticks):
+            y = vy = 0.0
+            t = 0
+            start, before, heights = 1, 0.0, []
+            while y <= floor:
+                t += 1
+                if t in jump_ticks:
+                    vy = -jump_speed
+                prev = y
+                vy = min(vy + gravity, max_fall)
+                y += vy
+                if vy > 0:
+                    if not heights:
+                        start, before = t, prev
+                    heights.append(y)
+                else:
+                    heights = []
+            self.arcs.append((start, before, heights))
+            return t
+
+        for first_jump in (True, False):
+            base = (1,) if first_jump else ()
+            last = simulate(set(base))
+            for k in range(2 if first_jump else 1, last + 1):
+                simulate(set(base + (k,)))
+        self.rise = int(-min(before for _, before, heights in self.arcs if heights))
+
+    @classmethod
+    def get(cls, depth: int) -> 'JumpArcs':
+        """Retorna as trajetórias das constantes de física atuais cobrindo ``depth`` px de descida."""
+        depth = max(cls.DEPTH_STEP, -(-depth // cls.DEPTH_STEP) * cls.DEPTH_STEP)
+        key = physics_key() + (depth,)
+        arcs = cls._cache.get(key)
+        if arcs is None:
+            arcs = cls._cache[key] = cls(depth)
+        return arcs
+
+    def landing_tick(self, dy: int) -> int:
+        """Último tick em que o jogador cruza a altura ``dy`` descendo (0 se nunca)."""
+        ticks = self._ticks.get(dy)
+        if ticks is None:
+            ticks = 0
+            for start, before, heights in self.arcs:
+                # Primeiro tick da descida em que a altura passa de dy
+                i = bisect_left(heights, dy)
+                if i < len(heights) and (heights[i - 1] if i else before) <= dy:
+                    ticks = max(ticks, start + i)
+            self._ticks[dy] = ticks
+        return ticks
+
+
+class ReachabilityGraph:
+    """
+    Plataformas alcançáveis a partir do ponto de partida de um nível.
+
+    Cada plataforma é um nó; há uma aresta A -> B quando, de pé em A, o
+    jogador consegue aterrissar em B com os pulos de JumpArcs (andando no
+    máximo PLAYER_SPEED por tick) ou descer até B atravessando A ou saindo
+    pela borda. O modelo ignora plataformas no caminho (são atravessáveis
+    por baixo e o jogador pode desviar delas) e inimigos.
+
+    As plataformas são distribuídas em uma grade cujas linhas têm a maior
+    subida de um pulo e cujas colunas têm o alcance lateral de um pulo que
+    desce uma linha; cada origem só testa os destinos das células ao seu
+    alcance, então níveis largos não comparam todos os pares. O resultado de
+    cada par testado fica em um cache LRU compartilhado entre níveis, e as
+    consultas depois de montado o grafo são de tempo constante.
+
+    Attributes:
+        source: Lista de plataformas do nível usada na montagem
+        physics: Constantes de física da montagem (ver physics_key)
+        platforms: Nós do grafo: as plataformas do nível mais o fundo do nível
+        edges: Índices dos destinos alcançáveis a partir de cada nó
+        reachable: Se cada nó pode ser alcançado a partir da partida
+    """
+
+    _pair_cache = OrderedDict()
+    _cache_lock = threading.Lock()  # Grafos são montados também na thread do pré-carregador
+    PAIR_CACHE_SIZE = 100_000
+
+    def __init__(self, platforms: list, level_width: int, level_height: int, start: Rect):
+        self.source = platforms
+        self.physics = physics = physics_key()
+        # O fundo do nível também segura o jogador (ver check_collisions)
+        self.platforms = nodes = list(platforms) + [Rect(0, level_height, level_width, 0)]
+        self._index = {id(p): i for i, p in enumerate(nodes)}
+        floor_top = level_height - 25
+        self._droppable = droppable = [p.top < floor_top for p in nodes]
+        droppable[-1] = False
+        arcs = JumpArcs.get(level_height)
+        w = PLAYER_HIT_W
+
+        # Grade de baldes: linhas com a maior subida, colunas com o alcance de uma linha abaixo
+        row_h = max(1, arcs.rise)
+        col_w = max(1, math.ceil(PLAYER_SPEED * (arcs.landing_tick(row_h) - 1)))
+        buckets = {}
+        for i, p in enumerate(nodes):
+            row = p.top // row_h
+            for col in range((p.left - w) // col_w, (p.right + w) // col_w + 1):
+                buckets.setdefault((col, row), []).append(i)
+        last_row = max(p.top for p in nodes) // row_h
+
+        self.edges = []
+        seen = [-1] * len(nodes)
+        cache, lock = self._pair_cache, self._cache_lock
+        for a, src in enumerate(nodes):
+            a_lo, a_hi = src.left - w, src.right + w
+            targets = []
+            for row in range((src.top - arcs.rise) // row_h, last_row + 1):
+                # landing_tick cresce com a descida: o fundo da linha limita o alcance nela
+                dy = min((row + 1) * row_h - 1, level_height) - src.top
+                reach = max(0, math.ceil(PLAYER_SPEED * (arcs.landing_tick(dy) - 1)))
+                for col in range((a_lo - reach) // col_w, (a_hi + reach) // col_w + 1):
+                    for b in buckets.get((col, row), ()):
+                        if b == a or seen[b] == a:
+                            continue
+                        seen[b] = a
+                        dst = nodes[b]
+                        key = (physics, tuple(src), tuple(dst), droppable[a])
+                        # O lock só protege o cache: o teste do par roda fora dele
+                        with lock:
+                            ok = cache.get(key)
+                            if ok is not None:
+                                cache.move_to_end(key)
+                        if ok is None:
+                            ok = self._can_move(arcs, src, dst, droppable[a])
+                            with lock:
+                                cache[key] = ok
+                                if len(cache) > self.PAIR_CACHE_SIZE:
+                                    cache.popitem(last=False)
+                        if ok:
+                            targets.append(b)
+            targets.sort()
+            self.edges.append(targets)
+
+        self.reachable = [False] * len(nodes)
+        first = self._index.get(id(start))
+        if first is None:
+            first = len(nodes) - 1
+        stack = [first]
+        self.reachable[first] = True
+        while stack:
+            for b in self.edges[stack.pop()]:
+                if not self.reachable[b]:
+                    self.reachable[b] = True
+                    stack.append(b)
+
+    @staticmethod
+    def _can_move(arcs: JumpArcs, src: Rect, dst: Rect, droppable: bool) -> bool:
+        """Se o jogador, de pé em ``src``, consegue chegar a ``dst``."""
+        w = PLAYER_HIT_W
+        # Faixas de x em que a hitbox do jogador toca cada plataforma
+        a_lo, a_hi = src.left - w, src.right + w
+        b_lo, b_hi = dst.left - w, dst.right + w
+        dy = dst.top - src.top
+        if dy > 0 and b_lo < a_hi and a_lo < b_hi:
+            # Destino abaixo da plataforma atual: atravessa ou sai pela borda
+            return droppable or b_lo < a_lo or b_hi > a_hi
+        gap = max(0, b_lo - a_hi, a_lo - b_hi)
+        ticks = arcs.landing_tick(dy)
+        return ticks > 0 and PLAYER_SPEED * (ticks - 1) > gap
+
+    def is_reachable(self, platform: Rect) -> bool:
+        """Se a plataforma (um dos Rect do nível) é alcançável a partir da partida."""
+        i = self._index.get(id(platform))
+        return i is not None and self.reachable[i]
+
+
+# ============================================================
+# TERRENO EM TILES
+# ============================================================
+class TileMap:
+    """
+    Terreno do nível como uma grade compacta de ids de tile.
+
+    Cada célula guarda o id da superfície (plataforma) cujo topo está naquela
+    célula, ou 0 se estiver vazia. Os ids indexam ``solids``, que guarda o
+    retângulo exato de cada superfície, então as consultas de chão, pouso e
+    travessia olham apenas as poucas células ao redor do jogador e continuam
+    com o mesmo resultado que percorrer todas as plataformas.
+
+    Attributes:
+        cols, rows: Dimensões da grade em tiles
+        tile_size: Tamanho do tile em pixels
+        tiles: Array (cols * rows) com o id de cada célula
+        solids: Retângulo de cada id (índice 0 não é usado)
+        droppable: 1 se a superfície do id pode ser atravessada para baixo
+    """
+
+    SHARED = 0xFFFF  # Célula com mais de uma superfície (ids em ``shared``)
+
+    def __init__(self, cols: int, rows: int, tile_size: int = TILE_SIZE):
+        self.cols = cols
+        self.rows = rows
+        self.tile_size = tile_size
+        self.tiles = array('H', bytes(2 * cols * rows))
+        self.solids = [None]
+        self.droppable = bytearray(1)
+        self.shared = {}
+
+    @classmethod
+    def from_rects(cls, platform_list: list, width: int = WIDTH, height: int = HEIGHT,
+                   tile_size: int = TILE_SIZE) -> 'TileMap':
+        """
+        Converte a lista de plataformas (Rect) de um nível em um TileMap.
+
+        A grade cobre a tela e se estende até a plataforma mais à direita/abaixo;
+        trechos em coordenadas negativas ficam fora do mapa.
+        """
+        floor_top = height - 25
+        width = max([width] + [p.right + 1 for p in platform_list])
+        height = max([height] + [p.bottom for p in platform_list])
+        terrain = cls(-(-width // tile_size), -(-height // tile_size), tile_size)
+        for platform in platform_list:
+            # Só o piso de segurança não pode ser atravessado
+            terrain.add_solid(platform, droppable=platform.top < floor_top)
+        return terrain
+
+    def add_solid(self, rect: Rect, droppable: bool = True) -> int:
+        """Marca as células do topo de ``rect`` com um novo id e o retorna."""
+        if len(self.solids) >= self.SHARED:
+            raise ValueError("TileMap suporta no máximo %d superfícies" % (self.SHARED - 1))
+        solid_id = len(self.solids)
+        self.solids.append(rect)
+        self.droppable.append(1 if droppable else 0)
+        ts = self.tile_size
+        row = rect.top // ts
+        if not 0 <= row < self.rows:
+            return solid_id
+        c0 = max(0, rect.left // ts)
+        c1 = min(self.cols - 1, rect.right // ts)
+        tiles = self.tiles
+        for col in range(c0, c1 + 1):
+            idx = row * self.cols + col
+            current = tiles[idx]
+            if current == 0:
+                tiles[idx] = solid_id
+            elif current == self.SHARED:
+                self.shared[idx].append(solid_id)
+            else:
+                tiles[idx] = self.SHARED
+                self.shared[idx] = [current, solid_id]
+        return solid_id
+
+    def landing_candidates(self, left: float, right: float, top: float, bottom: float,
+                           dropping: bool) -> list:
+        """
+        Retorna as superfícies com topo entre ``top`` e ``bottom`` que tocam [left, right].
+
+        Args:
+            left, right: Faixa horizontal ocupada pelo jogador
+            top, bottom: Faixa vertical onde o pé do jogador passou neste tick
+            dropping: Se True, ignora superfícies atravessáveis
+
+        Returns:
+            Retângulos candidatos, na mesma ordem da lista de plataformas do nível
+        """
+        ts = self.tile_size
+        c0 = max(0, int(left // ts))
+        c1 = min(self.cols - 1, int(right // ts))
+        r0 = max(0, int(top // ts))
+        r1 = min(self.rows - 1, int(bottom // ts))
+        tiles, cols, droppable = self.tiles, self.cols, self.droppable
+        found = set()
+        for row in range(r0, r1 + 1):
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                solid_id = tiles[base + col]
+                if solid_id == 0:
+                    continue
+                if solid_id == self.SHARED:
+                    found.update(self.shared[base + col])
+                else:
+                    found.add(solid_id)
+        solids = self.solids
+        return [solids[i] for i in sorted(found) if not (dropping and droppable[i])]
+
+
+# ============================================================
+# CÂMERA
+# ============================================================
+class Camera:
+    """
+    Janela de visualização (viewport) sobre um nível possivelmente maior que a tela.
+
+    Attributes:
+        view: Retângulo do nível visível na tela, em coordenadas do nível
+    """
+
+    def __init__(self, width: int = WIDTH, height: int = HEIGHT):
+        self.view = Rect(0, 0, width, height)
+
+    def follow(self, x: float, y: float, level_w: int, level_h: int) -> None:
+        """Centraliza a câmera em (x, y) sem mostrar nada fora dos limites do nível."""
+        view = self.view
+        view.x = int(max(0, min(x - view.width // 2, level_w - view.width)))
+        view.y = int(max(0, min(y - view.height // 2, level_h - view.height)))
+
+    def active_area(self, margin: int = ENEMY_ACTIVE_MARGIN) -> Rect:
+        """Retorna a área da câmera ampliada pela margem em que a simulação roda completa."""
+        return self.view.inflate(margin * 2, margin * 2)
+
+
+# ============================================================
+# PERFIL POR SUBSISTEMA
+# ============================================================
+class Profiler:
+    """
+    Medição por zonas (funções de cada subsistema) com exportação para trace.
+
+    As zonas são registradas com ``add_zone`` apontando para o atributo que
+    guarda a função (método de classe, global do módulo, callback). Só em
+    ``enable`` esses atributos são trocados por versões cronometradas; com o
+    perfil desligado as funções originais ficam no lugar e o custo é zero.
+
+    Cada chamada vira um evento "X" do formato Trace Event (chrome://tracing,
+    Perfetto) e, na thread principal, soma no tempo da zona no frame atual.
+
+    Attributes:
+        enabled: Se as zonas estão sendo medidas
+        history: Últimos frames como (duração do frame em ns, {zona: ns})
+        events: Eventos (zona, início em ns, duração em ns, thread) para o trace
+    """
+
+    def __init__(self, history: int = PROFILER_HISTORY, max_events: int = PROFILER_MAX_EVENTS):
+        self.enabled = False
+        self.history = deque(maxlen=history)
+        self.events = deque(maxlen=max_events)
+        self._zones = []
+        self._originals = []
+        self._frame = {}
+        self._frame_start = None
+        self._main_thread = threading.get_ident()
+
+    def add_zone(self, zone: str, owner, attr: str) -> None:
+        """
+        Registra uma zona.
+
+        Args:
+            zone: Nome exibido no overlay e no trace
+            owner: Classe, objeto ou dicionário (ex.: globals()) que guarda a função
+            attr: Nome do atributo (ou chave) da função
+        """
+        self._zones.append((zone, owner, attr))
+        if self.enabled:
+            self._install(zone, owner, attr)
+
+    def _install(self, zone: str, owner, attr: str) -> None:
+        if isinstance(owner, dict):
+            func = owner[attr]
+            owner[attr] = self._timed(zone, func)
+        else:
+            func = getattr(owner, attr)
+            setattr(owner, attr, self._timed(zone, func))
+        self._originals.append((owner, attr, func))
+
+    def _timed(self, zone: str, func):
+        record = self.record
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(zone, start, clock() - start)
+
+        timed.__wrapped__ = func
+        return timed
+
+    def enable(self) -> None:
+        """Troca as funções das zonas pelas versões cronometradas."""
+        if self.enabled:
+            return
+        self.enabled = True
+        for zone, owner, attr in self._zones:
+            self._install(zone, owner, attr)
+        self._frame = {}
+        self._frame_start = time.perf_counter_ns()
+
+    def disable(self) -> None:
+        """Devolve as funções originais; os eventos já gravados continuam disponíveis."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        for owner, attr, func in reversed(self._originals):
+            if isinstance(owner, dict):
+                owner[attr] = func
+            else:
+                setattr(owner, attr, func)
+        self._originals = []
+
+    def toggle(self) -> None:
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def record(self, zone: str, start: int, duration: int) -> None:
+        """Guarda uma medição (tempos em ns de time.perf_counter_ns)."""
+        thread = threading.get_ident()
+        self.events.append((zone, start, duration, thread))
+        if thread == self._main_thread:
+            self._frame[zone] = self._frame.get(zone, 0) + duration
+
+    def end_frame(self) -> None:
+        """Fecha o frame atual: do fim do frame anterior até agora."""
+        now = time.perf_counter_ns()
+        if self._frame_start is not None:
+            duration = now - self._frame_start
+            self.history.append((duration, self._frame))
+            self.events.append(('frame', self._frame_start, duration, self._main_thread))
+        self._frame = {}
+        self._frame_start = now
+
+    def zone_stats(self) -> list[tuple[str, float, float]]:
+        """Retorna (zona, média em ms por frame, máximo em ms) no histórico, da mais cara à mais barata."""
+        frames = len(self.history)
+        if not frames:
+            return []
+        totals, peaks = {}, {}
+        for _, zones in self.history:
+            for zone, ns in zones.items():
+                totals[zone] = totals.get(zone, 0) + ns
+                peaks[zone] = max(peaks.get(zone, 0), ns)
+        stats = [(zone, total / frames / 1e6, peaks[zone] / 1e6) for zone, total in totals.items()]
+        stats.sort(key=lambda item: item[1], reverse=True)
+        return stats
+
+    def frame_times(self) -> list[float]:
+        """Duração dos últimos frames, em ms."""
+        return [duration / 1e6 for duration, _ in self.history]
+
+    def export_trace(self, path: str) -> int:
+        """
+        Grava os eventos no formato JSON do Trace Event (chrome://tracing, Perfetto).
+
+        Returns:
+            Quantidade de eventos gravados
+        """
+        events = list(self.events)
+        pid = os.getpid()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        names[self._main_thread] = 'principal'
+        threads = {thread for _, _, _, thread in events} | {self._main_thread}
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+                  'args': {'name': names.get(thread, f'thread {thread}')}}
+                 for thread in sorted(threads)]
+        trace.extend({'name': zone, 'cat': 'frame' if zone == 'frame' else 'zone', 'ph': 'X',
+                      'ts': start / 1000, 'dur': duration / 1000, 'pid': pid, 'tid': thread}
+                     for zone, start, duration, thread in events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+profiler = Profiler()
+
+
+# ============================================================
+# PRÉ-CARREGAMENTO DO PRÓXIMO NÍVEL
+# ============================================================
+SOUND_EFFECTS = ('coletar_cristal', 'som_pulo', 'menu_click', 'som_alavanca',
+                 'tutorial_open', 'colisao', 'fim_de_jogo')
+MUSIC_EXTENSIONS = ('.mp3', '.ogg', '.oga')
+
+def level_sprite_names(level: dict) -> list[str]:
+    """Lista as imagens usadas por um nível (fundo, plataformas, itens e inimigos)."""
+    names = [level['background'], 'tiles/box', 'items/door_closed', 'items/door_open',
+             f"items/key_{level['key_color']}"]
+    names.extend(f"items/gem_{color}" for color in {gem['color'] for gem in level['gems']})
+    for enemy_type in {enemy['type'] for enemy in level['enemies']}:
+        for frame in ('idle', 'walk_a', 'walk_b'):
+            names.append(f'enemies/character_{enemy_type}_{frame}')
+    return names
+
+def warm_music_file(track: str) -> None:
+    """Lê o arquivo da trilha para que a troca de música não espere pelo disco."""
+    for ext in MUSIC_EXTENSIONS:
+        path = os.path.join(GAME_DIR, 'music', track + ext)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                while f.read(1 << 16):
+                    pass
+            return
+
+class PreparedLevel:
+    """
+    Nível pronto para ser trocado pelo atual sem acesso a disco.
+
+    Attributes:
+        index: Índice do nível no catálogo
+        level: Dicionário do nível já montado
+        terrain: TileMap das plataformas
+        static_layer: Camada estática renderizada (ou None sem render_layer)
+        reachability: ReachabilityGraph das plataformas (ou None)
+    """
+
+    __slots__ = ('index', 'level', 'terrain', 'static_layer', 'reachability')
+
+    def __init__(self, index: int, level: dict, terrain, static_layer=None, reachability=None):
+        self.index = index
+        self.level = level
+        self.terrain = terrain
+        self.static_layer = static_layer
+        self.reachability = reachability
+
+
+class LevelPrefetcher:
+    """
+    Prepara níveis em uma thread de fundo enquanto o nível atual é jogado.
+
+    Para cada nível pedido com ``prefetch`` a thread lê o arquivo, carrega
+    imagens e a trilha, monta o TileMap e o grafo de alcance das plataformas
+    e, se houver ``render_layer``, a camada estática (os efeitos sonoros já
+    estão no ``SoundBank``). ``take`` devolve o resultado, de modo que a
+    troca de nível na porta é só a troca de referências.
+
+    Attributes:
+        levels: Lista (ou LevelCatalog) de onde os níveis são lidos
+        render_layer: Função que recebe o nível e retorna a camada estática (ou None)
+        cache_size: Quantidade de níveis preparados mantidos (atual e próximo)
+    """
+
+    def __init__(self, level_list, render_layer=None, cache_size: int = LEVEL_CACHE_SIZE):
+        self.levels = level_list
+        self.render_layer = render_layer
+        self.cache_size = cache_size
+        self._ready = OrderedDict()
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def prefetch(self, level_index: int) -> None:
+        """Agenda a preparação de um nível (ignorado se já pronto ou fora da lista)."""
+        if not 0 <= level_index < len(self.levels):
+            return
+        with self._cond:
+            if level_index in self._ready or level_index in self._pending:
+                return
+            self._pending.append(level_index)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='level-prefetch', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def take(self, level_index: int):
+        """
+        Retorna o nível preparado, esperando a thread se ele ainda estiver em preparo.
+
+        Returns:
+            PreparedLevel do nível, ou None se ele não foi pedido (ou falhou)
+        """
+        with self._cond:
+            while level_index in self._pending:
+                self._cond.wait()
+            prepared = self._ready.get(level_index)
+            if prepared is not None:
+                self._ready.move_to_end(level_index)
+            return prepared
+
+    def prepare(self, level_index: int) -> PreparedLevel:
+        """Lê e prepara um nível na thread atual."""
+        level = self.levels[level_index]
+        for name in level_sprite_names(level):
+            get_sprite(name)
+        warm_music_file(level['music'])
+        level_w, level_h = level_size(level)
+        box = get_sprite('tiles/box')
+        platforms = level['platforms']
+        terrain = TileMap.from_rects(platforms, level_w, level_h,
+                                     tile_size=box.width if box else TILE_SIZE)
+        reach = ReachabilityGraph(platforms, level_w, level_h,
+                                  _get_start_platform(platforms, level_w, level_h))
+        layer = self.render_layer(level) if self.render_layer is not None else None
+        return PreparedLevel(level_index, level, terrain, layer, reach)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                level_index = self._pending[0]
+            try:
+                prepared = self.prepare(level_index)
+            except Exception:
+                logger.exception("Falha ao pré-carregar o nível %d", level_index)
+                prepared = None
+            with self._cond:
+                self._pending.remove(level_index)
+                if prepared is not None:
+                    self._ready[level_index] = prepared
+                    while len(self._ready) > self.cache_size:
+                        self._ready.popitem(last=False)
+                self._cond.notify_all()
+
+
+# ============================================================
+# BANCO DE SONS
+# ============================================================
+class SoundBank:
+    """
+    Efeitos sonoros pré-carregados tocados em um conjunto fixo de canais do mixer.
+
+    ``init_mixer`` reabre o mixer com um buffer pequeno (AUDIO_BUFFER) e
+    carrega todos os efeitos de uma vez: pygame.mixer.Sound já decodifica o
+    arquivo inteiro, então nenhum efeito é lido do disco durante a partida.
+    Cada efeito tem um limite de vozes simultâneas; ao atingi-lo, a voz mais
+    antiga do mesmo efeito é reiniciada. Sem canal livre, o som interrompe a
+    voz de menor prioridade (a mais antiga, no empate) se ela não for mais
+    prioritária que ele; caso contrário é descartado.
+
+    Se ``init_mixer`` não tiver rodado, o primeiro ``play`` prepara o banco
+    no mixer já aberto (ver ``prepare``).
+
+    A latência medida vai da entrada do jogador (``note_input``) até o som
+    ser entregue ao mixer, mais o tempo de um buffer de saída.
+
+    Attributes:
+        names: Efeitos carregados por ``load``
+        sounds: Sons carregados por nome
+        channels: Canais do mixer usados pelo banco (vazio sem mixer)
+        output_latency: Duração (s) de um buffer do mixer
+        latencies: Últimas latências entrada -> som (s)
+        played, limited, stolen, dropped: Sons tocados, vozes reiniciadas pelo
+            limite do efeito, vozes de outro efeito interrompidas e sons descartados
+    """
+
+    def __init__(self, names=SOUND_EFFECTS, channels: int = AUDIO_CHANNELS,
+                 voice_limits: dict = SOUND_VOICE_LIMITS, priorities: dict = SOUND_PRIORITIES):
+        self.names = names
+        self.channel_count = channels
+        self.voice_limits = voice_limits
+        self.priorities = priorities
+        self.sounds = {}
+        self.channels = []
+        self._voices = []  # Por canal: (efeito, prioridade, ordem de início) ou None
+        self._serial = 0
+        self._input_time = None
+        self.output_latency = 0.0
+        self.latencies = deque(maxlen=SOUND_LATENCY_HISTORY)
+        self._prepared = False
+        self.played = self.limited = self.stolen = self.dropped = 0
+
+    def init_mixer(self, frequency: int = AUDIO_FREQUENCY, buffer: int = AUDIO_BUFFER) -> bool:
+        """
+        Reabre o mixer com buffer pequeno, reserva os canais e carrega os efeitos.
+
+        Deve ser chamado antes de qualquer som ou música ser carregado (sons
+        criados com o mixer antigo não tocam no novo).
+
+        Returns:
+            False se não houver dispositivo de áudio (o jogo segue sem efeitos)
+        """
+        try:
+            if pygame.mixer.get_init():
+                pygame.mixer.quit()
+            pygame.mixer.init(frequency=frequency, size=-16, channels=2, buffer=buffer)
+        except pygame.error as e:
+            logger.warning("Mixer de áudio indisponível: %s", e)
+            return False
+        self.output_latency = buffer / pygame.mixer.get_init()[0]
+        self._prepared = False
+        return self.prepare()
+
+    def prepare(self) -> bool:
+        """
+        Reserva os canais e carrega os efeitos no mixer já aberto (uma única vez).
+
+        Chamado por ``init_mixer`` e, sem ele, pelo primeiro ``play``: nesse caso
+        o mixer não é reaberto (a música que estiver tocando continua) e a
+        latência de saída fica desconhecida (zero).
+
+        Returns:
+            False se o mixer não estiver aberto
+        """
+        if self._prepared:
+            return bool(self.channels)
+        self._prepared = True
+        if not pygame.mixer.get_init():
+            return False
+        pygame.mixer.set_num_channels(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self._voices = [None] * self.channel_count
+        self.sounds = {}
+        self.load()
+        return True
+
+    def load(self) -> None:
+        """Carrega (e decodifica) todos os efeitos pelo cache do Pygame Zero."""
+        for name in self.names:
+            try:
+                sound = loaders.sounds.load(name)
+            except Exception:
+                logger.warning("Efeito sonoro não encontrado: %s", name)
+                continue
+            # Alguns decodificadores devolvem o som vazio ao reamostrar; tocá-lo
+            # em um canal específico derruba o SDL_mixer
+            if sound.get_length() <= 0:
+                logger.warning("Efeito sonoro vazio após decodificar: %s", name)
+                continue
+            self.sounds[name] = sound
+
+    def note_input(self) -> None:
+        """Marca o instante de uma entrada do jogador; o próximo som mede a latência a partir dele."""
+        self._input_time = time.perf_counter()
+
+    def discard_input(self) -> None:
+        """Descarta a entrada marcada quando ela não gerou som (ex.: pulo sem pulos restantes)."""
+        self._input_time = None
+
+    def play(self, name: str) -> bool:
+        """Toca um efeito em um canal do banco; retorna False se ele não tocou."""
+        if not self._prepared:
+            self.prepare()
+        sound = self.sounds.get(name)
+        if sound is None:
+            return False
+        priority = self.priorities.get(name, 0)
+        index = self._pick_channel(name, priority)
+        if index is None:
+            self.dropped += 1
+            return False
+        self.channels[index].play(sound)
+        self._serial += 1
+        self._voices[index] = (name, priority, self._serial)
+        self.played += 1
+        if self._input_time is not None:
+            self.latencies.append(time.perf_counter() - self._input_time + self.output_latency)
+            self._input_time = None
+        return True
+
+    def _pick_channel(self, name: str, priority: int):
+        """Canal para o efeito: voz antiga dele no limite, canal livre ou voz menos prioritária."""
+        voices, channels = self._voices, self.channels
+        same = []
+        free = victim = None
+        for i, voice in enumerate(voices):
+            if voice is None or not channels[i].get_busy():
+                voices[i] = None
+                if free is None:
+                    free = i
+                continue
+            if voice[0] == name:
+                same.append(i)
+            if voice[1] <= priority and (victim is None or voice[1:] < voices[victim][1:]):
+                victim = i
+        if len(same) >= self.voice_limits.get(name, SOUND_DEFAULT_VOICES):
+            self.limited += 1
+            return min(same, key=lambda i: voices[i][2])
+        if free is not None:
+            return free
+        if victim is not None:
+            self.stolen += 1
+        return victim
+
+    def latency_stats(self) -> tuple:
+        """(p50, p95, máximo) da latência entrada -> som em ms, ou None sem medidas."""
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        last = len(samples) - 1
+        return (samples[last // 2] * 1000, samples[int(last * 0.95)] * 1000, samples[-1] * 1000)
+
+
+# ============================================================
+# ANIMAÇÕES
+# ============================================================
+class Animation:
+    """
+    Sequência de quadros com duração própria, consultada por tempo em ticks.
+
+    A tabela tick -> quadro é calculada uma vez, e os SpriteInfo dos quadros
+    são resolvidos no primeiro uso, então trocar de quadro não busca nada
+    pelo nome.
+
+    Attributes:
+        frames: Nomes dos sprites de cada quadro
+        durations: Duração de cada quadro em ticks
+        loop: Se a animação recomeça ao terminar (senão fica no último quadro)
+        length: Duração total em ticks
+    """
+
+    __slots__ = ('frames', 'durations', 'loop', 'length', '_table', '_sprites')
+
+    def __init__(self, frames: tuple, durations: tuple = None, loop: bool = True):
+        self.frames = tuple(frames)
+        self.durations = tuple(durations) if durations is not None else (1,) * len(self.frames)
+        self.loop = loop
+        self.length = sum(self.durations)
+        self._table = tuple(i for i, d in enumerate(self.durations) for _ in range(d))
+        self._sprites = [None] * len(self.frames)
+
+    def frame_index(self, t: int) -> int:
+        """Quadro mostrado t ticks após o início da animação."""
+        if t >= self.length:
+            if not self.loop:
+                return len(self.frames) - 1
+            t %= self.length
+        return self._table[t]
+
+    def sprite(self, index: int):
+        """SpriteInfo do quadro (None se a imagem ainda não puder ser carregada)."""
+        info = self._sprites[index]
+        if info is None:
+            info = self._sprites[index] = get_sprite(self.frames[index])
+        return info
+
+
+PLAYER_ANIMATIONS = {
+    'idle': Animation(('player/prof_bolota_idle',)),
+    'walk': Animation(('player/prof_bolota_walk_1', 'player/prof_bolota_walk_2'), (10, 10)),
+    'jump': Animation(('player/prof_bolota_jump',), loop=False),
+}
+
+_enemy_animations = {}
+
+def enemy_animations(enemy_type: str) -> dict:
+    """Tabela de animações (idle e walk) de um tipo de inimigo, compartilhada entre eles."""
+    table = _enemy_animations.get(enemy_type)
+    if table is None:
+        prefix = f'enemies/character_{enemy_type}_'
+        table = _enemy_animations[enemy_type] = {
+            'idle': Animation((prefix + 'idle',)),
+            'walk': Animation((prefix + 'walk_a', prefix + 'walk_b'), (10, 10)),
+        }
+    return table
+
+
+# ============================================================
+# ENTIDADES
+# ============================================================
+class Entity:
+    """
+    Objeto posicionado no nível (gema, chave, porta e base das demais entidades).
+
+    Guarda só o estado de jogo; a imagem é o nome de um sprite do registro,
+    posicionado na tela por entity_blit.
+
+    Attributes:
+        x, y: Centro da entidade em coordenadas do nível
+        image: Nome do sprite atual
+        sprite: SpriteInfo de ``image`` (resolvido uma vez por troca de imagem)
+        visible: Se a entidade é desenhada e pode ser coletada
+        animation, frame: Animação e quadro mostrados por ``play`` (ou None)
+    """
+
+    __slots__ = ('x', 'y', '_image', '_sprite', 'visible', 'animation', 'frame')
+
+    def __init__(self, image: str, pos: tuple = (0, 0), visible: bool = True):
+        self.image = image
+        self.x, self.y = float(pos[0]), float(pos[1])
+        self.visible = visible
+
+    @property
+    def pos(self) -> tuple[float, float]:
+        return self.x, self.y
+
+    @pos.setter
+    def pos(self, pos: tuple) -> None:
+        self.x, self.y = float(pos[0]), float(pos[1])
+
+    @property
+    def image(self) -> str:
+        return self._image
+
+    @image.setter
+    def image(self, name: str) -> None:
+        self._image = name
+        self._sprite = None
+        self.animation = None
+        self.frame = -1
+
+    @property
+    def sprite(self):
+        if self._sprite is None:
+            self._sprite = get_sprite(self._image)
+        return self._sprite
+
+    def play(self, animation: Animation, t: int = 0) -> None:
+        """Mostra o quadro de ``animation`` no tick t, trocando a imagem só se o quadro mudou."""
+        index = animation.frame_index(t)
+        if index != self.frame or animation is not self.animation:
+            self.animation = animation
+            self.frame = index
+            self._image = animation.frames[index]
+            self._sprite = animation.sprite(index)
+
+
+class Gem(Entity):
+    """Gema de energia; ``color`` é a cor usada no nome do sprite."""
+
+    __slots__ = ('color',)
+
+    def __init__(self, color: str, pos: tuple):
+        super().__init__(f'items/gem_{color}', pos)
+        self.color = color
+
+
+class Player(Entity):
+    """
+    Prof. Bolota, controlado pelo jogador.
+
+    Attributes:
+        speed_y: Velocidade vertical (px por tick, positiva para baixo)
+        jump_count: Pulos feitos desde o último pouso (máximo 2)
+        on_ground: Se está apoiado em uma plataforma neste tick
+        drop_through_frames: Ticks restantes atravessando plataformas
+        walk_anim_counter: Contador da animação de caminhada (0 a 19)
+    """
+
+    __slots__ = ('speed_y', 'jump_count', 'on_ground', 'drop_through_frames', 'walk_anim_counter')
+
+    animations = PLAYER_ANIMATIONS
+
+    def __init__(self, pos: tuple = (0, 0)):
+        super().__init__('player/prof_bolota_idle', pos)
+        self.play(self.animations['idle'])
+        self.speed_y = 0
+        self.jump_count = 0
+        self.on_ground = False
+        self.drop_through_frames = 0
+        self.walk_anim_counter = 0
+
+
+class Enemy(Entity):
+    """
+    Inimigo que patrulha entre pontos de uma plataforma.
+
+    Attributes:
+        type: Cor do personagem ('beige', 'pink', 'purple')
+        patrol_points: Pontos (x, y) percorridos em ordem
+        current_target: Índice do ponto de patrulha perseguido
+        speed: Velocidade de patrulha (px por tick)
+        walk_anim_counter: Contador da animação de caminhada (0 a 19)
+        stand_offset: Distância do centro do sprite até os pés
+        base_y: Altura fixa do centro sobre a plataforma
+        animations: Tabela de animações do tipo (ver enemy_animations)
+    """
+
+    __slots__ = ('type', 'patrol_points', 'current_target', 'speed', 'walk_anim_counter',
+                 'stand_offset', 'base_y', 'animations')
+
+    def __init__(self, enemy_type: str, patrol_points: list):
+        super().__init__(f'enemies/character_{enemy_type}_idle', patrol_points[0])
+        self.animations = enemy_animations(enemy_type)
+        self.play(self.animations['idle'])
+        self.type = enemy_type
+        self.patrol_points = patrol_points
+        self.current_target = 1
+        self.speed = ENEMY_SPEED
+        self.walk_anim_counter = 0
+        # Ajusta posição vertical para ficar corretamente sobre a plataforma
+        self.stand_offset = get_image_half_size(self.image, (20, 20))[1]
+        self.base_y = self.y = float(patrol_points[0][1] - self.stand_offset)
+
+
+# ============================================================
+# MOTOR VETORIZADO DE INIMIGOS
+# ============================================================
+class EnemyEngine:
+    """
+    Patrulha de muitos inimigos em arrays NumPy contíguos (struct-of-arrays).
+
+    Cada tick avança todos os inimigos com algumas operações em lote, sem
+    acessar os objetos Enemy. Eles só recebem posição e imagem em
+    ``sync_entities``, chamado para os inimigos que serão desenhados.
+
+    Attributes:
+        enemies: Inimigos (Enemy), na mesma ordem dos arrays
+        x, y: Posição de cada inimigo (y é a altura fixa sobre a plataforma)
+        prev_x: Posição x no início do tick, usada na interpolação do desenho
+        speed: Velocidade de patrulha (px por tick)
+        target: Índice do ponto de patrulha que cada inimigo persegue
+        patrol_x: Coordenadas x de todos os pontos de patrulha, concatenadas
+        patrol_start, patrol_len: Trecho de patrol_x que pertence a cada inimigo
+        anim: Contador da animação de caminhada (0 a 19)
+        walking: Se o inimigo já andou (antes disso é desenhado parado)
+    """
+
+    def __init__(self, enemies: list, hit_half: int = ENEMY_HITBOX_HALF):
+        self.enemies = enemies
+        self.hit_half = hit_half
+        self.x = np.array([a.x for a in enemies], dtype=np.float64)
+        self.y = np.array([a.y for a in enemies], dtype=np.float64)
+        self.prev_x = self.x.copy()
+        self.speed = np.array([a.speed for a in enemies], dtype=np.float64)
+        self.target = np.array([a.current_target for a in enemies], dtype=np.intp)
+        lengths = [len(a.patrol_points) for a in enemies]
+        self.patrol_len = np.array(lengths, dtype=np.intp)
+        self.patrol_start = np.zeros(len(enemies), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=self.patrol_start[1:])
+        self.patrol_x = np.array([pt[0] for a in enemies for pt in a.patrol_points], dtype=np.float64)
+        self.anim = np.array([a.walk_anim_counter for a in enemies], dtype=np.intp)
+        self.anim_len = np.array([a.animations['walk'].length for a in enemies], dtype=np.intp)
+        self.walking = np.zeros(len(enemies), dtype=bool)
+        self.index = np.arange(len(enemies))
+        half = [get_image_half_size(a.animations['idle'].frames[0], (20, 20)) for a in enemies]
+        self.half_w = np.array([hw for hw, _ in half], dtype=np.float64)
+        self.half_h = np.array([hh for _, hh in half], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.enemies)
+
+    def step(self, ticks: int = 0, interval: int = 1, active: Rect = None) -> None:
+        """
+        Avança a patrulha de todos os inimigos em um tick.
+
+        Args:
+            ticks: Tick atual, usado para escalonar os inimigos fora da área ativa
+            interval: Inimigos fora de ``active`` só andam a cada N ticks (N passos de uma vez)
+            active: Área em que os inimigos andam todo tick (None = todos)
+        """
+        x = self.x
+        target_x = self.patrol_x[self.patrol_start + self.target]
+        dx = target_x - x
+        if interval > 1 and active is not None:
+            y = self.y
+            inside = (x >= active.left) & (x < active.right) & (y >= active.top) & (y < active.bottom)
+            due = inside | ((ticks + self.index) % interval == 0)
+            steps = np.where(inside, 1, interval)
+            move = self.speed * steps
+            # Passos acumulados param no ponto de patrulha, como em update_enemies
+            delta = np.where(steps > 1, np.clip(dx, -move, move), np.sign(dx) * move)
+            delta[~due] = 0
+            self.anim = np.where(due, (self.anim + steps) % self.anim_len, self.anim)
+        else:
+            due = True
+            delta = np.sign(dx) * self.speed
+            self.anim = (self.anim + 1) % self.anim_len
+        x += delta
+        self.walking |= due
+        reached = due & (np.abs(x - target_x) <= self.speed)
+        self.target = np.where(reached, (self.target + 1) % self.patrol_len, self.target)
+
+    def save_positions(self) -> None:
+        """Guarda as posições do início do tick para lerp_x."""
+        self.prev_x[:] = self.x
+
+    def lerp_x(self, alpha: float):
+        """Posições x interpoladas entre o início e o fim do último tick."""
+        if alpha >= 1:
+            return self.x
+        return self.prev_x + (self.x - self.prev_x) * alpha
+
+    def hit_index(self, rect: Rect) -> int:
+        """
+        Retorna o primeiro inimigo (menor índice) cuja hitbox colide com o retângulo.
+
+        Returns:
+            Índice do inimigo, ou -1 se nenhum colidir
+        """
+        half = self.hit_half
+        left = np.rint(self.x) - half
+        top = np.rint(self.y) - half
+        hits = ((left < rect.right) & (left + half * 2 > rect.left)
+                & (top < rect.bottom) & (top + half * 2 > rect.top))
+        found = np.flatnonzero(hits)
+        return int(found[0]) if found.size else -1
+
+    def visible_indices(self, view: Rect) -> list:
+        """Índices dos inimigos cujo sprite pode aparecer na câmera."""
+        x, y = self.x, self.y
+        mask = ((x + self.half_w > view.left) & (x - self.half_w < view.right)
+                & (y + self.half_h > view.top) & (y - self.half_h < view.bottom))
+        return np.flatnonzero(mask).tolist()
+
+    def sync_entities(self, indices=None) -> None:
+        """Copia posição e imagem dos arrays para os inimigos (todos, se indices for None)."""
+        enemies = self.enemies
+        if indices is None:
+            targets = enemies
+            xs, ys, anim, walking = self.x.tolist(), self.y.tolist(), self.anim.tolist(), self.walking.tolist()
+        else:
+            # Só os inimigos pedidos saem dos arrays (a câmera costuma mostrar poucos)
+            targets = [enemies[i] for i in indices]
+            xs, ys = self.x[indices].tolist(), self.y[indices].tolist()
+            anim, walking = self.anim[indices].tolist(), self.walking[indices].tolist()
+        for enemy, x, y, t, walk in zip(targets, xs, ys, anim, walking):
+            enemy.x = x
+            enemy.y = y
+            if walk:
+                enemy.play(enemy.animations['walk'], t)
+
+
+# ============================================================
+# NÚCLEO DE SIMULAÇÃO (INDEPENDENTE DA JANELA)
+# ============================================================
+class InputState:
+    """
+    Entradas do jogador em um tick de simulação.
+
+    Attributes:
+        left: Tecla de mover para a esquerda mantida pressionada
+        right: Tecla de mover para a direita mantida pressionada
+        down: Tecla de descer mantida pressionada (atravessa plataformas)
+        jump: Pulo pressionado neste tick
+        drop: Descida pressionada neste tick (inicia a travessia de plataforma)
+        interact: Espaço pressionado neste tick (tenta abrir a porta)
+    """
+
+    __slots__ = ('left', 'right', 'down', 'jump', 'drop', 'interact')
+
+    def __init__(self, left=False, right=False, down=False,
+                 jump=False, drop=False, interact=False):
+        self.left = left
+        self.right = right
+        self.down = down
+        self.jump = jump
+        self.drop = drop
+        self.interact = interact
+
+
+NO_INPUT = InputState()
+
+
+class GameWorld:
+    """
+    Estado e lógica de uma partida, sem depender do loop de janela do Pygame Zero.
+
+    Guarda jogador, plataformas, gemas, inimigos, chave e porta, e avança a
+    simulação um tick por vez com ``step(inputs)``. Sons e músicas são
+    repassados a callbacks opcionais, de modo que a simulação também roda
+    sem áudio (ver ``init_headless``).
+
+    Attributes:
+        levels: Lista de níveis jogados pela partida
+        rng: Gerador aleatório usado no posicionamento de gemas, porta e chave
+        on_sound: Callback chamado com o nome de um efeito sonoro (ou None)
+        on_music: Callback chamado com a trilha do nível carregado (ou None)
+        on_level_loaded: Callback chamado com o dicionário do nível carregado (ou None)
+        use_tilemap: Converte as plataformas em TileMap para as consultas de pouso
+        offscreen_enemy_interval: Inimigos fora da área ativa da câmera só
+            atualizam a cada N ticks (avançando N passos de uma vez); 1 desativa
+        prefetcher: LevelPrefetcher que prepara o próximo nível em segundo plano (ou None)
+        prepared: PreparedLevel usado no último load_level (ou None se montado na hora)
+        prev_positions: Posições de jogador e inimigos no início do tick (para interpolação)
+        prev_view: Canto superior esquerdo da câmera no início do tick (ou None)
+        enemy_engine_threshold: Níveis com pelo menos essa quantidade de inimigos usam
+            o EnemyEngine (se o NumPy estiver instalado)
+        enemy_engine: EnemyEngine do nível atual, ou None quando os inimigos são
+            atualizados um a um (nesse caso eles também ficam no índice espacial)
+        camera: Câmera que segue o jogador pelo nível
+        level_width, level_height: Tamanho do nível atual em pixels
+        outcome: None durante a partida; GAME_OVER ou VICTORY quando ela termina
+        ticks: Ticks simulados desde o último load_level
+        unmet_constraints: Restrições de posicionamento (distâncias mínimas,
+            alcance) que o último load_level não conseguiu respeitar (também
+            registradas no log)
+        reachability: ReachabilityGraph do nível atual (ou None)
+    """
+
+    def __init__(self, level_list=None, rng=None, on_sound=None, on_music=None,
+                 on_level_loaded=None, use_tilemap=USE_TILEMAP_TERRAIN,
+                 offscreen_enemy_interval=OFFSCREEN_ENEMY_INTERVAL, prefetcher=None,
+                 enemy_engine_threshold=ENEMY_ENGINE_THRESHOLD):
+        self.levels = levels if level_list is None else level_list
+        self.rng = random if rng is None else rng
+        self.on_sound = on_sound
+        self.on_music = on_music
+        self.on_level_loaded = on_level_loaded
+        self.use_tilemap = use_tilemap
+        self.offscreen_enemy_interval = max(1, offscreen_enemy_interval)
+        self.prefetcher = prefetcher
+        self.prepared = None
+        self.prev_positions = {}
+        self.prev_view = None
+        self.enemy_engine_threshold = enemy_engine_threshold
+        self.enemy_engine = None
+        self.camera = Camera()
+        self.level_width, self.level_height = WIDTH, HEIGHT
+        self.current_level = 0
+        self.player = None
+        self.door = None
+        self.key = None
+        self.grid = SpatialGrid()
+        self.reset()
+
+    def reset(self) -> None:
+        """Descarta as entidades do nível atual (usado ao voltar ao menu)."""
+        self.platforms = []
+        self.terrain = None
+        self.gems = []
+        self.enemies = []
+        self.enemy_engine = None
+        self.door = None
+        self.key = None
+        self.player = None
+        self.has_key = False
+        self.collected_gems = 0
+        self.total_gems = 0
+        self.door_open = False
+        self.door_tip_active = False
+        self.player_health = PLAYER_MAX_HEALTH
+        self.outcome = None
+        self.ticks = 0
+        self.unmet_constraints = []
+        self.reachability = None
+        self.prev_positions.clear()
+        self.prev_view = None
+        self.grid.clear()
+
+    def _emit_sound(self, sound_name: str) -> None:
+        if self.on_sound is not None:
+            self.on_sound(sound_name)
+
+    def player_rect(self) -> Rect:
+        """Retorna a hitbox atual do jogador."""
+        player = self.player
+        return Rect(player.x - PLAYER_HIT_W, player.y - PLAYER_HIT_H, PLAYER_HIT_W * 2, PLAYER_HIT_H * 2)
+
+    def load_level(self, level_index: int) -> None:
+        """
+        Carrega e inicializa um nível específico do jogo.
+
+        Esta função configura todas as entidades do nível: jogador, plataformas,
+        gemas, inimigos, chave e porta. Também reinicia as variáveis de estado.
+
+        Args:
+            level_index: Índice do nível a ser carregado (0-based)
+        """
+        rng = self.rng
+
+        # Cria as entidades fixas se ainda não foram instanciadas
+        if self.player is None:
+            self.player = Player((100, 300))
+            update_player_metrics()
+        if self.door is None:
+            self.door = Entity('items/door_closed')
+        if self.key is None:
+            self.key = Entity('items/key_blue')
+        player, door, key = self.player, self.door, self.key
+
+        self.current_level = level_index
+        # Nível já preparado pelo pré-carregador: só troca as referências
+        prepared = self.prefetcher.take(level_index) if self.prefetcher is not None else None
+        self.prepared = prepared
+        level = prepared.level if prepared is not None else self.levels[level_index]
+        self.level_width, self.level_height = level_w, level_h = level_size(level)
+
+        # Reseta variáveis específicas do nível
+        self.platforms = platforms = level['platforms']
+        self.terrain = None
+        if self.use_tilemap and prepared is not None:
+            self.terrain = prepared.terrain
+        elif self.use_tilemap:
+            box = get_sprite('tiles/box')
+            self.terrain = TileMap.from_rects(platforms, level_w, level_h,
+                                              tile_size=box.width if box else TILE_SIZE)
+        # Só plataformas que o jogador alcança a partir do início recebem objetos
+        base_platform = _get_start_platform(platforms, level_w, level_h)
+        # O grafo vem pronto do pré-carregador ou é reaproveitado ao recarregar o mesmo nível
+        reach = prepared.reachability if prepared is not None else self.reachability
+        if reach is None or reach.source is not platforms or reach.physics != physics_key():
+            reach = ReachabilityGraph(platforms, level_w, level_h, base_platform)
+        self.reachability = reach
+        self.unmet_constraints = unmet = []
+        spawn_plats = _get_spawnable_platforms(platforms, level_h)
+        reachable_plats = [p for p in spawn_plats if reach.is_reachable(p)]
+        if len(reachable_plats) < len(spawn_plats):
+            unmet.append(f"{len(spawn_plats) - len(reachable_plats)} plataforma(s) inalcançável(is) ignorada(s)")
+            spawn_plats = reachable_plats
+        if not spawn_plats:
+            # Sem plataforma elevada alcançável, os objetos ficam no piso onde o jogador começa
+            unmet.append("nenhuma plataforma elevada alcançável; objetos no piso de partida")
+            spawn_plats = [base_platform]
+        grid = self.grid
+        grid.clear()
+        self.gems = gems = []
+        self.enemies = enemies = []
+        self.door_open = False
+        self.door_tip_active = False
+        self.has_key = False
+        self.collected_gems = 0
+        self.player_health = PLAYER_MAX_HEALTH
+        self.outcome = None
+        self.ticks = 0
+        # Entidades do nível anterior não devem ser interpoladas com as novas
+        self.prev_positions.clear()
+        self.prev_view = None
+
+        # Posiciona gemas sobre as plataformas, a pelo menos GEM_MIN_DIST umas das outras
+        gem_placer = SpawnPlacer.above_platforms(spawn_plats, 30, 15, rng)
+        crowded = 0
+        for gem_data in level['gems']:
+            pos = gem_placer.sample()
+            if pos is None:
+                # Não há mais espaço: a gema entra mesmo sem a distância mínima
+                crowded += 1
+                pos = gem_placer.sample_any()
+            gem_placer.add_obstacle(pos, GEM_MIN_DIST)
+            gem = Gem(gem_data['color'], pos)
+            gems.append(gem)
+            grid.insert('gem', gem, Rect(gem.x - GEM_HITBOX_HALF, gem.y - GEM_HITBOX_HALF, GEM_HITBOX_HALF * 2, GEM_HITBOX_HALF * 2))
+
+        self.total_gems = len(gems)
+        if crowded:
+            unmet.append(f"{crowded} de {len(gems)} gemas a menos de {GEM_MIN_DIST} px de outra")
+
+        # Cria inimigos com patrulha e animação
+        for enemy_data in level['enemies']:
+            enemies.append(Enemy(enemy_data['type'], enemy_data['patrol']))
+
+        # Muitos inimigos: patrulha vetorizada; poucos: inimigos no índice espacial
+        self.enemy_engine = None
+        if np is not None and enemies and len(enemies) >= self.enemy_engine_threshold:
+            self.enemy_engine = EnemyEngine(enemies)
+        else:
+            for enemy in enemies:
+                grid.insert('enemy', enemy, Rect(enemy.x - ENEMY_HITBOX_HALF, enemy.y - ENEMY_HITBOX_HALF, ENEMY_HITBOX_HALF * 2, ENEMY_HITBOX_HALF * 2))
+
+        # Posiciona porta aleatoriamente no nível
+        spawn_on_floor = rng.random() < 0.5
+        if spawn_on_floor:
+            dplat = base_platform
+        else:
+            dplat = rng.choice(spawn_plats)
+
+        DOOR_HALF_W, DOOR_HALF_H = get_image_half_size('items/door_closed', (24, 40))
+
+        door_x = rng.randint(dplat.left + DOOR_HALF_W, dplat.right - DOOR_HALF_W)
+        door_y = dplat.top - DOOR_HALF_H
+        door_x = max(DOOR_HALF_W, min(door_x, level_w - DOOR_HALF_W))
+        door_y = max(DOOR_HALF_H, min(door_y, level_h - DOOR_HALF_H))
+        door.pos = (door_x, door_y)
+        door.image = 'items/door_closed'
+        door.visible = False
+        grid.insert('door', door, Rect(door.x - DOOR_TIP_HITBOX_WIDTH//2, door.y - DOOR_TIP_HITBOX_HEIGHT//2, DOOR_TIP_HITBOX_WIDTH, DOOR_TIP_HITBOX_HEIGHT))
+
+        # Posiciona chave mantendo distância mínima da porta
+        k_candidates = [p for p in spawn_plats if p is not dplat] or spawn_plats
+        KEY_HALF_W, KEY_HALF_H = get_image_half_size(f"items/key_{level['key_color']}", (12, 12))
+        key_placer = SpawnPlacer.above_platforms(k_candidates, KEY_HALF_H, KEY_HALF_W, rng)
+        key_placer.add_obstacle((door_x, door_y), KEY_MIN_DIST_FROM_DOOR)
+        key_pos = key_placer.sample()
+        if key_pos is None:
+            unmet.append(f"chave a menos de {KEY_MIN_DIST_FROM_DOOR} px da porta")
+            key_pos = key_placer.farthest_from((door_x, door_y))
+        if key_pos is None:
+            key_pos = (k_candidates[0].left + KEY_HALF_W, k_candidates[0].top - KEY_HALF_H)
+        key_x, key_y = key_pos
+        key_x = max(KEY_HALF_W, min(key_x, level_w - KEY_HALF_W))
+        key_y = max(KEY_HALF_H, min(key_y, level_h - KEY_HALF_H))
+        key.pos = (key_x, key_y)
+        key.image = f"items/key_{level['key_color']}"
+        key.visible = False
+        grid.insert('key', key, Rect(key.x - KEY_HITBOX_HALF, key.y - KEY_HITBOX_HALF, KEY_HITBOX_HALF * 2, KEY_HITBOX_HALF * 2))
+
+        if unmet:
+            logger.warning("Nível %d: restrições de posicionamento não atendidas: %s",
+                           level_index + 1, "; ".join(unmet))
+
+        # Posiciona jogador no início do nível (canto esquerdo)
+        player.x = max(PLAYER_HALF_W, 20 + PLAYER_HALF_W)
+        player.y = base_platform.top - PLAYER_HIT_H
+        player.speed_y = 0
+        player.play(player.animations['idle'])
+        player.walk_anim_counter = 0
+        player.jump_count = 0
+        player.on_ground = False
+        # Controle para mecânica de atravessar plataformas
+        player.drop_through_frames = 0
+        self.camera.follow(player.x, player.y, level_w, level_h)
+
+        if self.on_level_loaded is not None:
+            self.on_level_loaded(level)
+        if self.on_music is not None:
+            self.on_music(level['music'])
+        if self.prefetcher is not None:
+            self.prefetcher.prefetch(level_index + 1)
+
+    def step(self, inputs: InputState = NO_INPUT) -> None:
+        """
+        Avança a simulação em um tick.
+
+        Processa primeiro os eventos de tecla do tick (pulo, descida, porta),
+        como o Pygame Zero faz antes de chamar update(), e depois a patrulha
+        dos inimigos e a física/colisões do jogador.
+
+        Args:
+            inputs: Estado das entradas neste tick
+        """
+        if self.outcome is not None:
+            return
+        if inputs.jump:
+            self.jump()
+        if inputs.drop:
+            self.drop_through()
+        if inputs.interact:
+            self.try_open_door()
+            if self.outcome is not None:
+                return
+        self.update_enemies()
+        self.check_collisions(inputs)
+        self.camera.follow(self.player.x, self.player.y, self.level_width, self.level_height)
+        self.ticks += 1
+
+    def save_positions(self) -> None:
+        """Guarda as posições do início do tick, usadas por lerp_pos e render_view."""
+        prev = self.prev_positions
+        prev.clear()
+        player = self.player
+        prev[id(player)] = (player.x, player.y)
+        if self.enemy_engine is not None:
+            self.enemy_engine.save_positions()
+        else:
+            for enemy in self.enemies:
+                prev[id(enemy)] = (enemy.x, enemy.y)
+        self.prev_view = self.camera.view.topleft
+
+    def lerp_pos(self, entity, alpha: float) -> tuple[float, float]:
+        """
+        Posição da entidade interpolada entre o início e o fim do último tick.
+
+        Args:
+            entity: Jogador ou inimigo
+            alpha: 0 = início do tick, 1 = posição atual
+        """
+        prev = self.prev_positions.get(id(entity))
+        if prev is None or alpha >= 1:
+            return entity.x, entity.y
+        return (prev[0] + (entity.x - prev[0]) * alpha,
+                prev[1] + (entity.y - prev[1]) * alpha)
+
+    def render_view(self, alpha: float) -> Rect:
+        """Retângulo da câmera interpolado da mesma forma que lerp_pos."""
+        view = self.camera.view
+        if self.prev_view is None or alpha >= 1:
+            return view
+        px, py = self.prev_view
+        return Rect(round(px + (view.x - px) * alpha), round(py + (view.y - py) * alpha),
+                    view.width, view.height)
+
+    def jump(self) -> None:
+        """Aplica o pulo (duplo) do jogador, se ainda houver pulos disponíveis."""
+        player = self.player
+        if player.jump_count < 2:
+            player.speed_y = -JUMP_SPEED
+            player.play(player.animations['jump'])
+            self._emit_sound('som_pulo')
+            player.jump_count += 1
+            player.on_ground = False
+
+    def drop_through(self) -> None:
+        """Inicia a descida através da plataforma em que o jogador está."""
+        player = self.player
+        if player.on_ground:
+            player.drop_through_frames = 10
+            player.speed_y = max(player.speed_y, 2)
+            player.y += 2
+
+    def update_enemies(self) -> None:
+        """
+        Atualiza movimento de patrulha e animação de todos os inimigos.
+
+        Com ``offscreen_enemy_interval`` > 1, inimigos fora da área ativa da
+        câmera só são processados a cada N ticks, avançando N passos de uma vez.
+        """
+        grid = self.grid
+        interval = self.offscreen_enemy_interval
+        active = self.camera.active_area() if interval > 1 else None
+        if self.enemy_engine is not None:
+            self.enemy_engine.step(self.ticks, interval, active)
+            return
+        for index, enemy in enumerate(self.enemies):
+            steps = 1
+            if active is not None and not active.collidepoint(enemy.x, enemy.y):
+                # Escalona os inimigos fora da tela entre os ticks do intervalo
+                if (self.ticks + index) % interval:
+                    continue
+                steps = interval
+            target_x, _ = enemy.patrol_points[enemy.current_target]
+            move = enemy.speed * steps
+            if enemy.x < target_x:
+                enemy.x = min(enemy.x + move, target_x) if steps > 1 else enemy.x + move
+            elif enemy.x > target_x:
+                enemy.x = max(enemy.x - move, target_x) if steps > 1 else enemy.x - move
+
+            # Animação de caminhada (a imagem só muda quando o quadro muda)
+            walk = enemy.animations['walk']
+            enemy.walk_anim_counter = (enemy.walk_anim_counter + steps) % walk.length
+            enemy.play(walk, enemy.walk_anim_counter)
+
+            # Mantém o inimigo fixo na altura da plataforma
+            enemy.y = enemy.base_y
+            grid.move(enemy, (enemy.x, enemy.y))
+
+            # Inverte direção ao atingir ponto de patrulha
+            if abs(enemy.x - target_x) <= enemy.speed:
+                enemy.current_target = (enemy.current_target + 1) % len(enemy.patrol_points)
+
+    def check_collisions(self, inputs: InputState = NO_INPUT) -> None:
+        """
+        Processa física do jogador e detecta todas as colisões do jogo.
+
+        Inclui: gravidade, colisão com plataformas, movimento horizontal,
+        colisão com inimigos, coleta de gemas e chaves, interação com porta.
+
+        Args:
+            inputs: Estado das teclas mantidas pressionadas neste tick
+        """
+        player, key, door = self.player, self.key, self.door
+        prev_y = player.y
+        prev_bottom = prev_y + PLAYER_HIT_H
+        player.on_ground = False
+
+        # Aplica gravidade ao jogador
+        player.speed_y += GRAVITY
+        player.speed_y = min(player.speed_y, MAX_FALL_SPEED)
+        player.y += player.speed_y
+
+        if player.drop_through_frames > 0:
+            player.drop_through_frames -= 1
+
+        player_rect = self.player_rect()
+        current_bottom = player.y + PLAYER_HIT_H
+
+        # Permite cair através de plataformas (exceto o piso de segurança)
+        dropping = inputs.down or player.drop_through_frames > 0
+        if self.terrain is not None:
+            candidates = self.terrain.landing_candidates(
+                player_rect.left, player_rect.right,
+                min(prev_bottom, current_bottom - 6), current_bottom + 1, dropping)
+        else:
+            floor_top = self.level_height - 25
+            candidates = [p for p in self.platforms if not (dropping and p.top < floor_top)]
+
+        # Detecta aterrissagem sobre plataformas
+        for platform in candidates:
+            if (
+                player.speed_y > 0
+                and prev_bottom <= platform.top
+                and player_rect.colliderect(platform)
+                and (player_rect.right > platform.left and player_rect.left < platform.right)
+            ):
+                player.y = platform.top - PLAYER_HIT_H
+                player.speed_y = 0
+                player.jump_count = 0
+                player.on_ground = True
+                break
+            if (
+                player.speed_y > 0
+                and platform.left <= player.x <= platform.right
+                and platform.top <= current_bottom <= platform.top + 6
+            ):
+                player.y = platform.top - PLAYER_HIT_H
+                player.speed_y = 0
+                player.jump_count = 0
+                player.on_ground = True
+                break
 
-def make_buttons(base_x: int, base_y: int, width: int, height: int,
-                 items: list[tuple[str, callable]], spacing: int = 60) -> list:
-    """
-    Cria uma lista de botões alinhados verticalmente.
-    
-    Args:
-        base_x: Posição X inicial
-        base_y: Posição Y inicial
-        width: Largura de cada botão
-        height: Altura de cada botão
-        items: Lista de tuplas (texto, função_callback)
-        spacing: Espaçamento vertical entre botões
-    
-    Returns:
-        Lista de objetos Button
-    """
-    buttons = []
-    for i, (text, action) in enumerate(items):
-        y = base_y + i * spacing
-        buttons.append(Button(base_x, y, width, height, text, action))
-    return buttons
+        # Processa movimento horizontal e contador da animação de caminhada
+        animations = player.animations
+        walking = inputs.left or inputs.right
+        if inputs.left:
+            player.x -= PLAYER_SPEED
+        elif inputs.right:
+            player.x += PLAYER_SPEED
+        if walking:
+            player.walk_anim_counter = (player.walk_anim_counter + 1) % animations['walk'].length
+
+        player.x = max(PLAYER_HALF_W, min(player.x, self.level_width - PLAYER_HALF_W))
+
+        if player.y > self.level_height - PLAYER_HIT_H and player.speed_y > 0:
+            player.y = self.level_height - PLAYER_HIT_H
+            player.speed_y = 0
+            player.jump_count = 0
+            player.on_ground = True
+
+        # Escolhe a animação do jogador: no ar, andando ou parado
+        if not player.on_ground:
+            player.play(animations['jump'])
+        elif walking:
+            player.play(animations['walk'], player.walk_anim_counter)
+        else:
+            player.play(animations['idle'])
+
+        # Consulta no índice espacial só as entidades próximas da hitbox do jogador
+        hit_enemies = []
+        hit_gems = []
+        key_hit = door_hit = False
+        for kind, obj in self.grid.query(player_rect):
+            if kind == 'enemy':
+                hit_enemies.append(obj)
+            elif kind == 'gem':
+                hit_gems.append(obj)
+            elif kind == 'key':
+                key_hit = True
+            else:
+                door_hit = True
+
+        # Detecta colisão com inimigos e aplica dano (apenas um inimigo por tick)
+        enemy_x = None
+        if self.enemy_engine is not None:
+            index = self.enemy_engine.hit_index(player_rect)
+            if index >= 0:
+                enemy_x = self.enemy_engine.x[index]
+        elif hit_enemies:
+            enemy = min(hit_enemies, key=self.enemies.index) if len(hit_enemies) > 1 else hit_enemies[0]
+            enemy_x = enemy.x
+        if enemy_x is not None:
+            self.player_health -= ENEMY_DAMAGE
+            self._emit_sound('colisao')
+
+            if player.x < enemy_x:
+                player.x -= 30
+            else:
+                player.x += 30
 
-def align_buttons_vertical(buttons: list, base_y: int, spacing: int = 60) -> None:
-    """Realinha botões existentes verticalmente a partir de uma nova posição Y."""
-    for i, btn in enumerate(buttons):
-        btn.rect.y = base_y + i * spacing
+            if self.player_health <= 0:
+                self.outcome = GAME_OVER
 
-def init_screen_buttons(button_list_name: str, items: list[tuple[str, callable]], 
-                        base_y: int = None, width: int = 280, height: int = 44, 
-                        spacing: int = 60) -> list:
-    """Inicializa botões centralizados horizontalmente para uma tela."""
-    if base_y is None:
-        base_y = HEIGHT // 2 - 20
-    
-    base_x = WIDTH // 2 - width // 2
-    return make_buttons(base_x, base_y, width, height, items, spacing)
+        # Processa coleta de gemas
+        for gem in hit_gems:
+            self.gems.remove(gem)
+            self.grid.remove(gem)
+            self.collected_gems += 1
+            self._emit_sound('coletar_cristal')
 
-def init_game_over_buttons():
-    """Inicializa os botões da tela de Game Over."""
-    global game_over_buttons
-    items = [("Reiniciar", restart_level), ("Voltar ao menu", back_to_menu)]
-    game_over_buttons = init_screen_buttons('game_over', items)
+            if self.collected_gems >= self.total_gems:
+                key.visible = True
 
-def restart_level():
-    """Reinicia o nível atual mantendo o progresso."""
-    set_state(PLAYING)
-    load_level(current_level)
+        # Processa coleta de chave
+        if key.visible and key_hit:
+            self.has_key = True
+            key.visible = False
+            self._emit_sound('coletar_cristal')
+            door.visible = True
+
+        # Verifica proximidade com a porta para exibir dica
+        self.door_tip_active = door_hit
+
+    def try_open_door(self) -> bool:
+        """
+        Tenta abrir a porta se o jogador possui chave e está próximo.
+
+        Returns:
+            True se a porta foi aberta (próximo nível carregado ou vitória)
+        """
+        door = self.door
+        near_door = any(kind == 'door' for kind, _ in self.grid.query(self.player_rect()))
+        if self.has_key and self.collected_gems >= self.total_gems and near_door:
+            self.door_open = True
+            door.image = 'items/door_open'
+            self._emit_sound('som_alavanca')
+            if self.current_level < len(self.levels) - 1:
+                self.load_level(self.current_level + 1)
+            else:
+                self.outcome = VICTORY
+            return True
+        self._emit_sound('menu_click')
+        return False
 
-def back_to_menu():
-    """Retorna ao menu principal, resetando o estado do jogo."""
-    global current_level, game_state, intro_music_started
-    
-    # Para a música antes de limpar as variáveis
-    try:
-        music.stop()
-    except Exception:
-        pass
-    
-    # Reseta variáveis globais para novo jogo
-    current_level = 0
-    intro_music_started = False
-    reset_menu_context()
-    init_menu_buttons()
-    set_state(MENU)
 
-def init_victory_buttons():
-    """Inicializa os botões da tela de vitória."""
-    global victory_buttons
-    items = [("Jogar novamente", play_again), ("Voltar ao menu", back_to_menu)]
-    victory_buttons = init_screen_buttons('victory', items, base_y=380, spacing=60)
+# ============================================================
+# GRAVAÇÃO E REPLAY DE ENTRADAS
+# ============================================================
+# Uma gravação (.eqrec) segue o formato dos níveis: JSON por linha. A primeira
+# linha é o cabeçalho (seed, nível inicial e configuração da simulação); cada
+# linha seguinte é [máscara, ticks], uma sequência de ticks com as mesmas
+# entradas; a última linha traz o total de ticks e o resumo do estado final.
+REPLAY_FORMAT = 'energy-quest-replay'
+REPLAY_FORMAT_VERSION = 1
+INPUT_FIELDS = InputState.__slots__  # Bit i da máscara = INPUT_FIELDS[i]
 
-def play_again():
-    """Reinicia o jogo desde o primeiro nível."""
-    set_state(PLAYING)
-    load_level(0)
 
-def play_victory_music():
-    """Reproduz a música de vitória ao completar todos os níveis."""
-    if not music_enabled:
-        return
-    music.play('congrats')
+def input_mask(inputs: InputState) -> int:
+    """Codifica as entradas de um tick em um inteiro de 6 bits."""
+    mask = 0
+    for bit, name in enumerate(INPUT_FIELDS):
+        if getattr(inputs, name):
+            mask |= 1 << bit
+    return mask
 
-def draw_fullscreen_background(image_name: str) -> None:
-    """Preenche a tela repetindo tiles do fundo para cobrir toda a área."""
-    try:
-        surf = images.load(image_name)
-        tile_w, tile_h = surf.get_width(), surf.get_height()
-    except Exception:
-        tile_w, tile_h = WIDTH, HEIGHT
-    for x in range(0, WIDTH, tile_w):
-        for y in range(0, HEIGHT, tile_h):
-            screen.blit(image_name, (x, y))
 
-def draw_text_fallback(text: str, **kwargs) -> None:
-    """Desenha texto na tela com fallback para fonte padrão se Impact não estiver disponível."""
-    try:
-        screen.draw.text(text, fontname="Impact", **kwargs)
-    except Exception:
-        screen.draw.text(text, **kwargs)
+_MASK_INPUTS = [InputState(*((mask >> bit) & 1 == 1 for bit in range(len(INPUT_FIELDS))))
+                for mask in range(1 << len(INPUT_FIELDS))]
 
 
-def reset_menu_context() -> None:
-    """Reseta todas as variáveis de estado do nível atual."""
-    global platforms, gems, enemies, door, key, has_key, collected_gems, total_gems
-    global door_open, door_tip_active, player
-    platforms = []
-    gems = []
-    enemies = []
-    door = None
-    key = None
-    has_key = False
-    collected_gems = 0
-    total_gems = 0
-    door_open = False
-    door_tip_active = False
-    player = None
-
-def _get_spawnable_platforms(platform_list):
-    """Filtra plataformas válidas para spawnar objetos, excluindo o piso de segurança."""
-    return [p for p in platform_list if p.top < HEIGHT - 25 and p.width >= 40]
+def world_state_digest(world: GameWorld) -> str:
+    """
+    Resumo SHA-1 do estado da simulação, usado para conferir replays bit a bit.
 
-def _random_point_above_platform(p: Rect, dy: int = 30) -> tuple[int, int]:
-    x = random.randint(p.left + 15, p.right - 15)
-    return (x, p.top - dy)
+    Inclui nível, ticks, resultado, jogador (posição e física), itens e a
+    posição exata (repr dos floats) de todos os inimigos.
+    """
+    player, key, door = world.player, world.key, world.door
+    state = (world.current_level, world.ticks, world.outcome, world.player_health,
+             world.collected_gems, world.total_gems, world.has_key, world.door_open,
+             (player.x, player.y, player.speed_y, player.jump_count, player.on_ground,
+              player.drop_through_frames) if player is not None else None,
+             (key.x, key.y, key.visible) if key is not None else None,
+             (door.x, door.y) if door is not None else None,
+             [(gem.x, gem.y) for gem in world.gems])
+    digest = hashlib.sha1(repr(state).encode())
+    engine = world.enemy_engine
+    if engine is not None:
+        for values in (engine.x, engine.y, engine.target, engine.anim):
+            digest.update(values.tobytes())
+    else:
+        digest.update(repr([(e.x, e.y, e.current_target, e.walk_anim_counter)
+                            for e in world.enemies]).encode())
+    return digest.hexdigest()
 
 
-def blit_scaled(image_name: str, topleft: tuple[int,int], size: tuple[int,int]) -> None:
-    """Desenha imagem centralizada dentro de uma área especificada."""
-    try:
-        surf = images.load(image_name)
-        iw, ih = surf.get_width(), surf.get_height()
-        x, y = topleft
-        tw, th = size
-        cx = x + (tw // 2) - (iw // 2)
-        cy = y + (th // 2) - (ih // 2)
-        screen.blit(image_name, (cx, cy))
-    except Exception:
-        screen.blit(image_name, topleft)
+class InputLog:
+    """
+    Gravação compacta de uma partida: seed, configuração e entradas por tick.
 
-def draw_platform_tiled(rect: Rect) -> None:
-    """Desenha plataforma preenchendo o retângulo com tiles repetidos."""
-    try:
-        surf = images.load('tiles/box')
-        tw, th = surf.get_width(), surf.get_height()
-    except Exception:
-        tw, th = 32, 32
-    for x in range(rect.left, rect.right, tw):
-        for y in range(rect.top, rect.bottom, th):
-            screen.blit('tiles/box', (x, y))
+    As entradas são guardadas em sequências [máscara, ticks] (run-length), de
+    modo que segurar uma tecla por um minuto ocupa uma única linha. Com a
+    mesma seed, configuração e níveis, ``replay`` reproduz a partida sem
+    janela e na velocidade máxima, chegando ao mesmo estado bit a bit.
 
-def blit_image_centered(image_name: str, center: tuple[int, int], size: int) -> None:
-    """Desenha imagem centralizada em uma coordenada específica."""
-    try:
-        surf = images.load(image_name)
-        iw, ih = surf.get_width(), surf.get_height()
-    except Exception:
-        iw = ih = size
-    topleft = (center[0] - iw // 2, center[1] - ih // 2)
-    screen.blit(image_name, topleft)
+    Attributes:
+        seed: Semente do random.Random usado como rng do GameWorld
+        level: Índice do nível em que a partida começou
+        config: Configuração do GameWorld e da simulação no momento da gravação
+        runs: Sequências [máscara, quantidade de ticks]
+        ticks: Total de ticks gravados
+        digest: world_state_digest ao fim da gravação (None até ``finish``)
+    """
+
+    def __init__(self, seed: int, level: int, config: dict):
+        self.seed = seed
+        self.level = level
+        self.config = config
+        self.runs = []
+        self.ticks = 0
+        self.digest = None
+
+    @classmethod
+    def for_world(cls, world: GameWorld, seed: int, level: int) -> 'InputLog':
+        """Cria uma gravação com a configuração atual do mundo."""
+        level_list = world.levels
+        config = {
+            'simulation_hz': SIMULATION_HZ,
+            'use_tilemap': world.use_tilemap,
+            'offscreen_enemy_interval': world.offscreen_enemy_interval,
+            'enemy_engine_threshold': world.enemy_engine_threshold,
+            'levels': [entry['file'] for entry in level_list.entries]
+                      if isinstance(level_list, LevelCatalog) else None,
+        }
+        return cls(seed, level, config)
+
+    def record(self, inputs: InputState) -> None:
+        """Acrescenta as entradas de um tick."""
+        mask = input_mask(inputs)
+        runs = self.runs
+        if runs and runs[-1][0] == mask:
+            runs[-1][1] += 1
+        else:
+            runs.append([mask, 1])
+        self.ticks += 1
+
+    def finish(self, world: GameWorld) -> None:
+        """Guarda o resumo do estado final, conferido depois no replay."""
+        self.digest = world_state_digest(world)
+
+    def inputs(self):
+        """Itera as entradas gravadas, um InputState por tick."""
+        for mask, count in self.runs:
+            inputs = _MASK_INPUTS[mask]
+            for _ in range(count):
+                yield inputs
+
+    def save(self, path: str) -> None:
+        """Grava o arquivo .eqrec."""
+        header = {'format': REPLAY_FORMAT, 'version': REPLAY_FORMAT_VERSION,
+                  'seed': self.seed, 'level': self.level, **self.config}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for run in self.runs:
+                f.write(json.dumps(run, separators=(',', ':')) + '\n')
+            f.write(json.dumps({'ticks': self.ticks, 'digest': self.digest}) + '\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'InputLog':
+        """Lê um arquivo .eqrec; ValueError se o formato ou a versão não forem suportados."""
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if not lines or not isinstance(lines[0], dict) or lines[0].get('format') != REPLAY_FORMAT:
+            raise ValueError(f"{path}: não é uma gravação do Energy Quest")
+        header = dict(lines[0])
+        if header.pop('version') != REPLAY_FORMAT_VERSION:
+            raise ValueError(f"{path}: versão de gravação não suportada: {lines[0].get('version')}")
+        del header['format']
+        log = cls(header.pop('seed'), header.pop('level'), header)
+        for record in lines[1:]:
+            if isinstance(record, dict):
+                log.digest = record.get('digest')
+            else:
+                log.runs.append(record)
+                log.ticks += record[1]
+        return log
+
+    def replay(self, level_list=None, on_tick=None) -> GameWorld:
+        """
+        Reproduz a partida sem janela nem áudio, na velocidade máxima.
+
+        Requer ``init_headless`` (ou o Pygame Zero) para o registro de sprites.
+
+        Args:
+            level_list: Níveis usados (padrão: o catálogo levels)
+            on_tick: Chamado com o mundo depois de cada tick (ou None)
+
+        Returns:
+            O GameWorld no estado final; compare world_state_digest(world) com ``digest``
+        """
+        config = self.config
+        level_list = levels if level_list is None else level_list
+        recorded = config.get('levels')
+        if (recorded is not None and isinstance(level_list, LevelCatalog)
+                and recorded != [entry['file'] for entry in level_list.entries]):
+            logger.warning("Os níveis mudaram desde a gravação; o replay pode divergir")
+        if config.get('simulation_hz', SIMULATION_HZ) != SIMULATION_HZ:
+            logger.warning("Gravação feita com SIMULATION_HZ=%s; o replay pode divergir", config['simulation_hz'])
+        world = GameWorld(level_list, rng=random.Random(self.seed),
+                          use_tilemap=config.get('use_tilemap', USE_TILEMAP_TERRAIN),
+                          offscreen_enemy_interval=config.get('offscreen_enemy_interval', OFFSCREEN_ENEMY_INTERVAL),
+                          enemy_engine_threshold=config.get('enemy_engine_threshold', ENEMY_ENGINE_THRESHOLD))
+        world.load_level(self.level)
+        step = world.step
+        for inputs in self.inputs():
+            step(inputs)
+            if on_tick is not None:
+                on_tick(world)
+        return world
+
+
+def replay_main(path: str) -> int:
+    """Reproduz uma gravação pela linha de comando e confere o estado final."""
+    init_headless()
+    log = InputLog.load(path)
+    start = time.perf_counter()
+    world = log.replay()
+    elapsed = time.perf_counter() - start
+    digest = world_state_digest(world)
+    print(f"{log.ticks} ticks em {elapsed:.3f} s ({log.ticks / max(elapsed, 1e-9):.0f} ticks/s); "
+          f"nível {world.current_level + 1}, resultado: {world.outcome or 'em andamento'}")
+    if log.digest is None:
+        print(f"estado final {digest} (gravação sem resumo para conferir)")
+        return 0
+    if digest != log.digest:
+        print(f"DIVERGIU: estado final {digest}, gravado {log.digest}")
+        return 1
+    print(f"estado final idêntico ao gravado ({digest})")
+    return 0
+
+
+def init_headless() -> None:
+    """
+    Prepara o Pygame para simular sem abrir janela nem dispositivo de áudio.
+
+    Usa os drivers SDL 'dummy' e uma superfície de 1x1 para que o registro
+    de sprites possa carregar as imagens. Deve ser chamada antes de ``GameWorld.load_level``
+    quando o módulo é importado fora do Pygame Zero; depois dela o
+    ``prepare_runtime`` do primeiro frame não é mais executado.
+    """
+    global runtime_ready
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+    if loaders.root != GAME_DIR:
+        loaders.set_root(GAME_DIR)
+    build_sprite_registry()
+    update_player_metrics()
+    runtime_ready = True
 
 
 def init_menu_buttons():
@@ -474,7 +3241,7 @@ def toggle_music(play_feedback: bool = True):
                 music.play('intro_theme')
                 intro_music_started = True
             elif game_state == PLAYING:
-                music.play(levels[current_level]['music'])
+                music.play(levels[world.current_level]['music'])
             elif game_state == VICTORY:
                 play_victory_music()
         else:
@@ -492,295 +3259,100 @@ def show_tutorial():
 def quit_game():
     """Encerra a aplicação do jogo."""
     play_sound('menu_click')
+    stop_recording()
     exit()
 
 def play_sound(sound_name: str) -> None:
     """Reproduz um efeito sonoro específico se o som estiver habilitado."""
-    if not sound_enabled:
-        return
-    try:
-        snd = getattr(sounds, sound_name, None)
-        if snd:
-            snd.play()
-    except Exception:
-        pass
+    if sound_enabled:
+        sound_bank.play(sound_name)
 
 def load_level(level_index: int) -> None:
     """
-    Carrega e inicializa um nível específico do jogo.
-    
-    Esta função configura todas as entidades do nível: jogador, plataformas,
-    gemas, inimigos, chave e porta. Também reinicia as variáveis de estado.
-    
-    Args:
-        level_index: Índice do nível a ser carregado (0-based)
-    """
-    global current_level, platforms, gems, total_gems, enemies, door, door_open, key, has_key, collected_gems, player_health, player, PLAYER_HALF_W, PLAYER_HALF_H, PLAYER_HIT_W, PLAYER_HIT_H
-
-    # Cria actors se ainda não foram instanciados
-    if player is None:
-        player = Actor('player/prof_bolota_idle', (100, 300))
-        player.speed_y = 0
-        PLAYER_HALF_W, PLAYER_HALF_H = get_image_half_size('player/prof_bolota_idle', (20, 20))
-        PLAYER_HIT_W = max(12, int(PLAYER_HALF_W * 0.6))
-        PLAYER_HIT_H = max(18, int(PLAYER_HALF_H * 0.85))
-    if door is None:
-        door = Actor('items/door_closed', (0, 0))
-    if key is None:
-        key = Actor('items/key_blue', (0, 0))
-    
-    current_level = level_index
-    level = levels[level_index]
-    
-    # Reseta variáveis específicas do nível
-    platforms = level['platforms']
-    spawn_plats = _get_spawnable_platforms(platforms)
-    gems = []
-    enemies = []
-    door_open = False
-    has_key = False
-    collected_gems = 0
-    player_health = PLAYER_MAX_HEALTH
-    
-    # Posiciona gemas aleatoriamente sobre as plataformas, respeitando distância mínima
-    for gem_data in level['gems']:
-        tries = 40
-        pos = None
-        while tries > 0:
-            plat = random.choice(spawn_plats) if spawn_plats else Rect(100, 450, 150, 20)
-            candidate = _random_point_above_platform(plat, dy=30)
-            ok = True
-            for g in gems:
-                dx = candidate[0] - g.x
-                dy = candidate[1] - g.y
-                if (dx*dx + dy*dy) < (GEM_MIN_DIST * GEM_MIN_DIST):
-                    ok = False
-                    break
-            if ok:
-                pos = candidate
-                break
-            tries -= 1
-        if pos is None:
-            plat = random.choice(spawn_plats) if spawn_plats else Rect(100, 450, 150, 20)
-            pos = _random_point_above_platform(plat, dy=30)
-        gem = Actor(f'items/gem_{gem_data["color"]}', pos)
-        gems.append(gem)
-    
-    total_gems = len(gems)
-    
-    # Cria inimigos com patrulha e animação
-    for enemy_data in level['enemies']:
-        enemy = Actor(f'enemies/character_{enemy_data["type"]}_idle', enemy_data['patrol'][0])
-        enemy.type = enemy_data['type']
-        enemy.patrol_points = enemy_data['patrol']
-        enemy.current_target = 1
-        enemy.speed = ENEMY_SPEED
-        enemy.walk_anim_counter = 0
-        # Ajusta posição vertical para ficar corretamente sobre a plataforma
-        try:
-            _esurf = images.load(f'enemies/character_{enemy.type}_idle')
-            enemy_half_h = _esurf.get_height() // 2
-        except Exception:
-            enemy_half_h = 20
-        enemy.stand_offset = enemy_half_h
-        base_platform_top = enemy_data['patrol'][0][1]
-        enemy.base_y = base_platform_top - enemy.stand_offset
-        enemy.y = enemy.base_y
-        enemies.append(enemy)
-    
-    # Posiciona porta aleatoriamente no nível
-    base_platform = next((p for p in platforms if p.top >= HEIGHT - 25), Rect(0, HEIGHT - 20, WIDTH, 20))
-    spawn_on_floor = random.random() < 0.5
-    if spawn_on_floor:
-        dplat = base_platform
-    else:
-        dplat = random.choice(spawn_plats) if spawn_plats else base_platform
+    Começa uma partida no nível dado (ver GameWorld.load_level).
 
-    DOOR_HALF_W, DOOR_HALF_H = get_image_half_size('items/door_closed', (24, 40))
-    
-    door_x = random.randint(dplat.left + DOOR_HALF_W, dplat.right - DOOR_HALF_W)
-    door_y = dplat.top - DOOR_HALF_H
-    door_x = max(DOOR_HALF_W, min(door_x, WIDTH - DOOR_HALF_W))
-    door_y = max(DOOR_HALF_H, min(door_y, HEIGHT - DOOR_HALF_H))
-    door.pos = (door_x, door_y)
-    door.image = 'items/door_closed'
-    door.visible = False
-
-    # Posiciona chave mantendo distância mínima da porta
-    k_candidates = [p for p in spawn_plats if p is not dplat] if spawn_plats else []
-    if not k_candidates:
-        k_candidates = spawn_plats if spawn_plats else [Rect(500, 350, 120, 20)]
-    kplat = random.choice(k_candidates)
-    KEY_HALF_W, KEY_HALF_H = get_image_half_size(f"items/key_{level['key_color']}", (12, 12))
-    tries = 40
-    key_x = kplat.left + KEY_HALF_W
-    key_y = kplat.top - KEY_HALF_H
-    while tries > 0:
-        candidate_x = random.randint(kplat.left + KEY_HALF_W, kplat.right - KEY_HALF_W)
-        candidate_y = kplat.top - KEY_HALF_H
-        dx = candidate_x - door_x
-        dy = candidate_y - door_y
-        if (dx*dx + dy*dy) >= (KEY_MIN_DIST_FROM_DOOR * KEY_MIN_DIST_FROM_DOOR):
-            key_x, key_y = candidate_x, candidate_y
-            break
-        tries -= 1
-    key_x = max(KEY_HALF_W, min(key_x, WIDTH - KEY_HALF_W))
-    key_y = max(KEY_HALF_H, min(key_y, HEIGHT - KEY_HALF_H))
-    key.pos = (key_x, key_y)
-    key.image = f"items/key_{level['key_color']}"
-    key.visible = False
-    
-    # Posiciona jogador no início do nível (canto esquerdo)
-    base_platform = next((p for p in platforms if p.top >= HEIGHT - 25), Rect(0, HEIGHT - 20, WIDTH, 20))
-    player.x = max(PLAYER_HALF_W, 20 + PLAYER_HALF_W)
-    player.y = base_platform.top - PLAYER_HIT_H
-    player.speed_y = 0
-    player.image = 'player/prof_bolota_idle'
-    player.walk_anim_counter = 0
-    player.jump_count = 0
-    player.on_ground = False
-    # Controle para mecânica de atravessar plataformas
-    player.drop_through_frames = 0
-    
+    Cada partida usa um random.Random com semente própria, o que torna o
+    posicionamento de gemas, porta e chave reproduzível pela gravação.
+    """
+    global pending_jumps, pending_drops, pending_interacts
+    stop_recording()
+    pending_jumps = pending_drops = pending_interacts = 0
+    seed = random.getrandbits(32)
+    world.rng = random.Random(seed)
+    world.load_level(level_index)
+    if INPUT_RECORDING:
+        start_recording(seed, level_index)
+
+def play_level_music(track: str) -> None:
+    """Toca a trilha do nível recém-carregado se a música estiver habilitada."""
     if music_enabled:
-        music.play(level['music'])
-
-def update_enemies() -> None:
-    """Atualiza movimento de patrulha e animação de todos os inimigos."""
-    for enemy in enemies:
-        target_x, _ = enemy.patrol_points[enemy.current_target]
-        if enemy.x < target_x:
-            enemy.x += enemy.speed
-        elif enemy.x > target_x:
-            enemy.x -= enemy.speed
-        
-        # Animação de caminhada alternando entre dois frames
-        enemy.walk_anim_counter = (enemy.walk_anim_counter + 1) % 20
-        frame = 'walk_a' if enemy.walk_anim_counter < 10 else 'walk_b'
-        try:
-            enemy.image = f'enemies/character_{enemy.type}_{frame}'
-        except Exception:
-            enemy.image = f'enemies/character_{enemy.type}_idle'
-        
-        # Mantém o inimigo fixo na altura da plataforma
-        if hasattr(enemy, 'base_y'):
-            enemy.y = enemy.base_y
-        
-        # Inverte direção ao atingir ponto de patrulha
-        if abs(enemy.x - target_x) <= enemy.speed:
-            enemy.current_target = (enemy.current_target + 1) % len(enemy.patrol_points)
+        music.play(track)
+
+def read_keyboard_inputs() -> InputState:
+    """Converte as teclas mantidas pressionadas no teclado em um InputState."""
+    return InputState(
+        left=keyboard.left or keyboard.a,
+        right=keyboard.right or keyboard.d,
+        down=keyboard.down or keyboard.s,
+    )
 
-def check_collisions() -> None:
+def tick_inputs(held: InputState) -> InputState:
     """
-    Processa física do jogador e detecta todas as colisões do jogo.
-    
-    Inclui: gravidade, colisão com plataformas, movimento horizontal,
-    colisão com inimigos, coleta de gemas e chaves, interação com porta.
-    """
-    global player_health, collected_gems, has_key, door_open, door_tip_active
-    prev_y = player.y
-    prev_bottom = prev_y + PLAYER_HIT_H
-    player.on_ground = False
-
-    # Aplica gravidade ao jogador
-    player.speed_y += GRAVITY
-    player.speed_y = min(player.speed_y, MAX_FALL_SPEED)
-    player.y += player.speed_y
-    
-    if getattr(player, 'drop_through_frames', 0) > 0:
-        player.drop_through_frames -= 1
-    
-    player_rect = Rect(player.x - PLAYER_HIT_W, player.y - PLAYER_HIT_H, PLAYER_HIT_W * 2, PLAYER_HIT_H * 2)
-    
-    for platform in platforms:
-        # Permite cair através de plataformas (exceto o piso de segurança)
-        is_floor = platform.top >= HEIGHT - 25
-        skip_vertical = (
-            ((keyboard.down or keyboard.s) or getattr(player, 'drop_through_frames', 0) > 0)
-            and not is_floor
-        )
+    Entradas de um tick: teclas mantidas mais um toque pendente de cada tecla.
 
-        # Detecta aterrissagem sobre plataformas
-        if not skip_vertical:
-            if (
-                player.speed_y > 0
-                and prev_bottom <= platform.top
-                and player_rect.colliderect(platform)
-                and (player_rect.right > platform.left and player_rect.left < platform.right)
-            ):
-                player.y = platform.top - PLAYER_HIT_H
-                player.speed_y = 0
-                player.image = 'player/prof_bolota_idle'
-                player.jump_count = 0
-                player.on_ground = True
-                break
-            current_bottom = player.y + PLAYER_HIT_H
-            if (
-                player.speed_y > 0
-                and platform.left <= player.x <= platform.right
-                and platform.top <= current_bottom <= platform.top + 6
-            ):
-                player.y = platform.top - PLAYER_HIT_H
-                player.speed_y = 0
-                player.image = 'player/prof_bolota_idle'
-                player.jump_count = 0
-                player.on_ground = True
-                break
-    
-    # Processa movimento horizontal e animação de caminhada
-    if keyboard.left or keyboard.a:
-        player.x -= PLAYER_SPEED
-        player.walk_anim_counter = (player.walk_anim_counter + 1) % 20
-        player.image = 'player/prof_bolota_walk_1' if player.walk_anim_counter < 10 else 'player/prof_bolota_walk_2'
-    elif keyboard.right or keyboard.d:
-        player.x += PLAYER_SPEED
-        player.walk_anim_counter = (player.walk_anim_counter + 1) % 20
-        player.image = 'player/prof_bolota_walk_1' if player.walk_anim_counter < 10 else 'player/prof_bolota_walk_2'
-    else:
-        player.image = 'player/prof_bolota_idle'
-    
-    player.x = max(PLAYER_HALF_W, min(player.x, WIDTH - PLAYER_HALF_W))
+    Dois toques no mesmo frame (ex.: pulo e pulo duplo) viram dois ticks
+    seguidos com a tecla pressionada, em vez de um só.
+    """
+    global pending_jumps, pending_drops, pending_interacts
+    inputs = InputState(held.left, held.right, held.down,
+                        pending_jumps > 0, pending_drops > 0, pending_interacts > 0)
+    pending_jumps = max(0, pending_jumps - 1)
+    pending_drops = max(0, pending_drops - 1)
+    pending_interacts = max(0, pending_interacts - 1)
+    return inputs
+
+def step_world(inputs: InputState) -> None:
+    """Avança a partida um tick (gravando as entradas, se for o caso) e trata o resultado."""
+    if input_log is not None:
+        input_log.record(inputs)
+    world.step(inputs)
+    # Entrada que não gerou som neste tick não conta na latência do próximo
+    sound_bank.discard_input()
+    sync_world_outcome()
+
+def start_recording(seed: int, level_index: int) -> None:
+    """Começa a gravar a partida que inicia no nível dado."""
+    global input_log
+    input_log = InputLog.for_world(world, seed, level_index)
+
+def stop_recording() -> None:
+    """Encerra a gravação em andamento (se houver) e salva o arquivo em RECORDINGS_DIR."""
+    global input_log
+    log, input_log = input_log, None
+    if log is None or world.player is None:
+        return
+    log.finish(world)
+    directory = os.path.join(GAME_DIR, RECORDINGS_DIR)
+    path = os.path.join(directory, time.strftime('partida_%Y%m%d_%H%M%S') + f'_{log.seed:08x}.eqrec')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        log.save(path)
+    except OSError as e:
+        logger.warning("Não foi possível salvar a gravação em %s: %s", path, e)
+        return
+    logger.info("Partida gravada em %s (%d ticks)", path, log.ticks)
 
-    if player.y > HEIGHT - PLAYER_HIT_H and player.speed_y > 0:
-        player.y = HEIGHT - PLAYER_HIT_H
-        player.speed_y = 0
-        player.jump_count = 0
-        player.on_ground = True
-    
-    # Detecta colisão com inimigos e aplica dano
-    for enemy in enemies:
-        if player_rect.colliderect(Rect(enemy.x - ENEMY_HITBOX_HALF, enemy.y - ENEMY_HITBOX_HALF, ENEMY_HITBOX_HALF * 2, ENEMY_HITBOX_HALF * 2)):
-            player_health -= ENEMY_DAMAGE
-            play_sound('colisao')
-            
-            if player.x < enemy.x:
-                player.x -= 30
-            else:
-                player.x += 30
-            
-            if player_health <= 0:
-                game_over()
-            break
-    
-    # Processa coleta de gemas
-    for gem in gems[:]:
-        if player_rect.colliderect(Rect(gem.x - GEM_HITBOX_HALF, gem.y - GEM_HITBOX_HALF, GEM_HITBOX_HALF * 2, GEM_HITBOX_HALF * 2)):
-            gems.remove(gem)
-            collected_gems += 1
-            play_sound('coletar_cristal')
-            
-            if collected_gems >= total_gems:
-                key.visible = True
-    
-    # Processa coleta de chave
-    if key.visible and player_rect.colliderect(Rect(key.x - KEY_HITBOX_HALF, key.y - KEY_HITBOX_HALF, KEY_HITBOX_HALF * 2, KEY_HITBOX_HALF * 2)):
-        has_key = True
-        key.visible = False
-        play_sound('coletar_cristal')
-        door.visible = True
-    
-    # Verifica proximidade com a porta para exibir dica
-    door_tip_active = player_rect.colliderect(Rect(door.x - DOOR_TIP_HITBOX_WIDTH//2, door.y - DOOR_TIP_HITBOX_HEIGHT//2, DOOR_TIP_HITBOX_WIDTH, DOOR_TIP_HITBOX_HEIGHT))
+def sync_world_outcome() -> None:
+    """Leva o resultado da simulação (derrota ou vitória) para a tela do jogo."""
+    if game_state != PLAYING:
+        return
+    if world.outcome is not None:
+        stop_recording()
+    if world.outcome == GAME_OVER:
+        game_over()
+    elif world.outcome == VICTORY:
+        set_state(VICTORY)
+        play_sound('tutorial_open')
 
 def game_over() -> None:
     """Processa fim de jogo quando o jogador perde todas as vidas."""
@@ -807,7 +3379,7 @@ def set_state(state: str) -> None:
             music.play('intro_theme')
             intro_music_started = True
         elif state == PLAYING:
-            music.play(levels[current_level]['music'])
+            music.play(levels[world.current_level]['music'])
         elif state == VICTORY:
             play_victory_music()
         elif state in [GAME_OVER, TUTORIAL]:
@@ -818,38 +3390,135 @@ def set_state(state: str) -> None:
     elif state == VICTORY:
         init_victory_buttons()
 
-def draw_hearts() -> None:
-    """Renderiza os corações de vida no HUD (cheios, meio ou vazios)."""
+def heart_images(player_health: int) -> list[tuple[str, tuple[int, int]]]:
+    """Lista imagem e centro de cada coração de vida do HUD (cheio, meio ou vazio)."""
+    hearts = []
     for i in range(PLAYER_MAX_HEALTH // 2):
         center_x = HUD_MARGIN_LEFT + i * (HEART_SIZE + HEART_SPACING) + HEART_SIZE // 2
         center = (center_x, HEART_CENTER_Y)
         
         if player_health >= (i + 1) * 2:
             # Coração cheio
-            blit_image_centered('hud/hud_heart', center, HEART_SIZE)
+            hearts.append(('hud/hud_heart', center))
         elif player_health >= i * 2 + 1:
             # Meio coração
-            blit_image_centered('hud/hud_heart_half', center, HEART_SIZE)
+            hearts.append(('hud/hud_heart_half', center))
         else:
             # Coração vazio
-            blit_image_centered('hud/hud_heart_empty', center, HEART_SIZE)
+            hearts.append(('hud/hud_heart_empty', center))
+    return hearts
+
+class HudLayer:
+    """
+    HUD retido: corações, nível, gemas e estado da música em uma única superfície.
+
+    A superfície só é refeita quando algum dos valores exibidos muda; nos
+    demais frames o HUD entra na tela com um único blit. Cada render cria
+    uma superfície nova, o que também sinaliza a mudança ao DirtyRectRenderer.
+
+    Attributes:
+        surface: Superfície atual do HUD (None antes do primeiro render)
+        pos: Posição da superfície na tela
+        renders: Quantas vezes o HUD foi renderizado
+    """
+
+    def __init__(self):
+        self.surface = None
+        self.pos = (0, 0)
+        self.renders = 0
+        self._key = None
+
+    def invalidate(self) -> None:
+        """Força um novo render na próxima chamada de update."""
+        self._key = None
+
+    def update(self, player_health: int, level_index: int, collected_gems: int,
+               total_gems: int, music_on: bool) -> None:
+        """Refaz a superfície do HUD se algum dos valores exibidos mudou."""
+        key = (player_health, level_index, collected_gems, total_gems, music_on)
+        if key == self._key:
+            return
+        self._key = key
+        parts = []
+        # Corações (vidas) - canto esquerdo
+        for image_name, center in heart_images(player_health):
+            info = get_sprite(image_name)
+            if info is not None:
+                parts.append((info.surface, (center[0] + info.offset[0], center[1] + info.offset[1])))
+        # Texto "Nível" - esquerda-centro
+        parts.append(text_blit(f"Nivel {level_index + 1}", center=(WIDTH // 2 - 120, HUD_TEXT_CENTER_Y),
+                               color=(30, 30, 30), fontsize=HUD_TEXT_SIZE))
+        # Texto "Gems" - direita-centro
+        parts.append(text_blit(f"Gems {collected_gems}/{total_gems}", center=(WIDTH // 2 + 120, HUD_TEXT_CENTER_Y),
+                               color=(30, 30, 30), fontsize=HUD_TEXT_SIZE))
+        # Status da música - canto direito
+        music_status = "Ligada" if music_on else "Desligada"
+        parts.append(text_blit(f"Música (M): {music_status}",
+                               center=(WIDTH - HUD_MARGIN_RIGHT - 100, HUD_TEXT_CENTER_Y),
+                               color=(30, 30, 30), fontsize=HUD_TEXT_SIZE))
+
+        bounds = Rect(parts[0][1], parts[0][0].get_size()).unionall(
+            [Rect(pos, surf.get_size()) for surf, pos in parts[1:]])
+        surface = Surface(bounds.size, pygame.SRCALPHA)
+        for surf, (x, y) in parts:
+            surface.blit(surf, (x - bounds.x, y - bounds.y))
+        self.surface = surface
+        self.pos = bounds.topleft
+        self.renders += 1
+
+
+hud = HudLayer()
+
+def draw_profiler_overlay() -> None:
+    """Desenha o overlay do perfil: tempo médio e máximo por zona e gráfico dos últimos frames."""
+    stats = profiler.zone_stats()
+    frame_ms = profiler.frame_times()
+    line_h, graph_h, width = 18, 60, 300
+    panel = Surface((width, 32 + line_h * (len(stats) + 1) + graph_h), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 180))
+    # Fonte direta, fora do cache de textos: os números mudam a cada frame e
+    # não devem expulsar textos do jogo nem contar na zona render_text
+    font = get_text_font(16)
+    last = frame_ms[-1] if frame_ms else 0.0
+    panel.blit(font.render(f"frame {last:5.1f} ms   (F3 fecha, F4 grava trace)", True, (255, 255, 255)), (8, 6))
+    y = 26
+    for zone, avg, peak in stats:
+        panel.blit(font.render(zone, True, (200, 220, 255)), (8, y))
+        panel.blit(font.render(f"{avg:6.2f} / {peak:6.2f} ms", True, (200, 220, 255)), (width - 118, y))
+        y += line_h
+    # Áudio: latência entrada -> som (p50/p95) e vozes interrompidas ou descartadas
+    latency = sound_bank.latency_stats()
+    audio = (f"som p50 {latency[0]:4.1f} p95 {latency[1]:4.1f} ms" if latency else "som: sem medidas")
+    panel.blit(font.render(f"{audio}   roubos {sound_bank.stolen + sound_bank.limited}"
+                           f"  perdas {sound_bank.dropped}", True, (255, 220, 160)), (8, y))
+    y += line_h
+    # Gráfico do tempo de frame: a linha marca 1/60 s; acima dela o frame atrasou
+    y += 4
+    scale = (graph_h - 6) / (2000.0 / 60)
+    budget = 1000.0 / 60
+    pygame.draw.line(panel, (255, 255, 0), (8, y + graph_h - 6 - int(budget * scale)),
+                     (width - 8, y + graph_h - 6 - int(budget * scale)))
+    bar_w = max(1, (width - 16) // PROFILER_HISTORY)
+    for i, ms in enumerate(frame_ms):
+        h = min(graph_h - 6, int(ms * scale))
+        color = (90, 220, 90) if ms <= budget * 1.1 else (240, 80, 60)
+        panel.fill(color, (8 + i * bar_w, y + graph_h - 6 - h, bar_w, h))
+    screen.blit(panel, (WIDTH - width - 10, HUD_MARGIN_TOP + HEART_SIZE + 10))
 
 def draw_menu() -> None:
-    """Renderiza a tela do menu principal."""
+    """Renderiza o conteúdo fixo do menu principal (os botões ficam com a UIScreen)."""
     # Fundo sólido verde
     screen.fill((50, 180, 100))
     
     # Título do jogo com efeito de sombra
     title_text = "Energy Quest"
     title_pos = (WIDTH//2, 110)
-    for dx, dy in [(-4,0),(4,0),(0,-4),(0,4)]:
-        draw_text_fallback(title_text, center=(title_pos[0]+dx, title_pos[1]+dy), fontsize=88, color="black")
-    draw_text_fallback(title_text, center=title_pos, fontsize=88, color="white")
+    draw_text_fallback(title_text, center=title_pos, fontsize=88, color="white",
+                       shadow_color="black", shadow_offset=4)
     
     # Créditos
-    for dx, dy in [(-2,0),(2,0),(0,-2),(0,2)]:
-        draw_text_fallback('Criado por Professor Marquinhos', center=(WIDTH//2+dx, 560+dy), fontsize=22, color=(20,20,20))
-    draw_text_fallback('Criado por Professor Marquinhos', center=(WIDTH//2, 560), fontsize=22, color="yellow")
+    draw_text_fallback('Criado por Professor Marquinhos', center=(WIDTH//2, 560), fontsize=22, color="yellow",
+                       shadow_color=(20,20,20), shadow_offset=2)
     
     # Personagem principal (Professor Bolota) à esquerda do título
     char_w, char_h = 160, 160
@@ -857,81 +3526,105 @@ def draw_menu() -> None:
     char_pos = (char_center_x - char_w//2, title_pos[1] - char_h//2)
     blit_scaled('player/prof_bolota_idle', char_pos, (char_w, char_h))
     
-    # Botões do menu
-    for btn in menu_buttons:
-        btn.draw()
 
-def draw_game() -> None:
-    """Renderiza a tela principal de gameplay."""
-    # Renderiza elementos do cenário
-    draw_fullscreen_background(levels[current_level]['background'])
-    for platform in platforms:
-        draw_platform_tiled(platform)
-    for gem in gems:
-        gem.draw()
+def game_scene_items(view: Rect, alpha: float, game_world: 'GameWorld' = None,
+                     hud_layer: HudLayer = None) -> list:
+    """
+    Lista o que a tela de jogo desenha sobre o cenário, na ordem de desenho.
+
+    Args:
+        view: Retângulo da câmera (já interpolado)
+        alpha: Fração do tick usada para interpolar jogador e inimigos
+        game_world: Mundo a desenhar (padrão: a partida atual, ``world``)
+        hud_layer: HUD retido desse mundo (padrão: ``hud``)
+
+    Returns:
+        Tuplas (chave, superfície, posição na tela); a chave identifica o item
+        de um frame para o outro (usada pelo DirtyRectRenderer)
+    """
+    game_world = world if game_world is None else game_world
+    hud_layer = hud if hud_layer is None else hud_layer
+    enemies, player, door, key = game_world.enemies, game_world.player, game_world.door, game_world.key
+    items = []
+    # Apenas entidades que intersectam a câmera são desenhadas
+    entities = list(game_world.gems)
     if key.visible:
-        key.draw()
-    if getattr(door, 'visible', True):
-        door.draw()
-    for enemy in enemies:
-        enemy.draw()
-    player.draw()
-    
+        entities.append(key)
+    if door.visible:
+        entities.append(door)
+    for entity in entities:
+        blit = entity_blit(entity, view)
+        if blit is not None:
+            items.append((id(entity),) + blit)
+    engine = game_world.enemy_engine
+    if engine is None:
+        for enemy in enemies:
+            blit = entity_blit(enemy, view, game_world.lerp_pos(enemy, alpha))
+            if blit is not None:
+                items.append((id(enemy),) + blit)
+    else:
+        # Só os inimigos visíveis são sincronizados com os arrays do motor
+        visible = engine.visible_indices(view)
+        engine.sync_entities(visible)
+        xs = engine.lerp_x(alpha)
+        for i in visible:
+            blit = entity_blit(enemies[i], view, (xs[i], engine.y[i]))
+            if blit is not None:
+                items.append((id(enemies[i]),) + blit)
+    blit = entity_blit(player, view, game_world.lerp_pos(player, alpha))
+    if blit is not None:
+        items.append((id(player),) + blit)
+
     # ===== HUD (Interface) =====
-    # Corações (vidas) - canto esquerdo
-    draw_hearts()
-    
-    # Texto "Nível" - esquerda-centro
-    nivel_x = WIDTH // 2 - 120
-    draw_text_fallback(
-        f"Nivel {current_level + 1}",
-        center=(nivel_x, HUD_TEXT_CENTER_Y),
-        color=(30, 30, 30),
-        fontsize=HUD_TEXT_SIZE
-    )
-    
-    # Texto "Gems" - direita-centro
-    gems_x = WIDTH // 2 + 120
-    draw_text_fallback(
-        f"Gems {collected_gems}/{total_gems}",
-        center=(gems_x, HUD_TEXT_CENTER_Y),
-        color=(30, 30, 30),
-        fontsize=HUD_TEXT_SIZE
-    )
-    
-    # Status da música - canto direito
-    music_status = "Ligada" if music_enabled else "Desligada"
-    draw_text_fallback(
-        f"Música (M): {music_status}",
-        center=(WIDTH - HUD_MARGIN_RIGHT - 100, HUD_TEXT_CENTER_Y),
-        color=(30, 30, 30),
-        fontsize=HUD_TEXT_SIZE
-    )
-    
+    # Corações, nível, gemas e música: superfície retida, refeita só quando os valores mudam
+    hud_layer.update(game_world.player_health, game_world.current_level, game_world.collected_gems,
+                     game_world.total_gems, music_enabled)
+    items.append(('hud', hud_layer.surface, hud_layer.pos))
+
     # Dica de porta (quando próximo)
-    if door_tip_active and getattr(door, 'visible', True):
-        draw_text_fallback(
-            "Aperte espaco para entrar", 
-            center=(door.x, door.y - 90), 
-            color=(30, 30, 30), 
+    if game_world.door_tip_active and door.visible:
+        items.append(('door_tip',) + text_blit(
+            "Aperte espaco para entrar",
+            center=(door.x - view.x, door.y - 90 - view.y),
+            color=(30, 30, 30),
             fontsize=20
-        )
+        ))
+    return items
+
+def draw_game() -> None:
+    """Renderiza a tela principal de gameplay."""
+    # No passo fixo, jogador, inimigos e câmera são desenhados entre dois ticks
+    alpha = render_alpha if USE_FIXED_TIMESTEP else 1.0
+    view = world.render_view(alpha)
+    items = game_scene_items(view, alpha)
+    # Renderiza elementos do cenário (fundo e plataformas pré-compostos em load_level)
+    if static_layer is None:
+        dirty_renderer.invalidate()
+        draw_fullscreen_background(world.levels[world.current_level]['background'])
+        for platform in world.platforms:
+            if platform.colliderect(view):
+                draw_platform_tiled(platform, view.topleft)
+    elif DIRTY_RECT_RENDERING:
+        dirty_renderer.draw_scene(screen.surface, static_layer, view, items)
+        return
+    else:
+        dirty_renderer.invalidate()
+        static_layer.blit_to(screen.surface, (0, 0), view)
+    for _, surf, pos in items:
+        screen.surface.blit(surf, pos)
 
 
 def draw_game_over() -> None:
-    """Renderiza a tela de Game Over."""
+    """Renderiza o conteúdo fixo da tela de Game Over (os botões ficam com a UIScreen)."""
     # Fundo sólido roxo escuro
     screen.fill((60, 50, 80))
     panel_rect = Rect(80, 100, WIDTH - 160, HEIGHT - 200)
     screen.draw.filled_rect(panel_rect, (30, 30, 45))
     screen.draw.rect(panel_rect, (90, 110, 150))
     title = "Fim de Jogo"
-    for dx, dy in [(-3,0),(3,0),(0,-3),(0,3)]:
-        draw_text_fallback(title, center=(WIDTH//2+dx, 160+dy), fontsize=56, color="black")
-    draw_text_fallback(title, center=(WIDTH//2, 160), fontsize=56, color=(230,230,255))
+    draw_text_fallback(title, center=(WIDTH//2, 160), fontsize=56, color=(230,230,255),
+                       shadow_color="black", shadow_offset=3)
     draw_text_fallback("Voce pode tentar novamente ou voltar ao menu.", center=(WIDTH//2, 210), fontsize=24, color=(200, 220, 255))
-    for btn in game_over_buttons:
-        btn.draw()
 
 def draw_tutorial() -> None:
     """Renderiza a tela de tutorial com instruções do jogo."""
@@ -943,15 +3636,15 @@ def draw_tutorial() -> None:
     title = "Como Jogar"
     draw_text_fallback(title, center=(WIDTH/2, 140), fontsize=48, color="white")
     blit_scaled('hud/tutorial_move', (150, 200), (64, 64))
-    screen.draw.text("Mover: Setas ou A/D", midleft=(230, 232), fontsize=28, color="white")
+    draw_text_fallback("Mover: Setas ou A/D", midleft=(230, 232), fontsize=28, color="white")
     blit_scaled('tiles/box', (150, 280), (64, 64))
-    screen.draw.text("Pular: Seta Cima ou W", midleft=(230, 312), fontsize=28, color="white")
+    draw_text_fallback("Pular: Seta Cima ou W", midleft=(230, 312), fontsize=28, color="white")
     blit_scaled('items/door_closed', (150, 360), (64, 64))
-    screen.draw.text("Abrir Porta: Espaco", midleft=(230, 392), fontsize=28, color="white")
-    screen.draw.text("Clique para voltar ao menu", center=(WIDTH/2, 480), fontsize=24, color="yellow")
+    draw_text_fallback("Abrir Porta: Espaco", midleft=(230, 392), fontsize=28, color="white")
+    draw_text_fallback("Clique para voltar ao menu", center=(WIDTH/2, 480), fontsize=24, color="yellow")
 
 def draw_victory() -> None:
-    """Renderiza a tela de vitória ao completar todos os níveis."""
+    """Renderiza o conteúdo fixo da tela de vitória (os botões ficam com a UIScreen)."""
     # Fundo sólido verde
     screen.fill((50, 180, 100))
     
@@ -963,31 +3656,63 @@ def draw_victory() -> None:
     # Título e mensagem
     msg1 = "Parabéns"
     msg2 = "Você completou todas as fases"
-    for dx, dy in [(-2,0),(2,0),(0,-2),(0,2)]:
-        draw_text_fallback(msg1, center=(WIDTH//2+dx, 160+dy), fontsize=44, color=(20,20,20))
-    draw_text_fallback(msg1, center=(WIDTH//2, 160), fontsize=44, color=(255,255,220))
-    for dx, dy in [(-2,0),(2,0),(0,-2),(0,2)]:
-        draw_text_fallback(msg2, center=(WIDTH//2+dx, 210+dy), fontsize=30, color=(20,20,20))
-    draw_text_fallback(msg2, center=(WIDTH//2, 210), fontsize=30, color=(240,240,220))
+    draw_text_fallback(msg1, center=(WIDTH//2, 160), fontsize=44, color=(255,255,220),
+                       shadow_color=(20,20,20), shadow_offset=2)
+    draw_text_fallback(msg2, center=(WIDTH//2, 210), fontsize=30, color=(240,240,220),
+                       shadow_color=(20,20,20), shadow_offset=2)
     
     # Desenhar personagem comemorando
     char_w, char_h = 100, 100
     char_center_x = WIDTH // 2
     char_pos = (char_center_x - char_w//2, 260)
     blit_scaled('player/prof_bolota_idle', char_pos, (char_w, char_h))
-    
-    # Botões posicionados corretamente dentro da janela
-    for btn in victory_buttons:
-        btn.draw()
 
 
-def update() -> None:
+ui_screens = {
+    MENU: UIScreen(MENU, draw_menu, lambda: menu_buttons),
+    TUTORIAL: UIScreen(TUTORIAL, draw_tutorial),
+    GAME_OVER: UIScreen(GAME_OVER, draw_game_over, lambda: game_over_buttons),
+    VICTORY: UIScreen(VICTORY, draw_victory, lambda: victory_buttons),
+}
+
+def run_fixed_steps(dt: float) -> None:
+    """
+    Avança a partida em ticks de 1/SIMULATION_HZ segundo pelo tempo real decorrido.
+
+    O tempo do frame entra em um acumulador e é consumido em ticks inteiros,
+    no máximo MAX_CATCHUP_STEPS por frame: depois de um travamento longo o
+    jogo descarta o atraso em vez de acelerar. A sobra define render_alpha.
+
+    Args:
+        dt: Tempo real (s) desde o frame anterior
+    """
+    global sim_accumulator, render_alpha
+    tick = 1.0 / SIMULATION_HZ
+    sim_accumulator += dt
+    held = read_keyboard_inputs()
+    steps = 0
+    while sim_accumulator >= tick and game_state == PLAYING:
+        if steps >= MAX_CATCHUP_STEPS:
+            sim_accumulator %= tick
+            break
+        world.save_positions()
+        step_world(tick_inputs(held))
+        sim_accumulator -= tick
+        steps += 1
+    render_alpha = sim_accumulator / tick
+
+def update(dt: float = 1.0 / SIMULATION_HZ) -> None:
     """
     Função principal de atualização chamada a cada frame.
     
     Gerencia a lógica de acordo com o estado atual do jogo.
+
+    Args:
+        dt: Tempo real (s) desde o frame anterior, informado pelo Pygame Zero
     """
     global intro_music_started
+    if not runtime_ready:
+        prepare_runtime()
     if game_state == MENU:
         if music_enabled and not intro_music_started:
             try:
@@ -996,8 +3721,10 @@ def update() -> None:
                 pass
             intro_music_started = True
     elif game_state == PLAYING:
-        update_enemies()
-        check_collisions()
+        if USE_FIXED_TIMESTEP:
+            run_fixed_steps(dt)
+        else:
+            step_world(tick_inputs(read_keyboard_inputs()))
     else:
         pass
 
@@ -1007,16 +3734,19 @@ def draw() -> None:
     
     Delega o desenho para a função apropriada baseada no estado do jogo.
     """
-    if game_state == MENU:
-        draw_menu()
+    if not runtime_ready:
+        prepare_runtime()
+    ui = ui_screens.get(game_state)
+    if ui is not None:
+        # Menu, tutorial, fim de jogo e vitória: telas retidas
+        ui.draw(screen.surface)
     elif game_state == PLAYING:
         draw_game()
-    elif game_state == GAME_OVER:
-        draw_game_over()
-    elif game_state == VICTORY:
-        draw_victory()
-    elif game_state == TUTORIAL:
-        draw_tutorial()
+    if profiler.enabled:
+        draw_profiler_overlay()
+        # O overlay cobre parte da tela: o próximo frame é redesenhado por inteiro
+        dirty_renderer.invalidate()
+        profiler.end_frame()
 
 def on_key_down(key) -> None:
     """
@@ -1025,70 +3755,116 @@ def on_key_down(key) -> None:
     Args:
         key: Código da tecla pressionada
     """
+    global pending_jumps, pending_drops, pending_interacts
     if key == keys.ESCAPE:
         set_state(MENU)
+    elif key == keys.F3:
+        profiler.toggle()
+        dirty_renderer.invalidate()
+    elif key == keys.F4:
+        export_profiler_trace()
 
     if game_state == PLAYING:
-        # Mecânica de pulo duplo
-        if (key == keys.UP or key == keys.W) and getattr(player, 'jump_count', 0) < 2:
-            player.speed_y = -JUMP_SPEED
-            player.image = 'player/prof_bolota_jump'
-            play_sound('som_pulo')
-            player.jump_count = getattr(player, 'jump_count', 0) + 1
-            player.on_ground = False
+        # Pulo, descida e porta entram no próximo tick de simulação (ver tick_inputs)
+        if key == keys.UP or key == keys.W:
+            pending_jumps = min(pending_jumps + 1, MAX_PENDING_PRESSES)
+            sound_bank.note_input()
         elif (key == keys.DOWN or key == keys.S):
-            if getattr(player, 'on_ground', False):
-                player.drop_through_frames = 10
-                player.speed_y = max(player.speed_y, 2)
-                player.y += 2
+            pending_drops = min(pending_drops + 1, MAX_PENDING_PRESSES)
         elif key == keys.SPACE:
-            try_open_door()
+            pending_interacts = min(pending_interacts + 1, MAX_PENDING_PRESSES)
+            sound_bank.note_input()
         elif key == keys.M:
             toggle_music(play_feedback=False)
 
 def on_mouse_move(pos: tuple[int, int]) -> None:
     """Callback de Pygame Zero para processar movimento do mouse (hover nos botões)."""
     if game_state == MENU:
-        for btn in menu_buttons:
-            btn.hover = btn.rect.collidepoint(pos)
+        ui_screens[MENU].update_hover(pos)
 
 def on_mouse_down(pos: tuple[int, int]) -> None:
     """Callback de Pygame Zero para processar cliques do mouse."""
-    if game_state == MENU:
-        for btn in menu_buttons:
-            if btn.rect.collidepoint(pos):
-                btn.action()
-    elif game_state == GAME_OVER:
-        for btn in game_over_buttons:
-            if btn.rect.collidepoint(pos):
-                btn.action()
-    elif game_state == VICTORY:
-        for btn in victory_buttons:
-            if btn.rect.collidepoint(pos):
-                btn.action()
-    elif game_state == TUTORIAL:
+    if game_state == TUTORIAL:
         set_state(MENU)
-
-def try_open_door() -> None:
-    """Tenta abrir a porta se o jogador possui chave e está próximo."""
-    global door_open, game_state
-    player_rect = Rect(player.x - PLAYER_HIT_W, player.y - PLAYER_HIT_H, PLAYER_HIT_W * 2, PLAYER_HIT_H * 2)
-    if has_key and collected_gems >= total_gems and player_rect.colliderect(Rect(door.x - DOOR_TIP_HITBOX_WIDTH//2, door.y - DOOR_TIP_HITBOX_HEIGHT//2, DOOR_TIP_HITBOX_WIDTH, DOOR_TIP_HITBOX_HEIGHT)):
-        door_open = True
-        door.image = 'items/door_open'
-        play_sound('som_alavanca')
-        if current_level < len(levels) - 1:
-            load_level(current_level + 1)
-        else:
-            set_state(VICTORY)
-            play_sound('tutorial_open')
-    else:
-        play_sound('menu_click')
+        return
+    ui = ui_screens.get(game_state)
+    if ui is not None:
+        for btn in ui.buttons_at(pos):
+            sound_bank.note_input()
+            btn.action()
+            sound_bank.discard_input()
+
+def export_profiler_trace() -> None:
+    """Grava o trace do perfil em PROFILER_TRACE_FILE, na pasta do jogo."""
+    path = os.path.join(GAME_DIR, PROFILER_TRACE_FILE)
+    try:
+        count = profiler.export_trace(path)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o trace em %s: %s", path, e)
+        return
+    logger.info("Trace com %d eventos gravado em %s", count, path)
+
+def register_profiler_zones() -> None:
+    """Registra no perfil as funções de cada subsistema (simulação, desenho, texto, áudio)."""
+    namespace = globals()
+    profiler.add_zone('run_fixed_steps', namespace, 'run_fixed_steps')
+    profiler.add_zone('update_enemies', GameWorld, 'update_enemies')
+    profiler.add_zone('check_collisions', GameWorld, 'check_collisions')
+    profiler.add_zone('load_level', GameWorld, 'load_level')
+    profiler.add_zone('draw_game', namespace, 'draw_game')
+    profiler.add_zone('UIScreen.draw', UIScreen, 'draw')
+    profiler.add_zone('draw_platform_tiled', namespace, 'draw_platform_tiled')
+    profiler.add_zone('build_static_layer', world, 'on_level_loaded')
+    profiler.add_zone('render_level_layer', level_prefetcher, 'render_layer')
+    profiler.add_zone('render_text', namespace, 'render_text')
+    profiler.add_zone('HudLayer.update', HudLayer, 'update')
+    if 'music' in namespace:
+        # music é o módulo de áudio do Pygame Zero, injetado pelo pgzrun (com
+        # ``python energy_quest.py``, só em pgzrun.go(), depois do módulo)
+        profiler.add_zone('music.play', music, 'play')
+
+def prepare_runtime() -> None:
+    """
+    Prepara sprites, fonte, sons e a apresentação da janela (uma única vez).
+
+    Chamada no primeiro update()/draw(). Com ``pgzrun energy_quest.py`` a
+    janela já existe quando o módulo é executado, mas com
+    ``python energy_quest.py`` o Pygame Zero só a cria em ``pgzrun.go()``,
+    depois do módulo inteiro; no primeiro frame ela existe nos dois casos.
+    As zonas do perfil também são registradas aqui, quando os módulos
+    injetados pelo Pygame Zero (como ``music``) já estão disponíveis.
+    """
+    global runtime_ready, _display_flip
+    if runtime_ready or pygame.display.get_surface() is None:
+        return
+    runtime_ready = True
+    sound_bank.init_mixer()
+    build_sprite_registry()
+    update_player_metrics()
+    resolve_text_font()
+    if DIRTY_RECT_RENDERING:
+        # O Pygame Zero chama pygame.display.flip() depois de cada draw();
+        # no modo de retângulos sujos a janela recebe só as regiões alteradas
+        _display_flip = pygame.display.flip
+        pygame.display.flip = present_dirty_rects
+    # O primeiro nível é preparado enquanto o menu está na tela
+    level_prefetcher.prefetch(0)
+    register_profiler_zones()
 
 # ============================================================
 # INICIALIZAÇÃO E EXECUÇÃO DO JOGO
 # ============================================================
+sound_bank = SoundBank()
+level_prefetcher = LevelPrefetcher(levels, render_layer=render_level_layer)
+world = GameWorld(levels, on_sound=play_sound, on_music=play_level_music,
+                  on_level_loaded=build_static_layer, prefetcher=level_prefetcher)
 init_menu_buttons()
-
-import pgzrun
-pgzrun.go()
+if PROFILER_ENABLED:
+    profiler.enable()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--replay':
+        # python energy_quest.py --replay arquivo.eqrec: reproduz sem janela
+        sys.exit(replay_main(sys.argv[2]))
+    import pgzrun
+    pgzrun.go()
@@ -0,0 +1,67 @@
+"""Toques de tecla guardados entre frames e consumidos um por tick de simulação."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from pgzero.constants import keys
+
+import energy_quest as eq
+
+
+class NoKeysHeld:
+    """Teclado do Pygame Zero sem nenhuma tecla mantida pressionada."""
+
+    def __getattr__(self, name):
+        return False
+
+
+@pytest.fixture
+def ticks(monkeypatch):
+    """Partida no nível 1; retorna a lista de InputState de cada tick simulado."""
+    eq.init_headless()
+    monkeypatch.setattr(eq, 'keyboard', NoKeysHeld(), raising=False)
+    monkeypatch.setattr(eq, 'keys', keys, raising=False)
+    monkeypatch.setattr(eq, 'music_enabled', False)
+    monkeypatch.setattr(eq, 'sound_enabled', False)
+    monkeypatch.setattr(eq, 'USE_FIXED_TIMESTEP', True)
+    eq.load_level(0)
+    monkeypatch.setattr(eq, 'game_state', eq.PLAYING)
+    monkeypatch.setattr(eq, 'sim_accumulator', 0.0)
+    inputs = []
+    step = eq.world.step
+
+    def record(state):
+        inputs.append(state)
+        step(state)
+
+    monkeypatch.setattr(eq.world, 'step', record)
+    return inputs
+
+
+def run_ticks(count):
+    """Um update() que simula ``count`` ticks."""
+    eq.update((count + 0.5) / eq.SIMULATION_HZ)
+
+
+def test_two_jump_presses_in_one_frame_reach_two_ticks(ticks):
+    eq.on_key_down(keys.UP)
+    eq.on_key_down(keys.UP)
+    run_ticks(3)
+    assert [state.jump for state in ticks] == [True, True, False]
+
+
+def test_two_door_presses_in_one_frame_reach_two_ticks(ticks):
+    eq.on_key_down(keys.SPACE)
+    eq.on_key_down(keys.SPACE)
+    run_ticks(3)
+    assert [state.interact for state in ticks] == [True, True, False]
+
+
+def test_pending_presses_are_capped(ticks):
+    for _ in range(eq.MAX_PENDING_PRESSES + 3):
+        eq.on_key_down(keys.UP)
+    run_ticks(eq.MAX_PENDING_PRESSES + 2)
+    assert sum(state.jump for state in ticks) == eq.MAX_PENDING_PRESSES